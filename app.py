@@ -1,26 +1,17 @@
 #=========================  APP.PY - PART 1  ================================
-from unittest import result
-from weakref import ref
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 import json
 import os
-import requests
-import pytz
-import random
-import string
-from execute_trade_live import place_entry_trade  # ✅ NEW: Import the function directly
-import os
-from firebase_admin import credentials, initialize_app, db
-import firebase_active_contract
-import firebase_admin
-import time  # if not already imported
 import hashlib
-from fastapi import Request
-from execute_trade_live import place_exit_trade
-from fastapi.responses import JSONResponse
-import json, hashlib, time
-from fifo_close import handle_exit_fill_from_tx
+import threading
+import time
+import strategy_core
+import metrics
+import ledger
+from trade_model import TradeLeg, legs_from_node, stamped
 import datetime as dt  # ✅ single, consistent datetime import
+from firebase_client import firebase_db  # lazy: firebase_admin loads on the first DB call
 
 
 
@@ -35,22 +26,61 @@ TRADE_LOG = "trade_log.json"
 LOG_FILE = "app.log"
 
 #================================
-# 🟩 FIREBASE INITIALIZATION======
+# 🟩 HEAVY MODULES (deferred) =====
 #================================
+# The Tiger SDK (execute_trade_live) and gspread/google-auth (fifo_close) are NOT
+# imported on the module path: a gunicorn worker can serve price updates as soon as
+# FastAPI is up, and the trade path is warmed in a background thread on startup.
+
+def place_entry_trade(symbol, action, quantity, db):
+    from execute_trade_live import place_entry_trade as _place_entry_trade
+    return _place_entry_trade(symbol, action, quantity, db)
 
-# === Firebase Key ===
-firebase_key_path = "/etc/secrets/firebase_key.json" if os.path.exists("/etc/secrets/firebase_key.json") else "firebase_key.json"
-cred = credentials.Certificate(firebase_key_path)
+def place_exit_trade(symbol, action, quantity, db):
+    from execute_trade_live import place_exit_trade as _place_exit_trade
+    return _place_exit_trade(symbol, action, quantity, db)
 
-# === Firebase Initialization ===
-if not firebase_admin._apps:
-    firebase_key_path = "/etc/secrets/firebase_key.json" if os.path.exists("/etc/secrets/firebase_key.json") else "firebase_key.json"
-    cred = credentials.Certificate(firebase_key_path)
-    initialize_app(cred, {
-        'databaseURL': "https://tw2tt-firebase-default-rtdb.asia-southeast1.firebasedatabase.app"
-    })
+def handle_exit_fill_from_tx(db, tx_dict):
+    from fifo_close import handle_exit_fill_from_tx as _handle_exit_fill_from_tx
+    return _handle_exit_fill_from_tx(db, tx_dict)
+
+def _warm_heavy_modules():
+    t0 = time.perf_counter()
+    try:
+        import execute_trade_live  # noqa: F401
+        import fifo_close  # noqa: F401
+        import tick_buffer  # noqa: F401  (numpy)
+        firebase_db.reference("/")  # initializes the Admin SDK
+        print(f"[STARTUP] Heavy modules warmed in {time.perf_counter() - t0:.2f}s")
+    except Exception as e:
+        print(f"⚠️ Startup warm-up failed softly: {e}")
+        return
+    # Finish any entry/exit a previous crash left between Tiger and Firebase
+    import trade_journal
+    trade_journal.recover(firebase_db)
 
-firebase_db = db
+@app.on_event("startup")
+async def _start_warmup():
+    threading.Thread(target=_warm_heavy_modules, name="warmup", daemon=True).start()
+
+#================================
+# 🟩 METRICS (per worker process) ==
+#================================
+@app.middleware("http")
+async def _time_requests(request: Request, call_next):
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.observe("http_request_seconds", time.perf_counter() - t0,
+                        path=request.url.path, status=status)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
 
 #################### ALL HELPERS FOR THIS SCRIPT ####################
 
@@ -104,71 +134,25 @@ def normalize_to_utc_iso(val):
 #Helper: Tokyo Chop Stop
 #====================================================================
 
-def _today_local_window(start_hhmm: str, duration_min: int, tzname: str, now_utc=None):
-    """Return today's [start_utc, end_utc) window for a local start time + duration."""
-    now_utc = now_utc or dt.datetime.now(dt.timezone.utc)
-    tz = pytz.timezone(tzname or "UTC")
-
-    local_now = now_utc.astimezone(tz)
-    try:
-        hh, mm = map(int, (start_hhmm or "00:00").split(":"))
-    except Exception:
-        hh, mm = 0, 0
-
-    start_local = local_now.replace(hour=hh, minute=mm, second=0, microsecond=0)
-    # let pytz handle DST
-    start_utc = tz.localize(start_local.replace(tzinfo=None)).astimezone(dt.timezone.utc)
-    end_utc   = start_utc + dt.timedelta(minutes=int(duration_min or 0))
-    return start_utc, end_utc
-
 def get_active_session_guard(firebase_db, now_utc=None):
     """
     Returns {'session','start_utc','end_utc'} if inside any enabled guard window; else None.
-    Reads /settings/session_guards from Firebase.
+    Answered from the precomputed session calendar (config cached, see session_calendar).
     """
-    now_utc = now_utc or dt.datetime.now(dt.timezone.utc)
-    cfg = firebase_db.reference("/settings/session_guards").get() or {}
-    if not cfg or not cfg.get("enabled", False):
-        return None
-
-    for name in ("tokyo", "new_york", "london"):
-        s = cfg.get(name) or {}
-        if not s.get("enabled", False):
-            continue
-        dur = int(s.get("duration_min", 0))
-        if dur <= 0:
-            continue
-        start_utc, end_utc = _today_local_window(
-            s.get("start_local", "00:00"),
-            dur,
-            s.get("tz", "UTC"),
-            now_utc=now_utc
-        )
-        if start_utc <= now_utc <= end_utc:
-            return {
-                "session": name,
-                "start_utc": start_utc.isoformat(),
-                "end_utc": end_utc.isoformat(),
-            }
-    return None
+    import session_calendar
+
+    return session_calendar.active_guard(firebase_db, now_utc or dt.datetime.now(dt.timezone.utc))
 
 #==========================================
 # ---------- Net Position Helper ----------
 #==========================================
 
 def net_position(firebase_db, symbol: str) -> int:
-    """Return net position (longs minus shorts) for a symbol from open_active_trades."""
-    snap = firebase_db.reference(f"/open_active_trades/{symbol}").get() or {}
-    net = 0
-    for v in snap.values():
-        if not isinstance(v, dict):
-            continue
-        side = (v.get("action") or "").upper()
-        if side == "BUY":
-            net += 1
-        elif side == "SELL":
-            net -= 1
-    return net
+    """Net signed contracts (longs minus shorts) for a symbol: ledger counter, else scan open_active_trades."""
+    net = ledger.net_position(firebase_db, symbol)
+    if net is not None:
+        return net
+    return ledger.net_from_legs(ledger.scan_open_legs(firebase_db, symbol))
 
 # ==============================================================
 # 🟩 Per‑symbol settings helpers (+ auto‑create defaults)
@@ -242,19 +226,11 @@ def get_max_open_trades(firebase_db, symbol: str) -> int:
 # ==============================================================
 
 def get_open_count(firebase_db, symbol: str) -> int:
-    snap = firebase_db.reference(f"/open_active_trades/{symbol}").get() or {}
-    count = 0
-    for v in snap.values():
-        if not isinstance(v, dict):
-            continue
-        if v.get("exited"):
-            continue
-        if v.get("contracts_remaining", 1) <= 0:
-            continue
-        if (v.get("status", "").lower() in ("closed", "failed")):
-            continue
-        count += 1
-    return count
+    """Open legs for a symbol: ledger counter, else scan open_active_trades."""
+    count = ledger.open_count(firebase_db, symbol)
+    if count is not None:
+        return count
+    return len(ledger.scan_open_legs(firebase_db, symbol))
 
 def record_cap_block(firebase_db, symbol: str, cap: int, open_count: int) -> None:
     try:
@@ -293,6 +269,8 @@ def map_source(raw_source):
 # 🟩 Helper: Log to file helper
 # ==============================================================
 def log_to_file(message: str):
+    import pytz
+
     print(f"Logging: {message}")
     timestamp = dt.datetime.now(pytz.timezone("Pacific/Auckland")).isoformat()
     with open(LOG_FILE, "a") as f:
@@ -397,6 +375,22 @@ def perform_price_update(data):
 
         utc_time = dt.datetime.utcnow().isoformat() + "Z"
         payload = {"price": price, "updated_at": utc_time}
+
+        # Tick-resolution indicators (ema9/20/50, atr, vwap) ride along in the same update
+        try:
+            import tick_buffer
+
+            if not tick_buffer.book.has(symbol):
+                prev = firebase_db.reference(f"/live_prices/{symbol}").get() or {}
+                if isinstance(prev, dict):
+                    tick_buffer.book.seed(
+                        symbol,
+                        ema={n: prev.get(f"ema{n}") for n in tick_buffer.EMA_PERIODS},
+                        atr=prev.get("atr"),
+                    )
+            payload.update(tick_buffer.book.on_price(symbol, price, volume=data.get("volume")))
+        except Exception as e:
+            log_to_file(f"⚠️ Tick indicators skipped: {e}")
         log_to_file(f"📤 Pushing price to Firebase: {symbol} → {price}")
         try:
             ref = firebase_db.reference(f"/live_prices/{symbol}")
@@ -416,6 +410,7 @@ def perform_price_update(data):
 @app.post("/webhook")
 async def webhook(request: Request):
     current_time = time.time()
+    sw = metrics.Stopwatch("webhook")
 
     # ---------- read body ----------
     try:
@@ -424,6 +419,7 @@ async def webhook(request: Request):
     except Exception as e:
         log_to_file(f"Failed to parse JSON: {e}")
         return JSONResponse({"status": "invalid json", "error": str(e)}, status_code=400)
+    sw.lap("parse")
 
     # ---------- FAST PATH: price updates (non-blocking) ----------
     if data.get("type") == "price_update":
@@ -431,6 +427,7 @@ async def webhook(request: Request):
             perform_price_update(data)
         except Exception as e:
             print(f"⚠️ price_update fast-path error: {e}")
+        sw.lap("price_update")
         return JSONResponse({"ok": True}, status_code=200)
 
     # ---------- extract ----------
@@ -457,6 +454,7 @@ async def webhook(request: Request):
 
     # ---------- ensure per-symbol settings exist ----------
     ensure_symbol_settings_defaults(firebase_db, request_symbol)
+    sw.lap("settings_defaults")
 
     # ---------- dedupe ----------
     payload_hash = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
@@ -469,6 +467,7 @@ async def webhook(request: Request):
     recent_payloads[payload_hash] = current_time
     print(f"[LOG] Webhook received: {data}")
     log_to_file(f"Webhook received: {data}")
+    sw.lap("dedupe")
 
     # --- Plain FLATTEN (no reverse entry) ---
     if action == "FLATTEN":
@@ -486,19 +485,18 @@ async def webhook(request: Request):
         raw_reason  = str(data.get("reason") or "").upper()
         exit_reason = "MACD" if raw_reason == "MACD" else ("EMA20" if raw_reason == "EMA20" else ("MANUAL" if raw_reason == "MANUAL" else ""))
 
-        for _ in range(to_close):
-            r = place_exit_trade(request_symbol, exit_side, 1, firebase_db)
-            if not r or r.get("status") != "SUCCESS" or not str(r.get("order_id","")).isdigit():
-                print(f"[WARN] exit place failed; skipping FIFO push for this leg: {r}")
-                continue
-
+        # one exit order for the whole quantity; the FIFO close matches it across the open legs
+        r = place_exit_trade(request_symbol, exit_side, to_close, firebase_db)
+        if not r or r.get("status") != "SUCCESS" or not str(r.get("order_id","")).isdigit():
+            print(f"[WARN] exit place failed; skipping FIFO push: {r}")
+        else:
             tx = {
                 "status": r.get("status","SUCCESS"),
                 "order_id": str(r.get("order_id","")).strip(),
                 "trade_type": "EXIT",
                 "symbol": request_symbol,
                 "action": exit_side,
-                "quantity": 1,
+                "quantity": r.get("quantity") or to_close,
                 "filled_price": r.get("filled_price"),
                 "transaction_time": normalize_to_utc_iso(r.get("transaction_time") or dt.datetime.utcnow().isoformat()),
                 "source": (data.get("source") or "tradingview"),
@@ -509,6 +507,7 @@ async def webhook(request: Request):
             except Exception as e:
                 print(f"[WARN] FIFO close in app.py failed softly: {e}")
 
+        sw.lap("flatten")
         return JSONResponse({"status": "flatten_submitted", "closed_legs": to_close}, status_code=202)
     #==================================================+++++++++++++++++++++++++++++++++++++++++++++
     # ---------- flatten-before-reverse ---This is for the 20EM Stop Flip that we no loneger use 
@@ -517,18 +516,18 @@ async def webhook(request: Request):
     symbol   = request_symbol
     incoming = 1 if action == "BUY" else -1
     current  = net_position(firebase_db, symbol)
+    sw.lap("net_position")
 
     if current * incoming < 0:
         print(f"🧹 Flatten-first: net={current}, incoming={action}")
         exit_side = "SELL" if current > 0 else "BUY"
 
-        for _ in range(abs(current)):
-            r = place_exit_trade(symbol, exit_side, 1, firebase_db)
-
-            if not r or r.get("status") != "SUCCESS" or not str(r.get("order_id", "")).isdigit():
-                print(f"[WARN] exit place failed; skipping FIFO push for this leg: {r}")
-                continue
+        # one exit order for the whole net; the FIFO close matches it across the open legs
+        r = place_exit_trade(symbol, exit_side, abs(current), firebase_db)
 
+        if not r or r.get("status") != "SUCCESS" or not str(r.get("order_id", "")).isdigit():
+            print(f"[WARN] exit place failed; skipping FIFO push: {r}")
+        else:
             try:
                 tx = {
                     "status": r.get("status", "SUCCESS"),
@@ -536,7 +535,7 @@ async def webhook(request: Request):
                     "trade_type": r.get("trade_type", "EXIT"),
                     "symbol": symbol,
                     "action": exit_side,  # SELL to close longs / BUY to close shorts
-                    "quantity": 1,
+                    "quantity": r.get("quantity") or abs(current),
                     "filled_price": r.get("filled_price"),
                     "transaction_time": normalize_to_utc_iso(
                         r.get("transaction_time") or dt.datetime.utcnow().isoformat()
@@ -554,6 +553,7 @@ async def webhook(request: Request):
                 break
             time.sleep(0.5)
 
+        sw.lap("reverse_flatten")
         if net_position(firebase_db, symbol) != 0:
             print("⏸️ Still not flat after 12s; skipping reverse entry.")
             return JSONResponse({"status": "flatten_in_progress"}, status_code=202)
@@ -591,6 +591,7 @@ async def webhook(request: Request):
     # ---------- place entry ----------
     print("[DEBUG] Sending trade to execute_trade_live place_entry_trade()")
     result = place_entry_trade(request_symbol, action, quantity, firebase_db)
+    sw.lap("entry_order")
     print(f"[DEBUG] Received result from place_entry_trade: {result}")
     filled_price = result.get("filled_price")
     order_id = result.get("order_id")
@@ -602,7 +603,12 @@ async def webhook(request: Request):
 
     if result.get("status") != "SUCCESS":
         try:
-            firebase_db.reference(f"/ghost_trades_log/{request_symbol}/{order_id}").set(data)
+            # ghost record + ledger event in one multi-path update
+            ghosted = ledger.record(firebase_db, "ghosted", request_symbol, order_id, extra_updates={
+                f"ghost_trades_log/{request_symbol}/{order_id}": stamped(data),
+            }, reason=str(result.get("status")))
+            if not ghosted:  # ledger write failed → legacy ghost write
+                firebase_db.reference(f"/ghost_trades_log/{request_symbol}/{order_id}").set(stamped(data))
             log_to_file(f"✅ Firebase ghost_trades_log updated at key: {order_id}")
         except Exception as e:
             log_to_file(f"❌ Firebase push error: {e}")
@@ -617,90 +623,79 @@ async def webhook(request: Request):
     trade_type = (result.get("trade_type") or ("LONG_ENTRY" if action == "BUY" else "SHORT_ENTRY")).upper()
     entry_timestamp = normalize_to_utc_iso(result.get("transaction_time") or dt.datetime.utcnow().isoformat())
 
-    new_trade = {
-        "order_id": order_id,
-        "symbol": symbol,
-        "filled_price": filled_price or 0.0,
-        "action": action,
-        "trade_type": trade_type,
-        "entry_reason": data.get("entryType", ""),   # 👈 add this line
-        "status": "FILLED",
-        "contracts_remaining": data.get("contracts_remaining", quantity or 1),
-        "trail_mode": "FALLBACK",
-        "trail_trigger": trigger_points,
-        "trail_offset": offset_points,
-        "trail_hit": False,
-        "trail_peak": filled_price or 0.0,
-        "filled": True,
-        "entry_timestamp": entry_timestamp,
-        "just_executed": True,
-        "exit_timestamp": None,
-        "trade_state": "open",
-        "quantity": data.get("quantity", 1),
-        "realized_pnl": 0.0,
-        "net_pnl": 0.0,
-        "tiger_commissions": 0.0,
-        "exit_reason": "",
-        "liquidation": data.get("liquidation", False),
-        "source": map_source(data.get("source", None)),
-        "is_open": True,
-        "is_ghost": False,
-    }
+    new_trade = TradeLeg(
+        order_id=order_id,
+        symbol=symbol,
+        filled_price=filled_price or 0.0,
+        action=action,
+        trade_type=trade_type,
+        entry_reason=data.get("entryType", ""),   # 👈 add this line
+        status="FILLED",
+        contracts_remaining=data.get("contracts_remaining", quantity or 1),
+        trail_mode="FALLBACK",
+        trail_trigger=trigger_points,
+        trail_offset=offset_points,
+        trail_hit=False,
+        trail_peak=filled_price or 0.0,
+        filled=True,
+        entry_timestamp=entry_timestamp,
+        just_executed=True,
+        trade_state="open",
+        quantity=data.get("quantity", 1),
+        realized_pnl=0.0,
+        net_pnl=0.0,
+        tiger_commissions=0.0,
+        exit_reason="",
+        liquidation=data.get("liquidation", False),
+        source=map_source(data.get("source", None)),
+        is_open=True,
+        is_ghost=False,
+        broker_exit=result.get("broker_exit"),    # broker-native exit children (EXIT_ENGINE=broker_*)
+    )
 
     # -------- Gate state assignment --------
     try:
         # Find current anchor (oldest same-direction open trade)
         anchor = None
-        opens = firebase_db.reference(f"/open_active_trades/{symbol}").get() or {}
+        opens = legs_from_node(firebase_db.reference(f"/open_active_trades/{symbol}").get())
         same_dir = [
             t for t in opens.values()
-            if isinstance(t, dict)
-            and (t.get("action") or "").upper() == action
-            and not t.get("exited")
-            and (t.get("status","").lower() not in ("closed","failed"))
+            if t.action == action
+            and not t.exited
+            and ((t.status or "").lower() not in ("closed","failed"))
         ]
         if same_dir:
-            def _iso_to_utc(s):
-                try:
-                    s = (s or "").replace("T"," ").replace("Z","").strip()
-                    d = dt.datetime.fromisoformat(s)
-                    return d.replace(tzinfo=dt.timezone.utc) if d.tzinfo is None else d.astimezone(dt.timezone.utc)
-                except Exception:
-                    return dt.datetime.max.replace(tzinfo=dt.timezone.utc)
-            anchor = min(same_dir, key=lambda t: _iso_to_utc(t.get("entry_timestamp") or t.get("transaction_time") or ""))
+            never = dt.datetime.max.replace(tzinfo=dt.timezone.utc)
+            anchor = min(same_dir, key=lambda t: t.entry_utc or never)
 
         # Compute anchor gate if anchor exists
-        gate_state = "UNLOCKED"
-        if anchor:
-            anchor_entry = float(anchor.get("filled_price"))
-            anchor_peak  = float(anchor.get("trail_peak", anchor_entry))
-            if action == "BUY":
-                anchor_gate = max(anchor_entry + (trigger_points - offset_points), anchor_peak - offset_points)
-                own_trigger = (filled_price or 0.0) + trigger_points
-                if own_trigger < anchor_gate:
-                    gate_state = "PARKED"
-                    new_trade["anchor_order_id"] = anchor.get("order_id")
-                    new_trade["anchor_gate_price"] = anchor_gate
-                    new_trade["skip_tp_trailing"] = True
-            else:
-                anchor_gate = min(anchor_entry - (trigger_points - offset_points), anchor_peak + offset_points)
-                own_trigger = (filled_price or 0.0) - trigger_points
-                if own_trigger > anchor_gate:
-                    gate_state = "PARKED"
-                    new_trade["anchor_order_id"] = anchor.get("order_id")
-                    new_trade["anchor_gate_price"] = anchor_gate
-                    new_trade["skip_tp_trailing"] = True
+        gate_state, anchor_gate = strategy_core.entry_gate_state(
+            action, filled_price, trigger_points, offset_points, anchor
+        )
+        if gate_state == "PARKED":
+            new_trade["anchor_order_id"] = anchor.get("order_id")
+            new_trade["anchor_gate_price"] = anchor_gate
+            new_trade["skip_tp_trailing"] = True
 
         new_trade["gate_state"] = gate_state
         print(f"[DEBUG] Assigned gate_state={gate_state} for {order_id}")
     except Exception as e:
         print(f"[WARN] Could not assign gate_state for {order_id}: {e}")
+    sw.lap("gate_state")
 
+    import trade_journal  # loaded with execute_trade_live; free here
+    journal_id = result.get("journal_id")
+    trade_journal.record(journal_id, "pending_commit", trade=new_trade.to_firebase())
     try:
-        firebase_db.reference(f"/open_active_trades/{symbol}/{order_id}").set(new_trade)
+        # open trade + ledger entry_filled event in one multi-path update
+        updates = {f"open_active_trades/{symbol}/{order_id}": new_trade.to_firebase()}
+        updates.update(ledger.event_updates(ledger.make_event("entry_filled", symbol, order_id, leg=new_trade)))
+        firebase_db.reference("/").update(updates)
         print(f"✅ Firebase open_active_trades updated at key: {order_id}")
+        trade_journal.record(journal_id, "committed")
     except Exception as e:
         print(f"❌ Firebase push error: {e}")
+    sw.lap("persist_open_trade")
 
     # ---------- single return ----------
     return JSONResponse(
@@ -0,0 +1,344 @@
+#=========================  BACKTEST - OFFLINE REPLAY + PARAMETER SWEEPS  ================================
+# Replays a tick/price series plus a stream of TradingView alerts through the SAME
+# rules the live bridge runs (strategy_core), with no Firebase / Tiger / Sheets I/O.
+#
+# Usage:
+#   python backtest.py prices.csv alerts.jsonl [grid.json] [--top 20] [--out results.csv] [--procs N]
+#
+#   prices.csv   : ts,price[,ema50]          (ts = epoch s/ms or ISO-8601 UTC)
+#   alerts.jsonl : one webhook payload per line, plus "time": {"time": ..., "action": "BUY", "quantity": 1}
+#   grid.json    : {"atr_trigger_mult": [0.4, 0.6, 0.8], "max_trigger_cap": [8, 10, 12], ...}
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+import instruments
+import strategy_core
+
+# ====================================================
+# 🟩 Simulation knobs (defaults mirror live settings)
+# ====================================================
+DEFAULT_SIM_CONFIG = {
+    **strategy_core.DEFAULT_TRAIL_PARAMS,
+    "trigger_points":     14.0,   # /trailing_tp_settings fallback (entry gate + ATR fallback)
+    "offset_points":      5.0,
+    "gate_unlock_points": 1.0,    # /settings/symbols/{symbol}/gate_unlock_points
+    "anchorgate_enabled": False,  # /settings/anchorgate_enabled
+    "trailing_enabled":   True,   # monitor_trades_loop.TRAILING_ENABLED
+    "poll_interval_s":    10.0,   # monitor loop cadence
+    "handoff_pause_s":    2.0,
+    "max_open_trades":    5,
+    "symbol":             "MGC",  # instrument spec (point value, commission) for P&L
+    "point_value":        None,   # override the spec's $/point (None = spec)
+    "commission_per_side": None,  # override the spec's commission (None = spec)
+}
+
+# ====================================================
+# 🟩 Input loading
+# ====================================================
+def _ts_to_ms(val):
+    s = str(val).strip()
+    if s.replace(".", "", 1).isdigit():
+        n = float(s)
+        return int(n if n > 10_000_000_000 else n * 1000)
+    d = datetime.fromisoformat(s.replace("Z", "+00:00"))
+    d = d if d.tzinfo else d.replace(tzinfo=timezone.utc)
+    return int(d.timestamp() * 1000)
+
+def load_prices_csv(path):
+    """Return {"ts_ms": int64[], "price": float64[], "ema50": float64[] (NaN when absent)} sorted by time."""
+    ts, px, ema = [], [], []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            ts.append(_ts_to_ms(row.get("ts") or row.get("time") or row.get("timestamp")))
+            px.append(float(row["price"]))
+            e = row.get("ema50")
+            ema.append(float(e) if e not in (None, "") else np.nan)
+    order = np.argsort(np.asarray(ts, dtype=np.int64), kind="stable")
+    return {
+        "ts_ms": np.asarray(ts, dtype=np.int64)[order],
+        "price": np.asarray(px, dtype=np.float64)[order],
+        "ema50": np.asarray(ema, dtype=np.float64)[order],
+    }
+
+def load_alerts(path):
+    """Webhook payloads (JSON lines) with a 'time' field; price_update alerts are ignored."""
+    alerts = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            a = json.loads(line)
+            if a.get("type") == "price_update":
+                continue
+            a["ts_ms"] = _ts_to_ms(a.get("time") or a.get("timestamp"))
+            a["action"] = (a.get("action") or "").upper()
+            alerts.append(a)
+    alerts.sort(key=lambda a: a["ts_ms"])
+    return alerts
+
+def build_timeline(series, alerts, poll_interval_s):
+    """
+    Vectorized alignment of the inputs onto one event list:
+      ("poll", tick_idx)   – the last tick at or before each monitor-loop poll
+      ("alert", tick_idx, alert) – alerts fill at the first tick at/after the alert
+    """
+    ts = series["ts_ms"]
+    if len(ts) == 0:
+        return []
+    step = int(poll_interval_s * 1000)
+    grid = np.arange(ts[0], ts[-1] + 1, step, dtype=np.int64)
+    poll_idx = np.searchsorted(ts, grid, side="right") - 1
+    a_ts = np.asarray([a["ts_ms"] for a in alerts], dtype=np.int64)
+    a_idx = np.minimum(np.searchsorted(ts, a_ts, side="left"), len(ts) - 1)
+
+    events = [(int(t), 1, ("poll", int(i))) for t, i in zip(grid, poll_idx)]
+    events += [(int(t), 0, ("alert", int(i), a)) for t, i, a in zip(a_ts, a_idx, alerts)]
+    events.sort(key=lambda e: (e[0], e[1]))  # alerts before a poll at the same ms
+    return [e[2] for e in events]
+
+# ====================================================
+# 🟩 One simulation run
+# ====================================================
+def _net(legs):
+    return sum(strategy_core.leg_remaining(l) * (1 if l["action"] == "BUY" else -1) for l in legs)
+
+def _fifo_entries(legs):
+    return [(l["order_id"], l["entry_ts_ms"]) for l in sorted(legs, key=lambda l: l["entry_ts_ms"])]
+
+def _spec(symbol):
+    """Instrument spec without Firebase I/O: INSTRUMENTS_FILE when set, else the built-in defaults."""
+    if os.getenv("INSTRUMENTS_FILE"):
+        return instruments.spec_for(symbol)
+    return instruments.InstrumentRegistry().spec_for(symbol)
+
+def _pnl(legs, prices, qtys, cfg):
+    """instruments.pnl over legs closed at `prices` (per leg or one for all), spec overrides from cfg."""
+    spec = _spec(cfg["symbol"])
+    pv, comm = cfg.get("point_value"), cfg.get("commission_per_side")
+    return instruments.pnl([l["filled_price"] for l in legs], prices, qtys, [l["action"] for l in legs],
+                           point_value=spec.point_value if pv is None else pv,
+                           commission_per_side=spec.commission_per_side if comm is None else comm)
+
+def _close_fifo(legs, qty, price, ts_ms, cfg, closed, reason):
+    """One exit of `qty` contracts matched across the book as the live FIFO close does (fifo_allocate)."""
+    opens = {l["order_id"]: l for l in legs}
+    allocation = strategy_core.fifo_allocate(_fifo_entries(legs), opens, qty)
+    if not allocation:
+        return []
+    matched = [opens[oid] for oid, _ in allocation]
+    pnl = _pnl(matched, price, [take for _, take in allocation], cfg)
+    for i, (leg, (_, take)) in enumerate(zip(matched, allocation)):
+        closed.append((ts_ms, round(float(pnl["realized"][i]), 2), round(float(pnl["net"][i]), 2),
+                       reason, bool(leg.get("trail_hit"))))
+        leg["contracts_remaining"] = strategy_core.leg_remaining(leg) - take
+        if leg["contracts_remaining"] <= 0:
+            legs.remove(leg)
+    return matched
+
+def simulate(series, alerts, config=None, timeline=None):
+    """
+    Replay one config. Mirrors the live flow:
+      - BUY/SELL alerts: flatten-first on reversal, max-open cap, entry gate assignment
+      - BUY/SELL alerts open one leg of `quantity` contracts (default 1)
+      - FLATTEN alerts: one exit of up to `quantity` contracts (all when absent), matched FIFO across legs
+      - each poll: AnchorGate (optional) then ATR-adaptive trailing per leg
+      - a trailing exit closes 1 contract at the poll price, matched FIFO (as the exit-ticket drain does)
+    Returns the metrics dict from `summarize`.
+    """
+    cfg = dict(DEFAULT_SIM_CONFIG, **(config or {}))
+    if timeline is None:
+        timeline = build_timeline(series, alerts, cfg["poll_interval_s"])
+    ts, px, ema = series["ts_ms"], series["price"], series["ema50"]
+
+    legs, closed = [], []
+    atr_state = None
+    sticky, last_anchor, handoff_clear_ms = False, None, 0
+    seq = 0
+
+    for ev in timeline:
+        i = ev[1]
+        price, now_ms = float(px[i]), int(ts[i])
+
+        if ev[0] == "alert":
+            alert = ev[2]
+            action = alert["action"]
+            if action == "FLATTEN":
+                q = int(alert.get("quantity") or 0)
+                n = abs(_net(legs)) if q <= 0 else min(abs(_net(legs)), q)
+                if n:
+                    _close_fifo(legs, n, price, now_ms, cfg, closed, (alert.get("reason") or "FLATTEN").upper())
+                continue
+            if action not in ("BUY", "SELL"):
+                continue
+            incoming = 1 if action == "BUY" else -1
+            if _net(legs) * incoming < 0:
+                _close_fifo(legs, abs(_net(legs)), price, now_ms, cfg, closed, "REVERSE")
+            if cfg["max_open_trades"] is not None and len(legs) >= cfg["max_open_trades"]:
+                continue
+            same_dir = [l for l in legs if l["action"] == action]
+            anchor = min(same_dir, key=lambda l: l["entry_ts_ms"]) if same_dir else None
+            gate_state, anchor_gate = strategy_core.entry_gate_state(
+                action, price, cfg["trigger_points"], cfg["offset_points"], anchor
+            )
+            seq += 1
+            qty = max(1, int(alert.get("quantity") or 1))
+            leg = {"order_id": str(seq), "action": action, "filled_price": price, "entry_ts_ms": now_ms,
+                   "trail_hit": False, "trail_peak": price, "quantity": qty, "contracts_remaining": qty,
+                   "gate_state": gate_state}
+            if gate_state == "PARKED":
+                leg.update(anchor_order_id=anchor["order_id"], anchor_gate_price=anchor_gate, skip_tp_trailing=True)
+            legs.append(leg)
+            continue
+
+        # ---- poll ----
+        if not legs:
+            continue
+        candidates = legs
+        if cfg["anchorgate_enabled"]:
+            anchor = min(legs, key=lambda l: l["entry_ts_ms"])
+            if anchor["order_id"] != last_anchor:
+                last_anchor = anchor["order_id"]
+                handoff_clear_ms = now_ms + int(cfg["handoff_pause_s"] * 1000)
+                sticky = False
+            handoff_active = now_ms < handoff_clear_ms
+            unreal = strategy_core.unrealized_points(anchor["action"], anchor["filled_price"], price)
+            sticky, _ = strategy_core.apply_anchor_gate(
+                legs, anchor, unreal, cfg["gate_unlock_points"], sticky, handoff_active
+            )
+            candidates = strategy_core.gated(legs)
+
+        if not cfg["trailing_enabled"]:
+            continue
+        ema50 = None if np.isnan(ema[i]) else float(ema[i])
+        for leg in list(candidates):
+            if leg not in legs or leg.get("exit_pending"):
+                continue
+            # the live loop updates the symbol's ATR proxy once per processed leg
+            atr_state = strategy_core.atr_proxy_update(atr_state, price, leg["filled_price"], ema50, cfg["atr_alpha"])
+            trig, off = strategy_core.adaptive_trail(atr_state, cfg)
+            if strategy_core.trail_step(leg, price, trig, off)["exit"]:
+                leg["exit_pending"] = True
+                _close_fifo(legs, 1, price, now_ms, cfg, closed, "TRAIL")
+                leg["exit_pending"] = False  # claim released once the ticket has drained
+
+    last_px = float(px[-1]) if len(px) else 0.0
+    open_pnl = float(_pnl(legs, last_px, [strategy_core.leg_remaining(l) for l in legs], cfg)["realized"].sum()) if legs else 0
+    return summarize(closed, open_pnl)
+
+# ====================================================
+# 🟩 Metrics (vectorized over the closed-trade list)
+# ====================================================
+def summarize(closed, open_pnl=0.0):
+    if not closed:
+        return {"trades": 0, "net_pnl": 0.0, "gross_pnl": 0.0, "win_rate": 0.0, "profit_factor": 0.0,
+                "max_drawdown": 0.0, "trail_exits": 0, "open_pnl": round(open_pnl, 2)}
+    gross = np.fromiter((c[1] for c in closed), dtype=np.float64, count=len(closed))
+    net = np.fromiter((c[2] for c in closed), dtype=np.float64, count=len(closed))
+    equity = np.cumsum(net)
+    drawdown = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:] - equity
+    wins, losses = net[net > 0].sum(), -net[net < 0].sum()
+    return {
+        "trades": int(len(net)),
+        "net_pnl": round(float(equity[-1]), 2),
+        "gross_pnl": round(float(gross.sum()), 2),
+        "win_rate": round(float((net > 0).mean()), 4),
+        "profit_factor": round(float(wins / losses), 3) if losses > 0 else float("inf"),
+        "max_drawdown": round(float(drawdown.max()), 2),
+        "trail_exits": int(sum(1 for c in closed if c[3] == "TRAIL")),
+        "open_pnl": round(open_pnl, 2),
+    }
+
+# ====================================================
+# 🟩 Parameter sweeps across a process pool
+# ====================================================
+_worker_data = {}
+
+def _init_worker(series, alerts):
+    # Ship the (large) inputs once per worker process, not once per config
+    _worker_data["series"] = series
+    _worker_data["alerts"] = alerts
+    _worker_data["timelines"] = {}
+
+def _run_config(config):
+    cfg = dict(DEFAULT_SIM_CONFIG, **config)
+    key = cfg["poll_interval_s"]
+    timelines = _worker_data["timelines"]
+    if key not in timelines:
+        timelines[key] = build_timeline(_worker_data["series"], _worker_data["alerts"], key)
+    return {**config, **simulate(_worker_data["series"], _worker_data["alerts"], cfg, timelines[key])}
+
+def expand_grid(grid):
+    keys = sorted(grid)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(grid[k] for k in keys))]
+
+def run_sweep(series, alerts, grid, base=None, processes=None):
+    """
+    Evaluate every combination in `grid` (merged over `base`) and return rows sorted by net P&L.
+    Runs in-process when processes == 1.
+    """
+    configs = [dict(base or {}, **c) for c in expand_grid(grid)] or [dict(base or {})]
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        _init_worker(series, alerts)
+        rows = [_run_config(c) for c in configs]
+    else:
+        chunk = max(1, len(configs) // (processes * 4))
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(series, alerts)) as pool:
+            rows = list(pool.map(_run_config, configs, chunksize=chunk))
+    rows.sort(key=lambda r: r["net_pnl"], reverse=True)
+    return rows
+
+def format_table(rows, top=20):
+    if not rows:
+        return "(no results)"
+    cols = list(rows[0].keys())
+    shown = rows[:top]
+    widths = [max(len(c), *(len(str(r.get(c))) for r in shown)) for c in cols]
+    lines = ["  ".join(c.rjust(w) for c, w in zip(cols, widths))]
+    lines.append("  ".join("-" * w for w in widths))
+    for r in shown:
+        lines.append("  ".join(str(r.get(c)).rjust(w) for c, w in zip(cols, widths)))
+    return "\n".join(lines)
+
+def write_csv(rows, path):
+    if not rows:
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay prices + alerts through the live rules")
+    parser.add_argument("prices")
+    parser.add_argument("alerts")
+    parser.add_argument("grid", nargs="?", help="JSON file of {param: [values]}")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", help="write all rows to this CSV")
+    parser.add_argument("--procs", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    series = load_prices_csv(args.prices)
+    alerts = load_alerts(args.alerts)
+    grid = {}
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    print(f"📈 {len(series['ts_ms'])} ticks, {len(alerts)} alerts, {len(expand_grid(grid)) or 1} configs")
+    rows = run_sweep(series, alerts, grid, processes=args.procs)
+    print(format_table(rows, top=args.top))
+    if args.out:
+        write_csv(rows, args.out)
+        print(f"✅ Wrote {len(rows)} rows to {args.out}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
+
+#=========================  BACKTEST (END OF SCRIPT)  ================================
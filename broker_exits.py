@@ -0,0 +1,173 @@
+#=========================  BROKER_EXITS - BROKER-NATIVE STOP / TRAIL / BRACKET EXIT ENGINE  ================================
+# Alternative to the client-side trailing in monitor_trades_loop (10 s polled prices → market order + fill
+# polling). With EXIT_ENGINE set to a broker mode, place_entry_trade attaches the exit orders to Tiger right
+# after the entry fills, so the exit reacts at exchange speed and nothing has to poll for it:
+#
+#   EXIT_ENGINE=client          (default) today's behaviour, nothing attached
+#   EXIT_ENGINE=broker_trail    one TRAIL order, trailing amount = trail_points
+#   EXIT_ENGINE=broker_bracket  STP at entry ∓ stop_points  +  LMT at entry ± take_profit_points
+#
+# Distances come from /settings/broker_exits {trail_points, stop_points, take_profit_points}; trail_points
+# defaults to the trailing TP offset. Children are GTC on the opposite side, one per entry leg.
+#
+# Tracking:
+#   leg.broker_exit                        {"mode", "children": {child_order_id: role}}  (on the open leg)
+#   /runtime/broker_exits/{symbol}/{child}  {leg, role, mode, siblings}                  (child → leg index)
+#
+# Reconciliation goes through the normal FIFO close: the child's execution is ticketed by fill_stream, which
+# stamps the ticket with `protects` (the leg it guards) from the index; fifo_close closes THAT leg instead of
+# the FIFO head and cancels the leg's remaining children (the other bracket side, or every child when the leg
+# was closed some other way — TradingView flatten, manual exit). A partial close re-sizes the leg's children
+# to the contracts left (resize_children). Requires FILL_STREAM=1.
+import os
+
+EXIT_ENGINE = os.getenv("EXIT_ENGINE", "client").strip().lower()
+BROKER_MODES = ("broker_trail", "broker_bracket")
+INDEX_ROOT = "/runtime/broker_exits"
+SETTINGS_PATH = "/settings/broker_exits"
+DEFAULT_STOP_POINTS = 10.0
+DEFAULT_TAKE_PROFIT_POINTS = 20.0
+DEFAULT_TICK = 0.1
+EXIT_REASONS = {"trail": "BROKER_TRAIL", "stop": "BROKER_STOP", "take_profit": "BROKER_TP"}
+
+def enabled():
+    return EXIT_ENGINE in BROKER_MODES
+
+def tick_for(symbol):
+    """Tick size by contract root ('MGC2510' → 'MGC'), from the instrument spec registry."""
+    import instruments
+    return instruments.tick_for(symbol)
+
+def round_tick(price, tick):
+    return round(round(price / tick) * tick, 6)
+
+# ====================================================
+# 🟩 Settings + plan (pure)
+# ====================================================
+def load_settings(firebase_db):
+    cfg, trail = {}, {}
+    try:
+        cfg = firebase_db.reference(SETTINGS_PATH).get() or {}
+        trail = firebase_db.reference("/trailing_tp_settings").get() or {}
+    except Exception as e:
+        print(f"⚠️ [BROKER_EXIT] settings read failed; using defaults: {e}")
+    return {
+        "trail_points": float(cfg.get("trail_points") or trail.get("offset_points") or 5.0),
+        "stop_points": float(cfg.get("stop_points") or DEFAULT_STOP_POINTS),
+        "take_profit_points": float(cfg.get("take_profit_points") or DEFAULT_TAKE_PROFIT_POINTS),
+    }
+
+def plan(mode, action, quantity, entry_price, settings, tick=DEFAULT_TICK):
+    """Child order specs for one entry leg: [{role, order_type, action, quantity, aux_price|limit_price}]."""
+    side = 1 if action.upper() == "BUY" else -1
+    exit_action = "SELL" if side == 1 else "BUY"
+    base = {"action": exit_action, "quantity": int(quantity)}
+    if mode == "broker_trail":
+        return [{**base, "role": "trail", "order_type": "TRAIL",
+                 "aux_price": round_tick(settings["trail_points"], tick)}]
+    if mode == "broker_bracket":
+        return [
+            {**base, "role": "stop", "order_type": "STP",
+             "aux_price": round_tick(entry_price - side * settings["stop_points"], tick)},
+            {**base, "role": "take_profit", "order_type": "LMT",
+             "limit_price": round_tick(entry_price + side * settings["take_profit_points"], tick)},
+        ]
+    return []
+
+# ====================================================
+# 🟩 Attach (at entry) / lookup / cancel
+# ====================================================
+def attach(client, contract, account, symbol, action, quantity, entry_price, leg_order_id, firebase_db):
+    """
+    Place the exit children for a filled entry. Returns the leg's broker_exit dict, or None when the
+    engine is off or nothing could be placed (the leg then falls back to the client-side engine).
+    """
+    if not enabled() or entry_price is None:
+        return None
+    from tigeropen.trade.domain.order import Order
+
+    specs = plan(EXIT_ENGINE, action, quantity, float(entry_price), load_settings(firebase_db), tick_for(symbol))
+    children = {}
+    for spec in specs:
+        kw = {k: spec[k] for k in ("aux_price", "limit_price") if k in spec}
+        order = Order(account=account, contract=contract, action=spec["action"], order_type=spec["order_type"],
+                      quantity=spec["quantity"], time_in_force="GTC", **kw)
+        try:
+            response = client.place_order(order)
+        except Exception as e:
+            print(f"❌ [BROKER_EXIT] {spec['role']} for {leg_order_id} rejected: {e}")
+            continue
+        child_id = response.get("id") if isinstance(response, dict) else response
+        if child_id is None or not str(child_id).isdigit():
+            print(f"❌ [BROKER_EXIT] {spec['role']} for {leg_order_id}: no order id in {response}")
+            continue
+        children[str(child_id)] = spec["role"]
+        print(f"🛡️ [BROKER_EXIT] {spec['order_type']} {spec['action']} {spec['quantity']} "
+              f"{kw} attached to {leg_order_id} as {child_id}")
+    if not children:
+        return None
+
+    index = {f"{INDEX_ROOT.strip('/')}/{symbol}/{cid}": {
+        "leg": str(leg_order_id), "role": role, "mode": EXIT_ENGINE,
+        "siblings": [c for c in children if c != cid],
+    } for cid, role in children.items()}
+    try:
+        firebase_db.reference("/").update(index)
+    except Exception as e:
+        print(f"⚠️ [BROKER_EXIT] index write failed for {leg_order_id} (fills will close FIFO head): {e}")
+    return {"mode": EXIT_ENGINE, "children": children}
+
+def lookup(firebase_db, symbol, child_order_id):
+    """{leg, role, mode, siblings} when `child_order_id` is a broker exit child, else None."""
+    try:
+        node = firebase_db.reference(f"{INDEX_ROOT}/{symbol}/{child_order_id}").get()
+    except Exception as e:
+        print(f"⚠️ [BROKER_EXIT] index read failed for {child_order_id}: {e}")
+        return None
+    return node if isinstance(node, dict) else None
+
+def cancel_children(firebase_db, symbol, broker_exit, keep=None, client=None):
+    """Cancel the leg's working children (except `keep`, the one that filled) and drop their index entries."""
+    children = dict((broker_exit or {}).get("children") or {})
+    if not children:
+        return []
+    if client is None:
+        from tiger_client import get_client
+        client = get_client()
+    cancelled = []
+    for cid, role in children.items():
+        if cid == keep:
+            continue
+        try:
+            client.cancel_order(id=int(cid))
+            cancelled.append(cid)
+            print(f"🧹 [BROKER_EXIT] cancelled {role} child {cid}")
+        except Exception as e:
+            # already filled/cancelled at the broker: its fill (if any) still arrives via the fill stream
+            print(f"⚠️ [BROKER_EXIT] cancel {cid} failed softly: {e}")
+    try:
+        firebase_db.reference("/").update({f"{INDEX_ROOT.strip('/')}/{symbol}/{cid}": None for cid in children})
+    except Exception as e:
+        print(f"⚠️ [BROKER_EXIT] index cleanup failed for {symbol}: {e}")
+    return cancelled
+
+def resize_children(firebase_db, symbol, leg, remaining, client=None):
+    """
+    Partial FIFO close of a protected leg: cancel every child (a partly filled one included — its unfilled
+    rest is sized for the old quantity) and attach fresh ones for the `remaining` contracts. Returns the
+    leg's new broker_exit dict, or None (the leg then falls back to the client-side engine).
+    """
+    if client is None:
+        from tiger_client import get_client
+        client = get_client()
+    cancel_children(firebase_db, symbol, leg.get("broker_exit"), client=client)
+    from execute_trade_live import get_contract
+    from tiger_client import ACCOUNT
+
+    resized = attach(client, get_contract(symbol), ACCOUNT, symbol, leg.get("action") or "", remaining,
+                     leg.get("filled_price"), leg.get("order_id"), firebase_db)
+    print(f"🛡️ [BROKER_EXIT] {leg.get('order_id')} children re-sized to {remaining} contract(s): "
+          f"{(resized or {}).get('children')}")
+    return resized
+
+#=========================  BROKER_EXITS (END OF SCRIPT)  ================================
@@ -0,0 +1,116 @@
+#=========================  CLAIMS - TRANSACTIONAL CLAIMS WITH LEASE EXPIRY  ================================
+# "Only one worker does X" for the monitor (trailing exits, FIFO drain, session-guard flatten), so
+# several monitor instances can run against the same Firebase without double-placing orders.
+#
+# A claim is a node written inside a Firebase transaction (compare-and-set on the node's ETag):
+#   {"owner": "<host>:<pid>", "claimed_at": <epoch>, "expires_at": <epoch> | None, "tag": ..., "state": "held" | "done"}
+#
+#   acquire()   free / expired / different tag / our own → take it; otherwise None (someone else holds it)
+#   lease.done() keep the claim forever (expires_at=None): the work happened, never redo it
+#   lease.release() give it back (only if we still own it)
+#
+# A claimant that crashes mid-work simply stops renewing: the lease runs out after `lease_s` and the next
+# worker takes over. Legacy claims written as plain `True` (old exit_pending) are treated as held forever.
+import os
+import socket
+import time
+
+import metrics
+
+DEFAULT_LEASE_S = 120.0
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+class _Held(Exception):
+    """Raised inside the transaction function to abort it without writing."""
+
+def is_held(value, now=None, owner=None):
+    """True when `value` (a claim node as read from Firebase) blocks `owner` right now."""
+    if not value:
+        return False
+    if not isinstance(value, dict):
+        return True                         # legacy exit_pending=True
+    expires_at = value.get("expires_at")
+    if expires_at is None:
+        return True                         # done / permanent, even for its owner
+    if owner is not None and value.get("owner") == owner:
+        return False
+    return float(expires_at) > (now if now is not None else time.time())
+
+class Lease:
+    """A claim we hold. `value` is what sits in Firebase (mirror it into any local copy you persist)."""
+
+    def __init__(self, firebase_db, path, value):
+        self.firebase_db = firebase_db
+        self.path = path
+        self.value = value
+
+    @property
+    def owner(self):
+        return self.value["owner"]
+
+    def _swap(self, new_value_fn):
+        def fn(current):
+            if not (isinstance(current, dict) and current.get("owner") == self.owner):
+                raise _Held()
+            return new_value_fn(current)
+        try:
+            self.value = self.firebase_db.reference(self.path).transaction(fn)
+            return True
+        except _Held:
+            print(f"⚠️ [CLAIM] lost {self.path} (taken over after expiry)")
+            return False
+        except Exception as e:
+            print(f"⚠️ [CLAIM] update failed for {self.path}: {e}")
+            return False
+
+    def renew(self, lease_s=DEFAULT_LEASE_S):
+        return self._swap(lambda cur: {**cur, "expires_at": time.time() + lease_s})
+
+    def done(self, **data):
+        """Make the claim permanent (the work is done; nobody may redo it)."""
+        return self._swap(lambda cur: {**cur, **data, "expires_at": None, "state": "done"})
+
+    def release(self):
+        """Delete the claim if we still own it (the work did not happen; someone may retry)."""
+        ok = self._swap(lambda cur: None)
+        if ok:
+            self.value = None
+        return ok
+
+def acquire(firebase_db, path, lease_s=DEFAULT_LEASE_S, owner=None, tag=None, **data):
+    """
+    Atomically claim `path`. Returns a Lease, or None when someone else holds a live claim.
+    A claim with a different `tag` (e.g. last session window's) counts as free.
+    """
+    owner = owner or OWNER
+    now = time.time()
+    took_over = {"expired": False}
+
+    def fn(current):
+        if isinstance(current, dict) and tag is not None and current.get("tag") != tag:
+            current = None
+        if is_held(current, now=now, owner=owner):
+            raise _Held()
+        took_over["expired"] = isinstance(current, dict) and current.get("owner") not in (None, owner)
+        value = {"owner": owner, "claimed_at": now, "expires_at": now + lease_s, "state": "held"}
+        if tag is not None:
+            value["tag"] = tag
+        value.update(data)
+        return value
+
+    try:
+        value = firebase_db.reference(path).transaction(fn)
+    except _Held:
+        metrics.inc("claims", outcome="held")
+        return None
+    except Exception as e:
+        metrics.inc("claims", outcome="error")
+        print(f"⚠️ [CLAIM] acquire failed for {path}: {e}")
+        return None
+    if took_over["expired"]:
+        metrics.inc("claims", outcome="expired_takeover")
+        print(f"[CLAIM] took over expired claim at {path}")
+    metrics.inc("claims", outcome="acquired")
+    return Lease(firebase_db, path, value)
+
+#=========================  CLAIMS (END OF SCRIPT)  ================================
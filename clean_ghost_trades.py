@@ -1,15 +1,39 @@
-import firebase_admin
-from firebase_admin import credentials, db
-from datetime import datetime, timezone, timedelta
+#=========================  CLEAN_GHOST_TRADES - INDEX-BACKED LOG RETENTION  ================================
+# Deletes log records older than `age_hours` from the symbol-scoped logs
+#   /ghost_trades_log/{symbol}/{oid}   /zombie_trades_log/{symbol}/{oid}
+#   /archived_trades_log/{symbol}/{oid}   /exit_orders_log/{symbol}/{oid}
+# and folds old ledger events (already inside a snapshot) out of /ledger/events/{symbol}.
+#
+# Cost scales with the number of EXPIRED records, not history: every writer stamps TS_FIELD (epoch ms,
+# trade_model.stamped), and per symbol we ask Firebase only for
+#     order_by_child("_ts").start_at(0).end_at(cutoff_ms)
+# then delete the keys in chunked multi-path updates (optionally appending them to a local JSONL archive
+# first). Needs one index rule per log in the database rules:
+#     "ghost_trades_log": {"$symbol": {".indexOn": ["_ts"]}}   (same for the other three logs)
+# Without it Firebase rejects the query; that symbol then falls back to one full read, filtered with numpy.
+#
+# Legacy records (written before _ts existed) sort FIRST under order_by_child (null < false < numbers), so
+# end_at(False) finds them cheaply; each run backfills up to BACKFILL_BATCH of them per symbol from their old
+# timestamp fields (or deletes them outright when already expired). Flat-layout leftovers
+# (/ghost_trades_log/{oid}) are drained the same way.
+import argparse
+import json
 import os
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+
+import numpy as np
 
-# Initialize Firebase app if not already initialized
-firebase_key_path = "/etc/secrets/firebase_key.json" if os.path.exists("/etc/secrets/firebase_key.json") else "firebase_key.json"
-if not firebase_admin._apps:
-    cred = credentials.Certificate(firebase_key_path)
-    firebase_admin.initialize_app(cred, {
-        'databaseURL': "https://tw2tt-firebase-default-rtdb.asia-southeast1.firebasedatabase.app"
-    })
+import metrics
+from firebase_client import firebase_db as db  # lazy: Admin SDK initializes on the first DB call
+from trade_model import TS_FIELD
+
+LOG_ROOTS = ("/ghost_trades_log", "/zombie_trades_log", "/archived_trades_log", "/exit_orders_log")
+LEDGER_EVENTS_ROOT = "/ledger/events"
+DEFAULT_AGE_HOURS = 12
+DELETE_CHUNK = 500           # paths per multi-path update
+BACKFILL_BATCH = 500         # legacy (un-stamped) records handled per symbol per run
 
 def extract_trade_timestamp(trade_data):
     # Unwrap nested 'trade_data' if present
@@ -39,28 +63,194 @@ def extract_trade_timestamp(trade_data):
                 print(f"❌ Failed parsing {field}='{val}': {e}")
     return None
 
-def delete_old_trades(log_path, age_hours=12):
-    ref = db.reference(log_path)
-    trades = ref.get() or {}
-    now = datetime.now(timezone.utc)
-    cutoff = now - timedelta(hours=age_hours)
-
-    # Expect flat {order_id: ticket}; entries without a parsable timestamp are skipped
-    for trade_id, trade_data in trades.items():
-        timestamp = extract_trade_timestamp(trade_data)
-        if timestamp is None:
-            print(f"Skipping {trade_id}: no valid timestamp found in {log_path}")
+# ====================================================
+# 🟩 Delete / export helpers
+# ====================================================
+def _chunked_delete(paths, dry_run=False):
+    """Remove `paths` (relative to root) in multi-path updates of DELETE_CHUNK. Returns the count removed."""
+    paths = list(paths)
+    if dry_run:
+        return len(paths)
+    done = 0
+    for i in range(0, len(paths), DELETE_CHUNK):
+        chunk = paths[i:i + DELETE_CHUNK]
+        db.reference("/").update({p: None for p in chunk})
+        done += len(chunk)
+    return done
+
+def _export(export_dir, log_path, records):
+    """Append {path: record} pairs to <export_dir>/<log root>-<YYYYMMDD>.jsonl before they are deleted."""
+    if not (export_dir and records):
+        return
+    os.makedirs(export_dir, exist_ok=True)
+    name = log_path.strip("/").split("/")[0]
+    fname = os.path.join(export_dir, f"{name}-{datetime.now(timezone.utc):%Y%m%d}.jsonl")
+    with open(fname, "a") as f:
+        for path, record in records.items():
+            f.write(json.dumps({"path": path, "record": record}, default=str) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def _is_index_error(e):
+    return "index" in str(e).lower()
+
+# ====================================================
+# 🟩 Per-symbol retention
+# ====================================================
+_UNINDEXED = set()
+
+def _ordered(node_path):
+    """Ordered-by-_ts query for `node_path`, or None once Firebase said the index rule is missing."""
+    if node_path in _UNINDEXED:
+        return None
+    return db.reference(node_path).order_by_child(TS_FIELD)
+
+def _scan_node(node_path, cutoff_ms):
+    """Index-less fallback: one full read → (legacy {oid: rec}, expired {oid: rec}), _ts filtered with numpy."""
+    node = db.reference(node_path).get() or {}
+    keys = [k for k, v in node.items() if isinstance(v, dict)]
+    ts = np.array([node[k].get(TS_FIELD) if isinstance(node[k].get(TS_FIELD), (int, float)) else -1
+                   for k in keys], dtype=np.float64)
+    legacy = {keys[i]: node[keys[i]] for i in np.flatnonzero(ts < 0)}
+    expired = {keys[i]: node[keys[i]] for i in np.flatnonzero((ts >= 0) & (ts <= cutoff_ms))}
+    return legacy, expired
+
+def _fetch(node_path, cutoff_ms):
+    """(legacy, expired) for one symbol node: two ordered queries, each returning only what we act on."""
+    query = _ordered(node_path)
+    if query is not None:
+        try:
+            legacy = query.end_at(False).limit_to_first(BACKFILL_BATCH).get() or {}
+            expired = _ordered(node_path).start_at(0).end_at(cutoff_ms).get() or {}
+            return legacy, expired
+        except Exception as e:
+            if not _is_index_error(e):
+                raise
+            _UNINDEXED.add(node_path)
+            metrics.inc("retention_unindexed", path=node_path)
+            print(f"⚠️ [RETENTION] no .indexOn [{TS_FIELD}] for {node_path}; scanning it (add the rule)")
+    return _scan_node(node_path, cutoff_ms)
+
+def _backfill_legacy(node_path, records, cutoff_ms, export_dir=None, dry_run=False):
+    """
+    Un-stamped `records` under `node_path`: stamp _ts from their old timestamp fields, or delete them
+    when already expired. Records with no parsable time are stamped now (they expire one window later).
+    Returns (stamped, deleted).
+    """
+    now_ms = int(time.time() * 1000)
+    rel = node_path.strip("/")
+    stamps, expired = {}, {}
+    for oid, rec in records.items():
+        if not isinstance(rec, dict) or rec.get(TS_FIELD) is not None:
             continue
+        ts = extract_trade_timestamp(rec)
+        ts_ms = int(ts.timestamp() * 1000) if ts else now_ms
+        if ts_ms <= cutoff_ms:
+            expired[f"{rel}/{oid}"] = rec
+        else:
+            stamps[f"{rel}/{oid}/{TS_FIELD}"] = ts_ms
+    if not dry_run:
+        _export(export_dir, node_path, expired)
+        items = list(stamps.items())
+        for i in range(0, len(items), DELETE_CHUNK):
+            db.reference("/").update(dict(items[i:i + DELETE_CHUNK]))
+    return len(stamps), _chunked_delete(expired, dry_run=dry_run)
 
-        if timestamp < cutoff:
-            try:
-                ref.child(trade_id).delete()
-                print(f"Deleted {trade_id} from {log_path} older than {age_hours} hours")
-            except Exception as e:
-                print(f"❌ Failed to delete {trade_id} from {log_path}: {e}")
+def _clean_symbol(log_path, symbol, cutoff_ms, export_dir=None, dry_run=False):
+    """Retention for one /<log>/<symbol> node. Returns (deleted, stamped)."""
+    node_path = f"{log_path}/{symbol}"
+    legacy, expired = _fetch(node_path, cutoff_ms)
+    stamped_n, legacy_deleted = _backfill_legacy(node_path, legacy, cutoff_ms, export_dir, dry_run)
+
+    rel = node_path.strip("/")
+    paths = {f"{rel}/{oid}": rec for oid, rec in expired.items()}
+    if not dry_run:
+        _export(export_dir, node_path, paths)
+    return _chunked_delete(paths, dry_run=dry_run) + legacy_deleted, stamped_n
+
+# ====================================================
+# 🟩 Per-log entry point
+# ====================================================
+def delete_old_trades(log_path, age_hours=DEFAULT_AGE_HOURS, export_dir=None, dry_run=False):
+    """Apply retention to one log root; returns {"deleted": n, "stamped": n, "symbols": n}."""
+    cutoff_ms = int((datetime.now(timezone.utc) - timedelta(hours=age_hours)).timestamp() * 1000)
+    keys = db.reference(log_path).get(shallow=True) or {}
+    symbols = [str(k) for k in keys if not str(k).isdigit() and not str(k).startswith("_")]
+    flat_ids = [str(k) for k in keys if str(k).isdigit()]
+    totals = {"deleted": 0, "stamped": 0, "symbols": len(symbols)}
+
+    for sym in symbols:
+        try:
+            deleted, stamped_n = _clean_symbol(log_path, sym, cutoff_ms, export_dir, dry_run)
+            totals["deleted"] += deleted
+            totals["stamped"] += stamped_n
+        except Exception as e:
+            print(f"❌ [RETENTION] {log_path}/{sym} failed: {e}")
+
+    # Flat-layout leftovers from before the symbol-scoped writers: drain them in bounded batches
+    if flat_ids:
+        try:
+            batch = {oid: db.reference(f"{log_path}/{oid}").get() for oid in flat_ids[:BACKFILL_BATCH]}
+            flat = {}
+            for oid, rec in batch.items():
+                ts = rec.get(TS_FIELD) if isinstance(rec, dict) else None
+                if ts is None:
+                    ts_dt = extract_trade_timestamp(rec)
+                    ts = int(ts_dt.timestamp() * 1000) if ts_dt else None
+                if ts is None:
+                    print(f"Skipping {oid}: no valid timestamp found in {log_path}")
+                elif ts <= cutoff_ms:
+                    flat[f"{log_path.strip('/')}/{oid}"] = rec
+            if not dry_run:
+                _export(export_dir, log_path, flat)
+            totals["deleted"] += _chunked_delete(flat, dry_run=dry_run)
+        except Exception as e:
+            print(f"❌ [RETENTION] flat {log_path} failed: {e}")
+
+    metrics.inc("retention_deleted", totals["deleted"], log=log_path)
+    verb = "would delete" if dry_run else "deleted"
+    print(f"[RETENTION] {log_path}: {verb} {totals['deleted']} record(s) older than {age_hours}h "
+          f"across {totals['symbols']} symbol(s); stamped {totals['stamped']} legacy record(s)")
+    return totals
+
+def prune_ledger_events(age_hours=DEFAULT_AGE_HOURS, dry_run=False):
+    """
+    Drop /ledger/events older than both the cutoff and the symbol's snapshot (through_ms), so rebuilds
+    never need them. Event keys start with the zero-padded ms, so this is a plain key-range query.
+    """
+    cutoff_ms = int((datetime.now(timezone.utc) - timedelta(hours=age_hours)).timestamp() * 1000)
+    removed = 0
+    for sym in (db.reference(LEDGER_EVENTS_ROOT).get(shallow=True) or {}):
+        try:
+            snap_through = db.reference(f"/ledger/snapshots/{sym}/through_ms").get()
+            if not snap_through:
+                continue
+            bound = min(cutoff_ms, int(snap_through))
+            old = (db.reference(f"{LEDGER_EVENTS_ROOT}/{sym}").order_by_key()
+                   .end_at(f"{bound:013d}").get()) or {}
+            removed += _chunked_delete((f"{LEDGER_EVENTS_ROOT.strip('/')}/{sym}/{k}" for k in old),
+                                       dry_run=dry_run)
+        except Exception as e:
+            print(f"❌ [RETENTION] ledger events {sym} failed: {e}")
+    metrics.inc("retention_deleted", removed, log=LEDGER_EVENTS_ROOT)
+    print(f"[RETENTION] {LEDGER_EVENTS_ROOT}: {'would delete' if dry_run else 'deleted'} {removed} folded event(s)")
+    return removed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Delete expired trade-log records (index-backed)")
+    parser.add_argument("--hours", type=float, default=DEFAULT_AGE_HOURS)
+    parser.add_argument("--export", metavar="DIR", help="append expired records to DIR/<log>-<date>.jsonl first")
+    parser.add_argument("--dry-run", action="store_true", help="report counts, write nothing")
+    parser.add_argument("--skip-ledger", action="store_true", help="leave /ledger/events alone")
+    args = parser.parse_args(argv)
+
+    for log_path in LOG_ROOTS:
+        delete_old_trades(log_path, age_hours=args.hours, export_dir=args.export, dry_run=args.dry_run)
+    if not args.skip_ledger:
+        prune_ledger_events(age_hours=args.hours, dry_run=args.dry_run)
+    metrics.maybe_dump()
 
 if __name__ == "__main__":
-    delete_old_trades("/ghost_trades_log")
-    delete_old_trades("/zombie_trades_log")
-    delete_old_trades("/archived_trades_log")
-    delete_old_trades("/exit_orders_log")  # added
\ No newline at end of file
+    main(sys.argv[1:])
+
+#=========================  CLEAN_GHOST_TRADES (END OF SCRIPT)  ================================
@@ -0,0 +1,446 @@
+#=========================  DATASTORE - LOCAL RTDB-COMPATIBLE BACKENDS (MEMORY / SQLITE)  ================================
+# firebase_client.firebase_db is the one seam every module talks to. FIREBASE_BACKEND picks what sits behind it:
+#
+#   FIREBASE_BACKEND=firebase   (default) the production RTDB through firebase_admin
+#   FIREBASE_BACKEND=memory     in-process tree; per-process only (one loop, unit-style soak runs)
+#   FIREBASE_BACKEND=sqlite     leaf table in DATASTORE_SQLITE_PATH; shared by every process on the box, so
+#                               app + monitor (+ shards) + push_orders can be soak-tested together
+#
+# Both local backends speak the subset of firebase_admin.db the repo uses, with RTDB semantics:
+#   reference(path) → child / get(etag, shallow) / set / update (multi-path) / delete / push / transaction
+#                     get_if_changed / set_if_unchanged / order_by_child|key|value → start_at / end_at /
+#                     equal_to / limit_to_first / limit_to_last → get
+#   writes of None or {} delete (and empty parents vanish); server values {".sv": "timestamp"} and
+#   {".sv": {"increment": n}} resolve atomically against the stored value; integer-keyed maps read back as lists; query
+#   ordering is null < false < true < numbers < strings < objects, ties by key.
+#
+# Load-test knobs (applied to every round trip of the local backends):
+#   DATASTORE_LATENCY_MS / DATASTORE_JITTER_MS   sleep per op (uniform jitter on top)
+#   DATASTORE_FAIL_RATE                          probability an op raises DatastoreError before touching data
+#   DATASTORE_FAIL_OPS                           comma list of ops eligible for failure (default: all)
+#   DATASTORE_SEED                               RNG seed → deterministic latency/failure sequence
+#   DATASTORE_IMPORT_JSON                        JSON export loaded at startup when the store is empty
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_SQLITE_PATH = "local_rtdb.sqlite3"
+_PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+class DatastoreError(Exception):
+    """Raised by the local backends for injected failures (stands in for a transport error)."""
+
+# ====================================================
+# 🟩 Tree helpers (RTDB value model)
+# ====================================================
+def _parts(path):
+    return [p for p in str(path or "").split("/") if p]
+
+def _normalize(value):
+    """JSON-compatible copy with RTDB storage rules: str keys, lists → index maps, None/{} dropped."""
+    if isinstance(value, (list, tuple)):
+        value = {str(i): v for i, v in enumerate(value)}
+    if isinstance(value, dict):
+        out = {}
+        for k, v in value.items():
+            v = _normalize(v)
+            if v is not None:
+                out[str(k)] = v
+        return out or None
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+def _arrayify(value):
+    """Read-side RTDB rule: a map whose keys are mostly-dense integers comes back as a list."""
+    if not isinstance(value, dict):
+        return value
+    value = {k: _arrayify(v) for k, v in value.items()}
+    if value and all(k.isdigit() and (k == "0" or not k.startswith("0")) for k in value):
+        idx = [int(k) for k in value]
+        if max(idx) < 2 * len(idx):
+            out = [None] * (max(idx) + 1)
+            for k, v in value.items():
+                out[int(k)] = v
+            return out
+    return value
+
+def _etag(value):
+    return hashlib.md5(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+def _has_server_value(value):
+    return isinstance(value, dict) and (".sv" in value or any(_has_server_value(v) for v in value.values()))
+
+def _resolve_server_values(store, parts, value, now_ms):
+    """Replace {".sv": ...} placeholders under `parts` with their values (caller holds store.critical())."""
+    if not isinstance(value, dict):
+        return value
+    if ".sv" in value:
+        sv = value[".sv"]
+        if sv == "timestamp":
+            return now_ms
+        if isinstance(sv, dict) and "increment" in sv:
+            cur = store.read(parts)
+            base = cur if isinstance(cur, (int, float)) and not isinstance(cur, bool) else 0
+            return base + sv["increment"]
+        raise ValueError(f"unsupported server value: {sv!r}")
+    return {k: _resolve_server_values(store, parts + _parts(k), v, now_ms) for k, v in value.items()}
+
+def _push_id(now_ms, rng):
+    stamp = ""
+    for _ in range(8):
+        stamp = _PUSH_CHARS[now_ms % 64] + stamp
+        now_ms //= 64
+    return stamp + "".join(rng.choice(_PUSH_CHARS) for _ in range(12))
+
+# ====================================================
+# 🟩 Stores: read(parts) / write([(parts, value)]) / critical()
+# ====================================================
+class _Store:
+    def __init__(self):
+        self.latency_s = float(os.getenv("DATASTORE_LATENCY_MS", "0")) / 1000.0
+        self.jitter_s = float(os.getenv("DATASTORE_JITTER_MS", "0")) / 1000.0
+        self.fail_rate = float(os.getenv("DATASTORE_FAIL_RATE", "0"))
+        ops = os.getenv("DATASTORE_FAIL_OPS", "").strip()
+        self.fail_ops = {o.strip() for o in ops.split(",") if o.strip()} or None
+        seed = os.getenv("DATASTORE_SEED")
+        self.rng = random.Random(int(seed) if seed else None)
+        self._rng_lock = threading.Lock()
+
+    def io(self, op):
+        """Latency + failure injection for one round trip."""
+        with self._rng_lock:
+            delay = self.latency_s + (self.rng.uniform(0, self.jitter_s) if self.jitter_s else 0.0)
+            fail = self.fail_rate > 0 and (self.fail_ops is None or op in self.fail_ops) \
+                and self.rng.random() < self.fail_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise DatastoreError(f"injected {op} failure")
+
+    def import_json(self, path):
+        if path and os.path.exists(path) and self.read([]) is None:
+            with open(path) as f:
+                self.write([([], json.load(f))])
+            print(f"[DATASTORE] imported {path}")
+
+class MemoryStore(_Store):
+    def __init__(self):
+        super().__init__()
+        self._root = None
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def critical(self):
+        with self._lock:
+            yield
+
+    def read(self, parts):
+        with self._lock:
+            node = self._root
+            for p in parts:
+                if not isinstance(node, dict) or p not in node:
+                    return None
+                node = node[p]
+            return json.loads(json.dumps(node)) if node is not None else None
+
+    def write(self, items):
+        with self._lock:
+            for parts, value in items:
+                self._root = self._set(self._root, parts, _normalize(value))
+
+    def _set(self, node, parts, value):
+        """Write in place (reads hand out copies), pruning parents left empty."""
+        if not parts:
+            return value
+        node = node if isinstance(node, dict) else {}
+        child = self._set(node.get(parts[0]), parts[1:], value)
+        if child is None:
+            node.pop(parts[0], None)
+        else:
+            node[parts[0]] = child
+        return node or None
+
+class SqliteStore(_Store):
+    """Leaf-per-row store: (path 'a/b/c', JSON scalar). Empty parents cannot exist by construction."""
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path or os.getenv("DATASTORE_SQLITE_PATH", DEFAULT_SQLITE_PATH)
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS leaves (path TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._lock = threading.RLock()
+        self._depth = 0
+
+    @contextmanager
+    def critical(self):
+        """One SQLite write transaction (BEGIN IMMEDIATE): atomic across threads AND processes."""
+        with self._lock:
+            outer = self._depth == 0
+            if outer:
+                self._conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if outer:
+                    self._conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if outer:
+                self._conn.execute("COMMIT")
+
+    def _rows(self, key):
+        if not key:
+            return self._conn.execute("SELECT path, value FROM leaves").fetchall()
+        return self._conn.execute(
+            "SELECT path, value FROM leaves WHERE path = ? OR (path >= ? AND path < ?)",
+            (key, key + "/", key + "0")).fetchall()
+
+    def read(self, parts):
+        key = "/".join(parts)
+        with self._lock:
+            rows = self._rows(key)
+        if not rows:
+            return None
+        tree = None
+        for path, raw in rows:
+            rel = _parts(path[len(key):]) if key else _parts(path)
+            value = json.loads(raw)
+            if not rel:
+                return value
+            tree = tree if isinstance(tree, dict) else {}
+            node = tree
+            for p in rel[:-1]:
+                node = node.setdefault(p, {})
+            node[rel[-1]] = value
+        return tree
+
+    def _flatten(self, prefix, value, out):
+        if isinstance(value, dict):
+            for k, v in value.items():
+                self._flatten(f"{prefix}/{k}" if prefix else k, v, out)
+        elif value is not None:
+            out.append((prefix, json.dumps(value)))
+
+    def write(self, items):
+        with self.critical():
+            for parts, value in items:
+                key = "/".join(parts)
+                if key:
+                    ancestors = ["/".join(parts[:i]) for i in range(1, len(parts))]
+                    self._conn.execute(
+                        "DELETE FROM leaves WHERE path = ? OR (path >= ? AND path < ?)", (key, key + "/", key + "0"))
+                    for a in ancestors:                       # a scalar at an ancestor is replaced
+                        self._conn.execute("DELETE FROM leaves WHERE path = ?", (a,))
+                else:
+                    self._conn.execute("DELETE FROM leaves")
+                leaves = []
+                self._flatten(key, _normalize(value), leaves)
+                self._conn.executemany("INSERT OR REPLACE INTO leaves (path, value) VALUES (?, ?)", leaves)
+
+# ====================================================
+# 🟩 firebase_admin.db-compatible Reference / Query
+# ====================================================
+def _rank(value):
+    if value is None:
+        return (0, 0, "")
+    if value is False:
+        return (1, 0, "")
+    if value is True:
+        return (2, 0, "")
+    if isinstance(value, (int, float)):
+        return (3, value, "")
+    if isinstance(value, str):
+        return (4, 0, value)
+    return (5, 0, "")
+
+def _key_rank(key):
+    key = str(key)
+    digits = key.lstrip("-")
+    if digits.isdigit() and (digits == "0" or not digits.startswith("0")) and abs(int(key)) < 2 ** 31:
+        return (0, int(key), "")
+    return (1, 0, key)
+
+class Reference:
+    def __init__(self, store, path="/"):
+        self._store = store
+        self._parts = _parts(path)
+        self.path = "/" + "/".join(self._parts)
+        self.key = self._parts[-1] if self._parts else None
+
+    @property
+    def parent(self):
+        return Reference(self._store, "/".join(self._parts[:-1])) if self._parts else None
+
+    def child(self, path):
+        return Reference(self._store, "/".join(self._parts + _parts(path)))
+
+    def _read(self):
+        return _arrayify(self._store.read(self._parts))
+
+    def get(self, etag=False, shallow=False):
+        self._store.io("get")
+        value = self._read()
+        if shallow and isinstance(value, (dict, list)):
+            items = value.items() if isinstance(value, dict) else enumerate(value)
+            value = {str(k): (True if isinstance(v, (dict, list)) else v) for k, v in items if v is not None}
+        return (value, _etag(value)) if etag else value
+
+    def _write(self, items):
+        if not any(_has_server_value(v) for _, v in items):
+            self._store.write(items)
+            return
+        now_ms = int(time.time() * 1000)
+        with self._store.critical():
+            self._store.write([(p, _resolve_server_values(self._store, p, v, now_ms)) for p, v in items])
+
+    def set(self, value):
+        self._store.io("set")
+        self._write([(self._parts, value)])
+
+    def update(self, value):
+        if not isinstance(value, dict) or not value:
+            raise ValueError("Value argument must be a non-empty dictionary.")
+        self._store.io("update")
+        self._write([(self._parts + _parts(k), v) for k, v in value.items()])
+
+    def delete(self):
+        self._store.io("delete")
+        self._store.write([(self._parts, None)])
+
+    def push(self, value=""):
+        self._store.io("push")
+        with self._store._rng_lock:
+            key = _push_id(int(time.time() * 1000), self._store.rng)
+        ref = self.child(key)
+        if value != "":
+            self._store.write([(ref._parts, value)])
+        return ref
+
+    def transaction(self, transaction_update):
+        """Read → fn → write as one critical section (exceptions from fn abort and propagate)."""
+        self._store.io("transaction")
+        with self._store.critical():
+            new = transaction_update(self._read())
+            self._store.write([(self._parts, new)])
+        return new
+
+    def get_if_changed(self, etag):
+        self._store.io("get_if_changed")
+        value = self._read()
+        new = _etag(value)
+        return (False, None, None) if new == etag else (True, value, new)
+
+    def set_if_unchanged(self, expected_etag, value):
+        self._store.io("set_if_unchanged")
+        with self._store.critical():
+            current = self._read()
+            if _etag(current) != expected_etag:
+                return False, current, _etag(current)
+            self._store.write([(self._parts, value)])
+        return True, value, _etag(_arrayify(_normalize(value)))
+
+    def order_by_child(self, path):
+        return Query(self, "child", path)
+
+    def order_by_key(self):
+        return Query(self, "key")
+
+    def order_by_value(self):
+        return Query(self, "value")
+
+class Query:
+    def __init__(self, ref, order_by, child=None):
+        self._ref = ref
+        self._order_by = order_by
+        self._child = _parts(child)
+        self._start = self._end = None
+        self._limit = None
+
+    def _bound(self, value):
+        if value is None:
+            raise ValueError("Start/end/equal_to value must not be None.")
+        return value
+
+    def start_at(self, start):
+        self._start = self._bound(start)
+        return self
+
+    def end_at(self, end):
+        self._end = self._bound(end)
+        return self
+
+    def equal_to(self, value):
+        self._start = self._end = self._bound(value)
+        return self
+
+    def limit_to_first(self, limit):
+        self._limit = ("first", int(limit))
+        return self
+
+    def limit_to_last(self, limit):
+        self._limit = ("last", int(limit))
+        return self
+
+    def _sort_value(self, key, value):
+        if self._order_by == "key":
+            return _key_rank(key)
+        if self._order_by == "child":
+            for p in self._child:
+                value = value.get(p) if isinstance(value, dict) else None
+        return _rank(value)
+
+    def get(self):
+        self._ref._store.io("query")
+        node = self._ref._read()
+        if isinstance(node, list):
+            node = {str(i): v for i, v in enumerate(node) if v is not None}
+        if not isinstance(node, dict):
+            return {}
+        bound = _key_rank if self._order_by == "key" else _rank
+        items = sorted(node.items(), key=lambda kv: (self._sort_value(*kv), _key_rank(kv[0])))
+        out = [(k, v) for k, v in items
+               if (self._start is None or self._sort_value(k, v) >= bound(self._start))
+               and (self._end is None or self._sort_value(k, v) <= bound(self._end))]
+        if self._limit:
+            side, n = self._limit
+            out = out[:n] if side == "first" else out[-n:]
+        return dict(out)
+
+# ====================================================
+# 🟩 Backend selection (one store per process)
+# ====================================================
+class LocalDB:
+    """What init_firebase() returns for the local backends: .reference(path) like firebase_admin.db."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def reference(self, path="/"):
+        return Reference(self.store, path)
+
+_backends = {}
+
+def get_backend(name):
+    name = (name or "").strip().lower()
+    if name not in _backends:
+        if name == "memory":
+            store = MemoryStore()
+        elif name == "sqlite":
+            store = SqliteStore()
+        else:
+            raise ValueError(f"unknown FIREBASE_BACKEND: {name!r} (firebase | memory | sqlite)")
+        store.import_json(os.getenv("DATASTORE_IMPORT_JSON"))
+        _backends[name] = LocalDB(store)
+        print(f"[DATASTORE] using local {name} backend")
+    return _backends[name]
+
+#=========================  DATASTORE (END OF SCRIPT)  ================================
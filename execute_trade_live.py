@@ -4,41 +4,24 @@ import os
 import json
 import time
 from datetime import datetime
-from tigeropen.tiger_open_config import TigerOpenClientConfig
-from tigeropen.trade.trade_client import TradeClient
-from tigeropen.trade.domain.contract import Contract
-from tigeropen.trade.domain.order import Order
-import firebase_admin
-from firebase_admin import db
-
-# ---------------------------
-# your Tiger Trade account number
-ACCOUNT = "21807597867063647"  
-
-# Firebase DB reference shortcut
-firebase_db = db
-
-# ===================================
-# 🟩 TIGER API CLIENT INIT (RUN ONCE)
-# ===================================
-try:
-    config = TigerOpenClientConfig()  # Locked: do not modify config loading
-    config.env = 'PROD'
-    config.language = 'en_US'
-
-    if not config.account:
-        raise ValueError("Tiger config loaded but account is missing or blank.")
-
-    client = TradeClient(config)
-    print("✅ Tiger API client initialized successfully")
-except Exception as e:
-    print(f"❌ Failed to load Tiger API config or initialize client: {e}")
-    sys.exit(1)
+from firebase_client import firebase_db
+from tiger_client import ACCOUNT, get_client
+import broker_exits
+import trade_journal
+
+# The Tiger client is built lazily on the first order (see tiger_client.get_client),
+# so importing this module never touches the network and never exits the process.
+#
+# Every order is journaled (trade_journal): intent before place_order, order id as soon as Tiger
+# returns it, fill once transactions arrive. The returned dict carries "journal_id" so the caller
+# can journal the Firebase commit; trade_journal.recover() finishes anything a crash interrupted.
 
 # ==========================
 # 🟩 CONTRACT CREATION HELPER
 # ==========================
 def get_contract(symbol: str):
+    from tigeropen.trade.domain.contract import Contract
+
     contract = Contract()
     contract.symbol = symbol
 
@@ -55,11 +38,33 @@ def get_contract(symbol: str):
 
     return contract
 
+# ==========================
+# 🟩 EXECUTIONS → ONE FILL (an order can fill in several executions)
+# ==========================
+def filled_quantity(transactions):
+    return sum(int(t.filled_quantity or 0) for t in (transactions or []))
+
+def aggregate_fills(transactions):
+    """Tiger executions of one order → (action, total quantity, VWAP price, latest transacted_at)."""
+    quantity = filled_quantity(transactions)
+    if len(transactions) == 1:
+        t = transactions[0]
+        return t.action, t.filled_quantity, t.filled_price, t.transacted_at
+    filled_price = round(sum(float(t.filled_price) * int(t.filled_quantity or 0) for t in transactions)
+                         / max(1, quantity), 6)
+    latest = max(transactions, key=lambda t: str(t.transacted_at)).transacted_at
+    return transactions[0].action, quantity, filled_price, latest
+
 # ==========================
 # 🟩 PLACE ENTRY TRADE FUNCTION (Calls execute_entry_trade)
 # ==========================
 def place_entry_trade(symbol, action, quantity, db):
-    global client
+    from tigeropen.trade.domain.order import Order
+    try:
+        client = get_client()
+    except Exception as e:
+        print(f"❌ Failed to load Tiger API config or initialize client: {e}")
+        return {"status": "ERROR", "reason": str(e)}
     print(f"[DEBUG] place_entry_trade called with client id: {id(client)}")
     print(f"[DEBUG] place_entry_trade client type: {type(client)}")
 
@@ -77,12 +82,14 @@ def place_entry_trade(symbol, action, quantity, db):
     )
     print(f"[DEBUG] Created market order: {symbol} {action} {quantity}")
 
+    journal_id = trade_journal.begin("entry", symbol, action, quantity)
     try:
         response = client.place_order(order)
         print(f"[DEBUG] Tiger order response (entry): {response}")
         print(f"[DEBUG] Full order placement response: {response}")
     except Exception as e:
         print(f"[ERROR] Exception placing entry order: {e}")
+        trade_journal.record(journal_id, "aborted", reason=str(e))
         return {"status": "ERROR", "reason": str(e)}
 
     order_id = None
@@ -95,9 +102,11 @@ def place_entry_trade(symbol, action, quantity, db):
 
     if not order_id:
         print("[ERROR] Failed to parse order ID for entry trade")
+        trade_journal.record(journal_id, "aborted", reason="no_order_id")
         return {"status": "REJECTED", "reason": "No order ID returned from Tiger"}
 
     print(f"[INFO] Entry order placed with order_id: {order_id}")
+    trade_journal.record(journal_id, "ordered", order_id=order_id)
 
     try:
         max_retries = 5
@@ -130,8 +139,15 @@ def place_entry_trade(symbol, action, quantity, db):
             "quantity": quantity,
             "filled_price": filled_price,
             "transaction_time": transaction_time,
+            "journal_id": journal_id,
         }
+        trade_journal.record(journal_id, "filled", fill=tx_dict)
         print(f"[DEBUG] Transaction dict prepared: {tx_dict}")
+
+        # Broker-native exit engine: attach STP/TRAIL/bracket children now that the entry price is known
+        if broker_exits.enabled():
+            tx_dict["broker_exit"] = broker_exits.attach(client, contract, ACCOUNT, symbol, action, quantity,
+                                                         filled_price, order_id, db)
         return tx_dict
 
     except Exception as e:
@@ -145,7 +161,12 @@ def place_entry_trade(symbol, action, quantity, db):
 # 🟩 PLACE EXIT TRADE FUNCTION (Calls execute_exit_trade, fetches full transaction info)
 # ======================================================================================
 def place_exit_trade(symbol, action, quantity, db):
-    global client
+    from tigeropen.trade.domain.order import Order
+    try:
+        client = get_client()
+    except Exception as e:
+        print(f"❌ Failed to load Tiger API config or initialize client: {e}")
+        return {"status": "ERROR", "reason": str(e)}
     print(f"[DEBUG] place_exit_trade called with client id: {id(client)}")
     print(f"[DEBUG] place_exit_trade client type: {type(client)}")
 
@@ -163,11 +184,13 @@ def place_exit_trade(symbol, action, quantity, db):
     )
     print(f"📦 Placing EXIT market order: {symbol} {action} {quantity}")
 
+    journal_id = trade_journal.begin("exit", symbol, action, quantity)
     try:
         response = client.place_order(order)
         print(f"🐯 Tiger order response (exit): {response}")
     except Exception as e:
         print(f"❌ Exception placing exit order: {e}")
+        trade_journal.record(journal_id, "aborted", reason=str(e))
         return {"status": "ERROR", "reason": str(e)}
 
     order_id = None
@@ -178,9 +201,11 @@ def place_exit_trade(symbol, action, quantity, db):
 
     if not order_id:
         print("🛑 Failed to parse order ID for exit trade")
+        trade_journal.record(journal_id, "aborted", reason="no_order_id")
         return {"status": "REJECTED", "reason": "No order ID returned from Tiger"}
 
     print(f"✅ Exit order placed with order_id: {order_id}")
+    trade_journal.record(journal_id, "ordered", order_id=order_id)
 
     # --- Fetch transaction details matching this exit order_id ---
     try:
@@ -188,8 +213,9 @@ def place_exit_trade(symbol, action, quantity, db):
         retry_count = 0
         transactions = client.get_transactions(order_id=order_id)
 
-        while len(transactions) == 0 and retry_count < max_retries:
-            print(f"[DEBUG] No transactions found for order_id {order_id}, retrying in 2 seconds...")
+        # a multi-contract exit can fill in several executions: wait for all of them
+        while filled_quantity(transactions) < int(quantity) and retry_count < max_retries:
+            print(f"[DEBUG] Exit {order_id} not fully filled yet ({len(transactions)} execution(s)), retrying in 2 seconds...")
             time.sleep(2)
             transactions = client.get_transactions(order_id=order_id)
             retry_count += 1
@@ -200,10 +226,8 @@ def place_exit_trade(symbol, action, quantity, db):
 
         print(f"New order is {transactions}")
 
-        action = transactions[0].action
-        quantity = transactions[0].filled_quantity
-        filled_price = transactions[0].filled_price
-        transaction_time = transactions[0].transacted_at
+        # one ticket for the whole order: total quantity at the volume-weighted fill price
+        action, quantity, filled_price, transaction_time = aggregate_fills(transactions)
 
         tx_dict = {
             "status": "SUCCESS",
@@ -214,7 +238,9 @@ def place_exit_trade(symbol, action, quantity, db):
             "quantity": quantity,
             "filled_price": filled_price,
             "transaction_time": transaction_time,
+            "journal_id": journal_id,
         }
+        trade_journal.record(journal_id, "filled", fill=tx_dict)
         print(f"[DEBUG] Transaction dict prepared: {tx_dict}")
         return tx_dict
 
@@ -244,6 +270,12 @@ def main():
 
     trade_type = sys.argv[4].upper()
 
+    try:
+        get_client()
+    except Exception as e:
+        print(f"❌ Failed to load Tiger API config or initialize client: {e}")
+        sys.exit(1)
+
     print(f"🚀 CLI launch: Placing {trade_type} trade with symbol={symbol}, action={action}, quantity={quantity}")
 
     # Use place_entry_trade or place_exit_trade depending on trade_type
@@ -0,0 +1,432 @@
+#=========================  FAKE_TIGER - LOCAL BROKER SIMULATOR (TradeClient STAND-IN)  ================================
+# TIGER_BACKEND=sim makes tiger_client.get_client() return a SimBroker instead of tigeropen's TradeClient,
+# so execute_trade_live / push_orders / push_live_positions / fill_stream run end to end with no network.
+#
+# Implements the calls the bridge makes:
+#   place_order(order) → id        get_orders(...)        get_order(id=)        cancel_order(id=)
+#   get_transactions(order_id= | symbol=, start_time=, end_time=, limit=)       get_positions(...)
+# Orders: MKT, LMT, STP, TRAIL (aux_price = trailing amount). Objects carry the attribute names the repo
+# reads from tigeropen (id, status as OrderStatus.X, filled, avg_fill_price, is_open, source, liquidation,
+# order_time/update_time ms, contract 'SYM/FUT/USD/None'; transactions: id, order_id, filled_quantity,
+# filled_price, transacted_at, transaction_time).
+#
+# Lifecycle (advanced lazily on every API call, against the price feed):
+#   place_order  → rejected (raises) with TIGER_SIM_REJECT_RATE
+#                → EXPIRED "LACK_OF_MARGIN" when the resulting |position| would exceed TIGER_SIM_MAX_POSITION
+#                → EXPIRED at random with TIGER_SIM_EXPIRE_RATE
+#                → else NEW; fills after TIGER_SIM_FILL_LATENCY_MS once its price condition holds,
+#                  in 2+ executions with TIGER_SIM_PARTIAL_RATE (TIGER_SIM_PARTIAL_GAP_MS apart)
+#   liquidation  → an adverse move of TIGER_SIM_LIQ_POINTS from the average cost flattens the position with a
+#                  liquidation order (source 'liquidation', liquidation=True); liquidate(symbol) forces one
+#
+# Price feed (TIGER_SIM_PRICES): walk (default; seeded random walk from TIGER_SIM_START_PRICE) |
+# firebase (/live_prices/{symbol}/price — drive it with app.py price_update webhooks) | csv:<path> (backtest
+# format, replayed in a loop on wall-clock time) | fixed:<price>.
+#
+# State is per process unless TIGER_SIM_STATE names a JSON file: then every call runs under an exclusive
+# file lock on it, so app, monitor and push_orders all see one broker. TIGER_SIM_SEED makes a run repeatable.
+import enum
+import fcntl
+import json
+import math
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+TICK_SIZE = 0.1
+MAX_KEPT = 5000             # orders / transactions kept in the state (oldest dropped first)
+
+class OrderStatus(enum.Enum):
+    """Same member names as tigeropen's OrderStatus: str() → 'OrderStatus.FILLED'."""
+    PENDING_NEW = "PendingNew"
+    NEW = "Initial"
+    HELD = "Submitted"
+    PARTIALLY_FILLED = "PartiallyFilled"
+    FILLED = "Filled"
+    CANCELLED = "Cancelled"
+    EXPIRED = "Inactive"
+
+OPEN_STATUSES = {"PENDING_NEW", "NEW", "HELD", "PARTIALLY_FILLED"}
+
+class SimRejected(Exception):
+    """place_order refused (what tigeropen raises as an ApiException)."""
+
+def _env(name, default):
+    return type(default)(os.getenv(name, default))
+
+# ====================================================
+# 🟩 Returned objects (attribute bags shaped like tigeropen's)
+# ====================================================
+class SimContract:
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.sec_type = "FUT"
+        self.currency = "USD"
+
+    def __str__(self):
+        return f"{self.symbol}/FUT/USD/None"
+
+    __repr__ = __str__
+
+class _Bag:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.__dict__!r})"
+
+class SimOrder(_Bag):
+    pass
+
+class SimTransaction(_Bag):
+    pass
+
+class SimPosition(_Bag):
+    pass
+
+# ====================================================
+# 🟩 Price feeds
+# ====================================================
+class WalkFeed:
+    """Seeded Gaussian walk; the last price lives in the broker state so processes share one path."""
+
+    def __init__(self, start, vol_per_s):
+        self.start = start
+        self.vol = vol_per_s
+
+    def price(self, symbol, state, rng, now_ms):
+        node = state["prices"].setdefault(symbol, {"price": self.start, "ms": now_ms})
+        dt = max(0.0, (now_ms - node["ms"]) / 1000.0)
+        if dt:
+            node["price"] = max(TICK_SIZE, node["price"] + rng.gauss(0.0, self.vol * math.sqrt(dt)))
+            node["ms"] = now_ms
+        return node["price"]
+
+class FirebaseFeed:
+    def price(self, symbol, state, rng, now_ms):
+        from firebase_client import firebase_db
+        node = firebase_db.reference(f"/live_prices/{symbol}").get()
+        px = node.get("price") if isinstance(node, dict) else node
+        return float(px) if px is not None else state["prices"].get(symbol, {}).get("price")
+
+class CsvFeed:
+    def __init__(self, path):
+        import backtest
+        series = backtest.load_prices_csv(path)
+        self.ts = [int(t) for t in series["ts_ms"]]
+        self.px = [float(p) for p in series["price"]]
+        self.t0 = None
+
+    def price(self, symbol, state, rng, now_ms):
+        import bisect
+        if not self.ts:
+            return None
+        span = max(1, self.ts[-1] - self.ts[0])
+        self.t0 = self.t0 or now_ms
+        i = bisect.bisect_right(self.ts, self.ts[0] + (now_ms - self.t0) % span) - 1
+        return self.px[max(0, i)]
+
+class FixedFeed:
+    def __init__(self, px):
+        self.px = px
+
+    def price(self, symbol, state, rng, now_ms):
+        return self.px
+
+def feed_from_env():
+    spec = os.getenv("TIGER_SIM_PRICES", "walk")
+    if spec == "firebase":
+        return FirebaseFeed()
+    if spec.startswith("csv:"):
+        return CsvFeed(spec[4:])
+    if spec.startswith("fixed:"):
+        return FixedFeed(float(spec[6:]))
+    return WalkFeed(_env("TIGER_SIM_START_PRICE", 3400.0), _env("TIGER_SIM_VOL_PER_S", 0.3))
+
+# ====================================================
+# 🟩 Broker
+# ====================================================
+class SimBroker:
+    def __init__(self, feed=None, state_path=None, seed=None, account="SIM"):
+        self.feed = feed or feed_from_env()
+        self.state_path = state_path if state_path is not None else os.getenv("TIGER_SIM_STATE")
+        self.account = account
+        self.fill_latency_ms = _env("TIGER_SIM_FILL_LATENCY_MS", 250)
+        self.partial_rate = _env("TIGER_SIM_PARTIAL_RATE", 0.0)
+        self.partial_gap_ms = _env("TIGER_SIM_PARTIAL_GAP_MS", 500)
+        self.reject_rate = _env("TIGER_SIM_REJECT_RATE", 0.0)
+        self.expire_rate = _env("TIGER_SIM_EXPIRE_RATE", 0.0)
+        self.max_position = _env("TIGER_SIM_MAX_POSITION", 10)
+        self.liq_points = _env("TIGER_SIM_LIQ_POINTS", 0.0)
+        self.slippage_ticks = _env("TIGER_SIM_SLIPPAGE_TICKS", 0)
+        seed = seed if seed is not None else os.getenv("TIGER_SIM_SEED")
+        self._seed = int(seed) if seed not in (None, "") else None
+        self._lock = threading.RLock()
+        self._state = None
+
+    # ---------- state ----------
+    def _fresh_state(self):
+        base = int(time.time() * 1000) * 1000
+        rng = random.Random(self._seed)
+        return {"orders": {}, "transactions": [], "prices": {}, "next_id": base,
+                "rng": [rng.getstate()[0], list(rng.getstate()[1]), rng.getstate()[2]]}
+
+    @contextmanager
+    def _session(self):
+        """Exclusive access to the state (+ a seeded RNG restored from it), saved on exit."""
+        with self._lock:
+            if not self.state_path:
+                self._state = self._state or self._fresh_state()
+                state = self._state
+                f = None
+            else:
+                f = open(self.state_path, "a+")
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                raw = f.read()
+                state = json.loads(raw) if raw.strip() else self._fresh_state()
+            rng = random.Random()
+            v, internal, gauss = state["rng"]
+            rng.setstate((v, tuple(internal), gauss))
+            try:
+                yield state, rng
+            finally:
+                s = rng.getstate()
+                state["rng"] = [s[0], list(s[1]), s[2]]
+                if f is not None:
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f)
+                    f.flush()
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                    f.close()
+
+    def _new_id(self, state):
+        state["next_id"] += 1
+        return state["next_id"]
+
+    # ---------- price / position ----------
+    def _px(self, symbol, state, rng, now_ms):
+        px = self.feed.price(symbol, state, rng, now_ms)
+        if px is None:
+            raise SimRejected(f"no price for {symbol}")
+        node = state["prices"].setdefault(symbol, {"price": px, "ms": now_ms})
+        if not isinstance(self.feed, WalkFeed):
+            node.update(price=px, ms=now_ms)
+        node["high"] = max(node.get("high", px), px)
+        node["low"] = min(node.get("low", px), px)
+        return px
+
+    @staticmethod
+    def _position(state, symbol):
+        """(signed qty, average cost) from the executions."""
+        qty, cost = 0, 0.0
+        for t in state["transactions"]:
+            if t["symbol"] != symbol:
+                continue
+            signed = t["filled_quantity"] if t["action"] == "BUY" else -t["filled_quantity"]
+            if qty == 0 or (qty > 0) == (signed > 0):
+                cost = (cost * abs(qty) + t["filled_price"] * abs(signed)) / (abs(qty) + abs(signed))
+            elif abs(signed) > abs(qty):
+                cost = t["filled_price"]
+            qty += signed
+        return qty, (cost if qty else 0.0)
+
+    # ---------- lifecycle ----------
+    def _triggered(self, o, px):
+        buy = o["action"] == "BUY"
+        if o["order_type"] == "MKT" or o.get("triggered"):
+            return True
+        if o["order_type"] == "LMT":
+            return px <= o["limit_price"] if buy else px >= o["limit_price"]
+        if o["order_type"] == "STP":
+            return px >= o["aux_price"] if buy else px <= o["aux_price"]
+        if o["order_type"] == "TRAIL":
+            ext = o.setdefault("extreme", px)
+            o["extreme"] = min(ext, px) if buy else max(ext, px)
+            return px - o["extreme"] >= o["aux_price"] if buy else o["extreme"] - px >= o["aux_price"]
+        return False
+
+    def _fill_price(self, o, px, rng):
+        if o["order_type"] == "LMT":
+            return o["limit_price"]
+        slip = rng.randint(0, self.slippage_ticks) * TICK_SIZE if self.slippage_ticks else 0.0
+        return round(px + slip if o["action"] == "BUY" else px - slip, 6)
+
+    def _execute(self, state, o, qty, price, now_ms):
+        t = {
+            "id": self._new_id(state), "order_id": o["id"], "account": self.account, "symbol": o["symbol"],
+            "action": o["action"], "filled_quantity": qty, "filled_price": price,
+            "transaction_time": now_ms,
+            "transacted_at": datetime.fromtimestamp(now_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        state["transactions"].append(t)
+        o["avg_fill_price"] = (o["avg_fill_price"] * o["filled"] + price * qty) / (o["filled"] + qty)
+        o["filled"] += qty
+        o["update_time"] = o["trade_time"] = now_ms
+        o["status"] = "FILLED" if o["filled"] >= o["quantity"] else "PARTIALLY_FILLED"
+
+    def _advance(self, state, rng, now_ms):
+        for o in list(state["orders"].values()):
+            if o["status"] not in OPEN_STATUSES or now_ms < o["fill_at"]:
+                continue
+            px = self._px(o["symbol"], state, rng, now_ms)
+            if not self._triggered(o, px):
+                continue
+            o["triggered"] = True
+            remaining = o["quantity"] - o["filled"]
+            part = remaining
+            if remaining > 1 and rng.random() < self.partial_rate:
+                part = rng.randint(1, remaining - 1)
+            self._execute(state, o, part, self._fill_price(o, px, rng), now_ms)
+            if o["status"] == "PARTIALLY_FILLED":
+                o["fill_at"] = now_ms + self.partial_gap_ms
+        if self.liq_points:
+            for symbol in list(state["prices"]):
+                self._check_liquidation(state, rng, symbol, now_ms)
+        for key, cap in (("transactions", MAX_KEPT),):
+            if len(state[key]) > cap:
+                del state[key][:-cap]
+        if len(state["orders"]) > MAX_KEPT:
+            for oid in sorted(state["orders"], key=int)[:-MAX_KEPT]:
+                state["orders"].pop(oid)
+
+    def _check_liquidation(self, state, rng, symbol, now_ms, force=False):
+        qty, cost = self._position(state, symbol)
+        if not qty:
+            return None
+        px = self._px(symbol, state, rng, now_ms)
+        adverse = (cost - px) if qty > 0 else (px - cost)
+        if not force and adverse < self.liq_points:
+            return None
+        o = self._new_order(state, symbol, "SELL" if qty > 0 else "BUY", abs(qty), "MKT", now_ms,
+                            source="liquidation", liquidation=True)
+        o["fill_at"] = now_ms
+        self._execute(state, o, abs(qty), px, now_ms)
+        print(f"💥 [SIM] liquidated {symbol} {qty} @ {px} (adverse {adverse:.2f} pts)")
+        return o
+
+    def _new_order(self, state, symbol, action, quantity, order_type, now_ms, **extra):
+        o = {
+            "id": self._new_id(state), "account": self.account, "symbol": symbol, "action": action,
+            "order_type": order_type, "quantity": int(quantity), "filled": 0, "avg_fill_price": 0.0,
+            "status": "NEW", "reason": "", "source": "openapi", "liquidation": False,
+            "order_time": now_ms, "update_time": now_ms, "trade_time": None,
+            "fill_at": now_ms + self.fill_latency_ms,
+        }
+        o.update(extra)
+        state["orders"][str(o["id"])] = o
+        return o
+
+    # ---------- views ----------
+    @staticmethod
+    def _order_obj(o):
+        return SimOrder(
+            id=o["id"], order_id=o["id"], account=o["account"], symbol=o["symbol"], contract=SimContract(o["symbol"]),
+            action=o["action"], order_type=o["order_type"], quantity=o["quantity"], filled=o["filled"],
+            avg_fill_price=o["avg_fill_price"] or None, latest_price=o.get("latest_price"),
+            status=OrderStatus[o["status"]], reason=o["reason"], source=o["source"], liquidation=o["liquidation"],
+            is_open=o["status"] in OPEN_STATUSES, order_time=o["order_time"], update_time=o["update_time"],
+            trade_time=o["trade_time"], limit_price=o.get("limit_price"), aux_price=o.get("aux_price"),
+        )
+
+    # ====================================================
+    # 🟩 TradeClient API
+    # ====================================================
+    def place_order(self, order):
+        now_ms = int(time.time() * 1000)
+        symbol = str(getattr(getattr(order, "contract", None), "symbol", "") or getattr(order, "symbol", "")).upper()
+        action = str(getattr(order, "action", "")).upper()
+        quantity = int(getattr(order, "quantity", 0) or 0)
+        order_type = str(getattr(order, "order_type", "MKT") or "MKT").upper()
+        with self._session() as (state, rng):
+            self._advance(state, rng, now_ms)
+            if not symbol or action not in ("BUY", "SELL") or quantity <= 0:
+                raise SimRejected(f"invalid order: {symbol} {action} {quantity}")
+            if rng.random() < self.reject_rate:
+                raise SimRejected("code=1200 msg=order rejected (simulated)")
+            extra = {k: float(getattr(order, k)) for k in ("limit_price", "aux_price")
+                     if getattr(order, k, None) is not None}
+            o = self._new_order(state, symbol, action, quantity, order_type, now_ms, **extra)
+            o["latest_price"] = self._px(symbol, state, rng, now_ms)
+            qty, _ = self._position(state, symbol)
+            after = qty + (quantity if action == "BUY" else -quantity)
+            if order_type == "MKT" and abs(after) > abs(qty) and abs(after) > self.max_position:
+                o.update(status="EXPIRED", reason="LACK_OF_MARGIN: 资金不足 insufficient margin (simulated)")
+            elif rng.random() < self.expire_rate:
+                o["status"] = "EXPIRED"
+                o["reason"] = "expired (simulated)"
+            order.id = o["id"]
+            return o["id"]
+
+    def cancel_order(self, account=None, id=None, order_id=None):
+        with self._session() as (state, rng):
+            self._advance(state, rng, int(time.time() * 1000))
+            o = state["orders"].get(str(id or order_id))
+            if o is None or o["status"] not in OPEN_STATUSES:
+                raise SimRejected(f"order {id or order_id} is not cancellable")
+            o["status"] = "CANCELLED"
+            o["update_time"] = int(time.time() * 1000)
+            return o["id"]
+
+    def get_order(self, account=None, id=None, order_id=None, **kwargs):
+        with self._session() as (state, rng):
+            self._advance(state, rng, int(time.time() * 1000))
+            o = state["orders"].get(str(id or order_id))
+            return self._order_obj(o) if o else None
+
+    def get_orders(self, account=None, sec_type=None, seg_type=None, symbol=None, start_time=None,
+                   end_time=None, limit=100, **kwargs):
+        with self._session() as (state, rng):
+            self._advance(state, rng, int(time.time() * 1000))
+            orders = [o for o in state["orders"].values()
+                      if (not symbol or o["symbol"] == symbol)
+                      and (start_time is None or o["order_time"] >= start_time)
+                      and (end_time is None or o["order_time"] <= end_time)]
+            orders.sort(key=lambda o: o["order_time"], reverse=True)
+            return [self._order_obj(o) for o in orders[:limit]]
+
+    def get_transactions(self, account=None, order_id=None, symbol=None, sec_type=None, start_time=None,
+                         end_time=None, limit=100, **kwargs):
+        with self._session() as (state, rng):
+            self._advance(state, rng, int(time.time() * 1000))
+            txs = [t for t in state["transactions"]
+                   if (order_id is None or str(t["order_id"]) == str(order_id))
+                   and (symbol is None or t["symbol"] == symbol)
+                   and (start_time is None or t["transaction_time"] >= start_time)
+                   and (end_time is None or t["transaction_time"] <= end_time)]
+            txs.sort(key=lambda t: t["transaction_time"], reverse=True)
+            return [SimTransaction(contract=SimContract(t["symbol"]), **t) for t in txs[:limit]]
+
+    def get_positions(self, account=None, sec_type=None, symbol=None, **kwargs):
+        now_ms = int(time.time() * 1000)
+        with self._session() as (state, rng):
+            self._advance(state, rng, now_ms)
+            out = []
+            for sym in sorted({t["symbol"] for t in state["transactions"]}):
+                if symbol and sym != symbol:
+                    continue
+                qty, cost = self._position(state, sym)
+                if qty:
+                    px = self._px(sym, state, rng, now_ms)
+                    out.append(SimPosition(account=self.account, contract=SimContract(sym), symbol=sym,
+                                           quantity=qty, average_cost=cost, market_price=px))
+            return out
+
+    # ---------- test hooks ----------
+    def liquidate(self, symbol):
+        """Force a liquidation of the whole `symbol` position now (None when flat)."""
+        now_ms = int(time.time() * 1000)
+        with self._session() as (state, rng):
+            o = self._check_liquidation(state, rng, symbol, now_ms, force=True)
+            return self._order_obj(o) if o else None
+
+    def set_price(self, symbol, price):
+        """Pin the walk feed's current price (scripted scenarios)."""
+        with self._session() as (state, rng):
+            state["prices"][symbol] = {"price": float(price), "ms": int(time.time() * 1000)}
+
+#=========================  FAKE_TIGER (END OF SCRIPT)  ================================
@@ -1,8 +1,12 @@
-import sys
 from datetime import datetime, timezone, timedelta
-import gspread
-from google.oauth2.service_account import Credentials
 import pytz
+import strategy_core
+import metrics
+import ledger
+import broker_exits
+import instruments
+from trade_model import ExitTicket, legs_from_node, stamped
+import trade_journal
 
 # ====================================================
 # 🟩 Google Sheets setup (global)
@@ -16,6 +20,10 @@ SHEET_ID = "1TB76T6A1oWFi4T0iXdl2jfeGP1dC2MFSU-ESB3cBnVg"  # kept for reference;
 CLOSED_TRADES_FILE = "closed_trades.csv"
 
 def get_google_sheet():
+    # gspread / google-auth are heavy; only pay for them when a row is actually written
+    import gspread
+    from google.oauth2.service_account import Credentials
+
     creds = Credentials.from_service_account_file(GOOGLE_CREDS_FILE, scopes=GOOGLE_SCOPE)
     gs_client = gspread.authorize(creds)
     # If you later want to use SHEET_ID, you can: gs_client.open_by_key(SHEET_ID)
@@ -80,31 +88,62 @@ def hhmmss(total_seconds: int) -> str:
 # 🟩 Dollars-per-point by instrument
 # ====================================================
 def point_value_for(symbol: str) -> float:
-    """Dollars per 1.0 price point."""
-    sym3 = (symbol or "").upper()[:3]
-    return {
-        "MGC": 10.0,  # Micro Gold: $10 per 1.0 (tick 0.1 = $1)
-        "MES":  5.0,  # Micro S&P 500: $5 per 1.0 (tick 0.25 = $1.25)
-        "MNQ":  2.0,  # Micro Nasdaq (example)
-        "MCL": 100.0,  # Micro Crude: $1.00 per 0.01 (tick 0.01 = $1.00)
-    }.get(sym3, 1.0)
+    """Dollars per 1.0 price point (instrument spec registry)."""
+    return instruments.point_value_for(symbol)
 
 # ====================================================
 # 🟩 Commission by instrument (round-trip)
 # ====================================================
 def commission_for(symbol: str) -> float:
-    sym3 = (symbol or "").upper()[:3]
-    return {
-        "MGC": 7.02,  # $3.51/side
-        "MES": 2.64,  # $1.32/side
-        "MCL": 4.00,  # example
-    }.get(sym3, 5.00)   # fallback default
+    """Round-trip commission per contract (instrument spec registry)."""
+    return instruments.commission_for(symbol)
 
 # ==============================================
 # 🟩 EXIT TICKET (tx_dict) → MINIMAL FIFO CLOSE + SHEETS LOG
 # ==============================================
 def handle_exit_fill_from_tx(firebase_db, tx_dict):
     """
+    Timed entry point: per-stage latencies land in metrics stage_seconds{fn="handle_exit_fill_from_tx"}.
+    See _handle_exit_fill_from_tx for the payload shape.
+    """
+    sw = metrics.Stopwatch("handle_exit_fill_from_tx")
+    try:
+        result = _handle_exit_fill_from_tx(firebase_db, tx_dict, sw)
+    except Exception:
+        sw.done(outcome="error")
+        raise
+    if result is None:
+        # FIFO commit failed: nothing persisted, the journal record stays 'filled' for recover()
+        sw.done(outcome="commit_failed")
+        return None
+    sw.done(outcome="closed" if isinstance(result, dict) else "skipped")
+
+    # The exit is now decided (closed, ghosted or skipped) — close its journal record, if any
+    stage_data = {"outcome": next(iter(result), "") if isinstance(result, dict) else str(result)}
+    if tx_dict.get("journal_id"):
+        trade_journal.record(tx_dict["journal_id"], "committed", **stage_data)
+    elif str(tx_dict.get("order_id", "")).strip().isdigit():
+        trade_journal.record_order(str(tx_dict["order_id"]).strip(), "committed", **stage_data)
+    return result
+
+def _ghost_exit(firebase_db, symbol, exit_oid, record):
+    """Ghost record + ticket handled mark + ledger event in one multi-path update (legacy writes if that fails)."""
+    ghost = stamped(record)
+    ghosted = ledger.record(firebase_db, "ghosted", symbol, exit_oid, extra_updates={
+        f"ghost_trades_log/{symbol}/{exit_oid}": ghost,
+        f"exit_orders_log/{symbol}/{exit_oid}/_handled": True,
+        f"exit_orders_log/{symbol}/{exit_oid}/_processed": True,
+    }, reason=record.get("reason"))
+    if not ghosted:
+        firebase_db.reference(f"/ghost_trades_log/{symbol}/{exit_oid}").set(ghost)
+        firebase_db.reference(f"/exit_orders_log/{symbol}/{exit_oid}").update({"_handled": True, "_processed": True})
+
+def _handle_exit_fill_from_tx(firebase_db, tx_dict, sw):
+    """
+    Returns {leg order_id: contracts remaining} for every leg the exit matched (0 = closed and archived,
+    anchor first) so callers can bring their own snapshot of the book in line; False/None when nothing
+    was closed.
+
     tx_dict example:
       {
         "status": "SUCCESS",
@@ -118,18 +157,15 @@ def handle_exit_fill_from_tx(firebase_db, tx_dict):
         "source": "desktop-mac" | "mobile" | "openapi" | "tradingview" | ...
       }
     """
-    # 1) Extract + sanity
-    exit_oid   = str(tx_dict.get("order_id", "")).strip()
-    symbol     = tx_dict.get("symbol")
-    exit_price = tx_dict.get("filled_price")
-    exit_time  = tx_dict.get("transaction_time") or tx_dict.get("fill_time")
-    exit_act   = (tx_dict.get("action") or "").upper()
-    status     = tx_dict.get("status", "SUCCESS")
-    qty_raw    = tx_dict.get("quantity") or tx_dict.get("filled_qty") or 1
-    try:
-        exit_qty = max(1, int(qty_raw))
-    except Exception:
-        exit_qty = 1
+    # 1) Extract + sanity (ExitTicket folds transaction_time/fill_time and quantity/filled_qty)
+    ticket     = ExitTicket.from_tx(tx_dict)
+    exit_oid   = ticket.order_id or ""
+    symbol     = ticket.symbol
+    exit_price = ticket.filled_price
+    exit_time  = ticket.fill_time
+    exit_act   = ticket.action or ""
+    status     = ticket.status or "SUCCESS"
+    exit_qty   = max(1, ticket.filled_qty or 1)
 
     if not (exit_oid and exit_oid.isdigit() and symbol and exit_price is not None):
         print(f"❌ Invalid exit payload: order_id={exit_oid}, symbol={symbol}, price={exit_price}")
@@ -146,27 +182,28 @@ def handle_exit_fill_from_tx(firebase_db, tx_dict):
     if existing.get("_processed") or existing.get("_handled"):
         anchor_already = existing.get("anchor_id")
         print(f"[SKIP] Exit {exit_oid} already handled. anchor_id={anchor_already}")
-        return anchor_already or True
+        return existing.get("legs_remaining") or ({anchor_already: 0} if anchor_already else True)
 
     # 2) Log/Upsert exit ticket (separate from open_active_trades)
-    payload = {
-        "order_id": exit_oid,
-        "symbol": symbol, 
-        "action": exit_act,
-        "filled_price": exit_price,
-        "filled_qty": exit_qty,
-        "fill_time": exit_time,
-        "status": status,
-        "trade_type": tx_dict.get("trade_type", "EXIT"),
-    }
-    if tx_dict.get("source"):
-        payload["source"] = tx_dict.get("source")
+    payload = ExitTicket(
+        order_id=exit_oid,
+        symbol=symbol,
+        action=exit_act,
+        filled_price=exit_price,
+        filled_qty=exit_qty,
+        fill_time=exit_time,
+        status=status,
+        trade_type=ticket.trade_type or "EXIT",
+        source=ticket.source or None,
+    ).to_firebase()
     firebase_db.reference(f"/exit_orders_log/{symbol}").child(exit_oid).update(payload)
     print(f"[INFO] Exit ticket recorded: {exit_oid} @ {exit_price} ({exit_act})")
+    sw.lap("ticket")
 
     # 3) Fetch oldest open anchor (FIFO by entry_timestamp)
     open_ref = firebase_db.reference(f"/open_active_trades/{symbol}")
-    opens = open_ref.get() or {}
+    opens = legs_from_node(open_ref.get())
+    sw.lap("fetch_opens")
     if not opens:
         print("[WARN] No open trades to close for this exit.")
         return False
@@ -186,21 +223,19 @@ def handle_exit_fill_from_tx(firebase_db, tx_dict):
     STALE_WINDOW = timedelta(minutes=15)  # was 12h; now only 15 minutes
     if (NOW_UTC - exit_utc) > STALE_WINDOW:
         print(f"[SKIP] Exit {exit_oid} older than {int(STALE_WINDOW.total_seconds()/60)}m; ghosting as stale.")
-        firebase_db.reference(f"/ghost_trades_log/{symbol}/{exit_oid}").set({
+        _ghost_exit(firebase_db, symbol, exit_oid, {
             "reason": "exit_too_old",
             "exit_time": exit_utc.isoformat(),
             "payload": payload
         })
-        firebase_db.reference(f"/exit_orders_log/{symbol}/{exit_oid}").update({"_handled": True, "_processed": True})
         return False
 
     # ✅ No “future” guard anymore — if exit_utc is ahead of NOW_UTC, we still accept it
 
     # Build FIFO list with normalized entry timestamps
     entries = []
-    for oid, tr in opens.items():
-        et_raw = tr.get("entry_timestamp") or tr.get("transaction_time") or ""
-        entries.append((oid, _to_utc(et_raw)))
+    for oid, leg in opens.items():
+        entries.append((oid, _to_utc(leg.entry_timestamp or "")))
     if not entries:
         print("[WARN] No entries found under open_active_trades; cannot FIFO.")
         return False
@@ -215,13 +250,12 @@ def handle_exit_fill_from_tx(firebase_db, tx_dict):
         delta_s = int((fifo_head_dt - exit_utc).total_seconds())
         print(f"[SKIP] Exit {exit_oid} is {delta_s}s older than earliest entry "
               f"({fifo_head_dt.isoformat()}); ghosting.")
-        firebase_db.reference(f"/ghost_trades_log/{symbol}/{exit_oid}").set({
+        _ghost_exit(firebase_db, symbol, exit_oid, {
             "reason": "stale_exit_before_open_entries",
             "exit_time": exit_utc.isoformat(),
             "earliest_entry": fifo_head_dt.isoformat(),
             "payload": payload
         })
-        firebase_db.reference(f"/exit_orders_log/{symbol}/{exit_oid}").update({"_handled": True, "_processed": True})
         return False
 
     # If only slightly older, proceed but note it
@@ -229,105 +263,162 @@ def handle_exit_fill_from_tx(firebase_db, tx_dict):
         print(f"[NOTE] Exit {exit_oid} earlier than FIFO head by time "
               f"({exit_utc.isoformat()} < {fifo_head_dt.isoformat()}) — proceeding with FIFO head anyway.")
 
-    # Candidate must be eligible
-    def _eligible(oid_):
-        tr = opens.get(oid_, {})
-        return not tr.get("exited") and (tr.get("contracts_remaining", 1) > 0)
-
-    candidate_oid = fifo_head_oid
-    if not _eligible(candidate_oid):
-        for oid, _dt in entries[1:]:
-            if _eligible(oid):
-                candidate_oid = oid
-                break
-        else:
-            print("[WARN] No eligible open trades (all exited or zero qty).")
-            return False
-
-    anchor = dict(opens.get(candidate_oid, {}), order_id=candidate_oid)
-    anchor_oid = anchor["order_id"]
-    print(f"[INFO] FIFO anchor selected: {anchor_oid} (entry={anchor.get('entry_timestamp')})")
-
-    # 4) Compute P&L in points → dollars (make debug safe)
-    pnl_points = 0.0
-    per_point  = point_value_for(symbol)
+    # Eligible legs (not exited, contracts left), oldest first; a broker-native exit child (broker_exits)
+    # closes the leg it protects before anything else
+    protects = str(ticket.get("protects") or "")
+    first = None
+    if protects and protects in opens and opens[protects].is_live:
+        first = protects
+        print(f"[INFO] Exit {exit_oid} is a broker exit child of {protects}; closing that leg first")
+    live = {oid: leg for oid, leg in opens.items() if leg.is_live}
+    allocation = strategy_core.fifo_allocate(entries, live, exit_qty, first=first)
+    if not allocation:
+        print("[WARN] No eligible open trades (all exited or zero qty).")
+        return False
+    matched_qty = sum(take for _, take in allocation)
+    if matched_qty < exit_qty:
+        print(f"[WARN] Exit {exit_oid} qty={exit_qty} exceeds the open book by {exit_qty - matched_qty}; "
+              f"excess left unmatched")
+    anchor_oid = allocation[0][0]
+    print(f"[INFO] FIFO match for {exit_oid}: " + ", ".join(f"{oid}×{take}" for oid, take in allocation))
+    sw.lap("select_anchor")
+
+    # 4) P&L for every matched slice in one vectorized pass (points → dollars, per-contract commission)
+    legs = [opens[oid] for oid, _ in allocation]
+    takes = [take for _, take in allocation]
     try:
-        entry_price = float(anchor.get("filled_price"))
-        px_exit     = float(exit_price)
-        qty         = exit_qty
-        if anchor.get("action", "").upper() == "BUY":
-            pnl_points = (px_exit - entry_price) * qty
-        else:
-            pnl_points = (entry_price - px_exit) * qty
-        pnl = pnl_points * per_point
+        pnl = instruments.pnl([leg.filled_price or 0.0 for leg in legs], exit_price, takes,
+                              [leg.side for leg in legs], symbols=symbol)
     except Exception as e:
-        print(f"❌ PnL calc error for anchor {anchor_oid}: {e}")
-        pnl = 0.0
+        print(f"❌ PnL calc error for exit {exit_oid}: {e}")
+        zeros = [0.0] * len(legs)
+        pnl = {"points": zeros, "realized": zeros, "commission": [commission_for(symbol) * t for t in takes]}
 
-    print(f"[INFO] P&L for {anchor_oid} via exit {exit_oid}: {pnl:.2f}  "
-          f"(points={pnl_points:.4f}, $/pt={per_point})")
-    
-    # 4b) Decide exit_reason before building update
-    is_liq   = (tx_dict.get("trade_type") == "LIQUIDATION" or tx_dict.get("status") == "LIQUIDATION")
-    raw_exit = (tx_dict.get("exit_reason") or tx_dict.get("reason") or "").upper()
+    # 4b) Decide exit_reason before building the updates
+    is_liq   = (ticket.trade_type == "LIQUIDATION" or ticket.status == "LIQUIDATION")
+    raw_exit = (ticket.exit_reason or tx_dict.get("reason") or "").upper()
 
     if is_liq:
         exit_reason = "LIQUIDATION"
-    elif tx_dict.get("trade_type") == "MANUAL_EXIT":
+    elif ticket.trade_type == "MANUAL_EXIT":
         exit_reason = "MANUAL"
-    elif raw_exit in ("MACD", "EMA20"):
+    elif raw_exit in ("MACD", "EMA20") or raw_exit in broker_exits.EXIT_REASONS.values():
         exit_reason = raw_exit
     else:
         exit_reason = "FIFO Close"
 
-    # 5) Close anchor (sticky entry_timestamp preserved)
-    commission = commission_for(symbol)
-    update = {
-        "exited": True,
-        "trade_state": "closed",
-        "contracts_remaining": 0,
-        "exit_timestamp": exit_time,
-        "exit_reason": exit_reason, 
-        "realized_pnl": round(pnl, 2),            # dollars
-        "tiger_commissions": commission,
-        "net_pnl": round(pnl - commission, 2),    # dollars
-        "exit_order_id": exit_oid,
-    }
-    try:
-        open_ref.child(anchor_oid).update(update)
-        print(f"[INFO] Anchor {anchor_oid} marked closed.")
-    except Exception as e:
-        print(f"❌ Failed to update anchor {anchor_oid}: {e}")
-        return False
-
-    # 6) Archive & delete anchor — SYMBOL-SCOPED
+    # 5) Per-leg updates: fully matched → close + archive + delete (sticky entry_timestamp preserved);
+    #    partially matched → decrement contracts_remaining. P&L totals accumulate across partial closes.
+    kind = "liquidated" if is_liq else "exit_filled"
+    updates, slices = {}, []
+    for i, (leg, take) in enumerate(zip(legs, takes)):
+        oid = leg.order_id
+        remaining = strategy_core.leg_remaining(leg) - take
+        realized = round(float(pnl["realized"][i]), 2)
+        commission = round(float(pnl["commission"][i]), 2)
+        print(f"[INFO] P&L for {oid}×{take} via exit {exit_oid}: {realized:.2f}  "
+              f"(points={float(pnl['points'][i]):.4f}, commission={commission})")
+        total_realized = round((leg.realized_pnl or 0.0) + realized, 2)
+        total_commission = round((leg.tiger_commissions or 0.0) + commission, 2)
+        totals = {
+            "realized_pnl": total_realized,                              # dollars
+            "tiger_commissions": total_commission,
+            "net_pnl": round(total_realized - total_commission, 2),      # dollars
+        }
+        if remaining > 0:
+            base = f"open_active_trades/{symbol}/{oid}"
+            updates[f"{base}/contracts_remaining"] = remaining
+            updates[f"{base}/partial_exits/{exit_oid}"] = {
+                "qty": take, "price": exit_price, "time": exit_time, "realized_pnl": realized,
+            }
+            for field, value in totals.items():
+                updates[f"{base}/{field}"] = value
+        else:
+            update = {
+                "exited": True,
+                "trade_state": "closed",
+                "contracts_remaining": 0,
+                "exit_timestamp": exit_time,
+                "exit_reason": exit_reason,
+                "exit_order_id": exit_oid,
+                **totals,
+            }
+            updates[f"archived_trades_log/{symbol}/{oid}"] = stamped({**leg, **update})
+            updates[f"open_active_trades/{symbol}/{oid}"] = None
+        ledger.merge_updates(updates, ledger.event_updates(ledger.make_event(
+            kind, symbol, exit_oid, closes=oid, leg=leg, remaining=remaining,
+            price=exit_price, qty=take, pnl=realized)))
+        slices.append((leg, take, remaining, {
+            "exit_timestamp": exit_time, "exit_reason": exit_reason, "exit_order_id": exit_oid,
+            "realized_pnl": realized, "tiger_commissions": commission, "net_pnl": round(realized - commission, 2),
+        }))
+
+    # 6) ONE multi-path commit — every affected leg, its ledger event, and the ticket's handled mark
+    ticket_base = f"exit_orders_log/{symbol}/{exit_oid}"
+    updates[f"{ticket_base}/_handled"] = True
+    updates[f"{ticket_base}/_processed"] = True
+    updates[f"{ticket_base}/anchor_id"] = anchor_oid
+    updates[f"{ticket_base}/matched"] = dict(allocation)
+    legs_remaining = {leg.order_id: max(0, remaining) for leg, _, remaining, _ in slices}
+    updates[f"{ticket_base}/legs_remaining"] = legs_remaining
+    if matched_qty < exit_qty:
+        updates[f"{ticket_base}/unmatched_qty"] = exit_qty - matched_qty
     try:
-        firebase_db.reference(f"/archived_trades_log/{symbol}/{anchor_oid}").set({**anchor, **update})
-        firebase_db.reference(f"/open_active_trades/{symbol}/{anchor_oid}").delete()
-        print(f"[INFO] Archived + deleted anchor {anchor_oid}")
+        firebase_db.reference("/").update(updates)
+        print(f"[INFO] FIFO close committed: exit {exit_oid} → {len(allocation)} leg(s)")
     except Exception as e:
-        print(f"❌ Archive/delete failed for {anchor_oid}: {e}")
+        print(f"❌ FIFO commit failed for exit {exit_oid}: {e}")
         return None
-
-    # 7) Mark exit ticket handled — SYMBOL-SCOPED
-    try:
-        firebase_db.reference(f"/exit_orders_log/{symbol}/{exit_oid}").update({
-            "_handled": True,
-            "_processed": True,
-            "anchor_id": anchor_oid,
-        })
-    except Exception as e:
-        print(f"⚠️ Failed to mark exit ticket handled for {exit_oid}: {e}")
-
-    #=========================================================================================
-    # 8) Google Sheets logging (UTC→NZ, force TEXT so Sheets can't mangle TZ)
-    #=========================================================================================
+    sw.lap("commit")
+
+    for leg, take, remaining, slice_update in slices:
+        # 6a) A fully closed leg's broker-native exit children must not fire later (keep the one that filled);
+        #     a partially closed leg's children are re-sized to what is left, or they would over-close it
+        if remaining <= 0 and leg.broker_exit:
+            broker_exits.cancel_children(firebase_db, symbol, leg.broker_exit,
+                                         keep=str(ticket.get("parent_order_id") or exit_oid))
+            sw.lap("cancel_children")
+        elif leg.broker_exit:
+            resized = broker_exits.resize_children(firebase_db, symbol, leg, remaining)
+            try:
+                firebase_db.reference(f"/open_active_trades/{symbol}/{leg.order_id}").update({"broker_exit": resized})
+            except Exception as e:
+                print(f"⚠️ [BROKER_EXIT] resized children not recorded on {leg.order_id}: {e}")
+            sw.lap("resize_children")
+
+        # 6b) Append the closed slice to the local columnar trade history (durable; survives log retention)
+        try:
+            import trade_history  # numpy-backed; imported on first close, not at module load
+
+            closed_leg = {**leg, **slice_update, "exit_price": exit_price, "exit_qty": take,
+                          "source": tx_dict.get("source") or leg.get("source")}
+            trade_history.append_closed_trade(
+                symbol,
+                closed_leg,
+                parse_any_ts_to_utc(str(leg.entry_timestamp or "")),
+                parse_any_ts_to_utc(str(exit_time or "")),
+            )
+        except Exception as e:
+            print(f"⚠️ Trade history append failed for {leg.order_id}: {e}")
+        sw.lap("history")
+
+        # 7) One Sheets row per closed slice
+        _log_closed_to_sheets(symbol, leg, slice_update, exit_oid, exit_price, exit_reason, is_liq, tx_dict)
+        sw.lap("sheets")
+
+    return legs_remaining
+
+#=========================================================================================
+# 🟩 Google Sheets logging (UTC→NZ, force TEXT so Sheets can't mangle TZ)
+#=========================================================================================
+def _log_closed_to_sheets(symbol, anchor, update, exit_oid, exit_price, exit_reason, is_liq, tx_dict):
+    anchor_oid = anchor.order_id
     try:
         # Prefer Tiger execution time saved on the anchor; else use original entry_timestamp
-        entry_src_iso = str(anchor.get("transaction_time") or anchor.get("entry_timestamp") or "").strip()
+        entry_src_iso = str(anchor.entry_timestamp or "").strip()
         exit_ts_iso   = str(update.get("exit_timestamp") or "").strip()  # what we wrote to FB
 
-        entry_px   = float(anchor.get("filled_price", 0.0) or 0.0)
+        entry_px   = anchor.filled_price or 0.0
         exit_px    = float(exit_price or 0.0)
         trail_trig = anchor.get("trail_trigger", "")
         trail_off  = anchor.get("trail_offset", "")
@@ -345,12 +436,11 @@ def handle_exit_fill_from_tx(firebase_db, tx_dict):
         time_in_trade = hhmmss(dur_secs)
 
         # Exit / labels
-        trade_type_str = "LONG" if (anchor.get("action","").upper() == "BUY") else "SHORT"
-        is_liq = (tx_dict.get("trade_type") == "LIQUIDATION" or tx_dict.get("status") == "LIQUIDATION")
+        trade_type_str = "LONG" if anchor.side == 1 else "SHORT"
         # NOTE: exit_reason is already decided earlier (section 4b). Do NOT recompute here.
 
         realized_pnl_fb = float(update["realized_pnl"])
-        commission_amt  = commission_for(symbol)
+        commission_amt  = float(update["tiger_commissions"])
         net_fb          = realized_pnl_fb - commission_amt
 
         # Source normalization (prefer ticket)
@@ -421,10 +511,10 @@ def handle_exit_fill_from_tx(firebase_db, tx_dict):
             "notes":        notes_text,
         })
 
-        sheet = get_google_sheet()
-        sheet.append_row(row, value_input_option='RAW')
+        with metrics.timer("sheets_seconds", op="open"):
+            sheet = get_google_sheet()
+        with metrics.timer("sheets_seconds", op="append_row"):
+            sheet.append_row(row, value_input_option='RAW')
         print(f"✅ Logged CLOSED trade to Sheets: anchor={anchor_oid} matched_exit={exit_oid}")
     except Exception as e:
         print(f"⚠️ Sheets logging failed for anchor={anchor_oid}, exit={exit_oid}: {e}")
-
-    return anchor_oid
\ No newline at end of file
@@ -0,0 +1,375 @@
+#=========================  FILL_STREAM - EXECUTION INGESTER (get_transactions + PERSISTED CURSOR)  ================================
+# Replaces push_orders' order-list heuristics (manual source + age <= 180 s, order.liquidation) for turning
+# broker activity into Firebase records. Every execution Tiger reports for the symbol becomes exactly one of
+#
+#   exit ticket   /exit_orders_log/{symbol}/{order_id}      fill that reduces the position (FIFO drain closes it)
+#   entry leg     /open_active_trades/{symbol}/{order_id}   fill that opens / adds to the position
+#
+# whatever its source (webhook, monitor, desktop, mobile, liquidation), and however old it is.
+#
+# Cursor  /runtime/fill_cursor/{symbol} = {since_ms, opened_ms, seen: {exec_id: ms}, net, updated_utc}
+#   since_ms  newest fill time applied; the next query starts OVERLAP_MS before it (late-published fills)
+#   opened_ms cursor creation: older fills are already reflected in the seeded net and are never applied
+#   seen      execution ids inside that overlap window (dedupe of the re-read tail)
+#   net       signed contracts after the last applied fill: decides entry vs exit for the next one
+#
+# Exactly once: records are created inside Firebase transactions keyed by order id (create-if-absent; an
+# existing record written by app/monitor is adopted by stamping its fill_id), and the cursor only moves
+# after the records exist. A crash in between replays the same executions onto the same keys. The first
+# execution of an order owns the order-id key; a further execution of that order (partial fills) is absorbed
+# by it while the record's quantity still covers the executions it has seen (fill_ids {exec_id: qty}; e.g. the
+# N-lot ticket place_exit_trade writes after aggregating them), else it gets its own record keyed by the
+# execution id, with parent_order_id.
+#
+# Work per cycle: one get_transactions page (paged back with end_time only when more than FETCH_LIMIT
+# executions arrived since the cursor) + a constant number of point reads/transactions per NEW fill.
+# A backlog deeper than MAX_PAGES is never applied partially: the cursor holds until it is rebuilt.
+import os
+import time
+from datetime import datetime, timezone
+
+import broker_exits
+import ledger
+import metrics
+from trade_model import ExitTicket, TradeLeg, parse_utc
+
+FILL_STREAM = os.getenv("FILL_STREAM", "1") == "1"
+CURSOR_ROOT = "/runtime/fill_cursor"
+OVERLAP_MS = 120_000          # re-read this much history each cycle (Tiger publishes fills late)
+ENTRY_SETTLE_S = 20.0         # unknown entry fills younger than this wait a cycle (app.py records its own)
+FETCH_LIMIT = 100             # executions per get_transactions page (Tiger returns newest first)
+MAX_PAGES = 20                # per cycle; a deeper backlog holds the cursor (rebuild_open_trades.py)
+MANUAL_SOURCES = {"desktop-mac", "desktop", "ios", "iphone", "ipad", "android", "tiger-mobile", "mobile"}
+
+class _Owned(Exception):
+    """Raised inside a transaction: the order-id key already belongs to another execution."""
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+def _iso(ms):
+    return datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+# ====================================================
+# 🟩 Tiger execution → plain fill dict
+# ====================================================
+def fill_from_tx(t, symbol):
+    """Tiger Transaction → {exec_id, order_id, symbol, action, qty, price, ms}; None when unusable."""
+    ms = getattr(t, "transaction_time", None)
+    if not isinstance(ms, (int, float)) or ms <= 0:
+        d = parse_utc(getattr(t, "transacted_at", None))
+        ms = int(d.timestamp() * 1000) if d else None
+    order_id = str(getattr(t, "order_id", "") or "").strip()
+    exec_id = str(getattr(t, "id", "") or "").strip() or None
+    action = str(getattr(t, "action", "") or "").split(".")[-1].upper()
+    qty = int(getattr(t, "filled_quantity", 0) or 0)
+    if not (ms and order_id.isdigit() and action in ("BUY", "SELL") and qty > 0):
+        return None
+    return {
+        "exec_id": exec_id or f"{order_id}{int(ms) % 1_000_000:06d}",   # digits, like every other key
+        "order_id": order_id,
+        "symbol": symbol,
+        "action": action,
+        "qty": qty,
+        "price": float(getattr(t, "filled_price", 0.0) or 0.0),
+        "ms": int(ms),
+    }
+
+def classify(net, fill):
+    """'exit' when the fill reduces the open position (opposite side of `net`), else 'entry'."""
+    return "exit" if net and (net > 0) != (_signed(fill) > 0) else "entry"
+
+def split_fill(net, fill):
+    """
+    [(kind, fill)] for one execution. A fill that crosses zero (net=+1, SELL 3) is two records: an exit of
+    |net| on the order-id ticket, and an entry leg for the rest keyed by the execution id ("key").
+    """
+    kind = classify(net, fill)
+    if kind == "exit" and fill["qty"] > abs(net):
+        return [("exit", {**fill, "qty": abs(net)}),
+                ("entry", {**fill, "qty": fill["qty"] - abs(net), "key": fill["exec_id"]})]
+    return [(kind, fill)]
+
+def _signed(fill):
+    return fill["qty"] if fill["action"] == "BUY" else -fill["qty"]
+
+# ====================================================
+# 🟩 Cursor
+# ====================================================
+def load_cursor(firebase_db, symbol):
+    """Persisted cursor, or a fresh one starting now (net seeded from the ledger counter / open legs)."""
+    cur = firebase_db.reference(f"{CURSOR_ROOT}/{symbol}").get()
+    if isinstance(cur, dict) and cur.get("since_ms"):
+        cur.setdefault("seen", {})
+        cur["net"] = int(cur.get("net") or 0)
+        return cur
+    net = ledger.net_position(firebase_db, symbol)
+    if net is None:
+        net = ledger.net_from_legs(ledger.scan_open_legs(firebase_db, symbol))
+    print(f"[FILLS] {symbol}: new cursor at now, net={net}")
+    now = _now_ms()
+    return {"since_ms": now, "opened_ms": now, "seen": {}, "net": int(net)}
+
+def _save_cursor(firebase_db, symbol, cursor):
+    floor = cursor["since_ms"] - OVERLAP_MS
+    cursor["seen"] = {k: v for k, v in cursor["seen"].items() if int(v) >= floor}
+    cursor["updated_utc"] = datetime.now(timezone.utc).isoformat()
+    firebase_db.reference(f"{CURSOR_ROOT}/{symbol}").set(cursor)
+
+# ====================================================
+# 🟩 Record writers (idempotent)
+# ====================================================
+def _claim_order_key(firebase_db, path, fill, build, key=None):
+    """
+    Transaction on the order-id record: create it (→ 'created'), adopt a record written without a fill_id,
+    by this very execution, or whose quantity still covers this execution (→ 'existing'), or leave it to its
+    owning execution (→ 'sibling').
+    """
+    outcome = {"v": "existing"}
+    exec_id = fill["exec_id"]
+
+    def fn(current):
+        if current is None:
+            outcome["v"] = "created"
+            return {**build(key or fill["order_id"]), "fill_ids": {exec_id: fill["qty"]}}
+        owner = current.get("fill_id")
+        seen = dict(current.get("fill_ids") or {})
+        if owner is None or owner == exec_id or exec_id in seen:
+            seen.setdefault(exec_id, fill["qty"])
+            return {**current, "fill_id": owner or exec_id, "fill_ids": seen}
+        record_qty = int(current.get("quantity") or current.get("filled_qty") or 0)
+        if not seen or sum(int(q) for q in seen.values()) + fill["qty"] > record_qty:
+            raise _Owned()
+        seen[exec_id] = fill["qty"]                  # the order-key record already books this execution
+        return {**current, "fill_ids": seen}
+
+    try:
+        firebase_db.reference(path).transaction(fn)
+    except _Owned:
+        return "sibling"
+    return outcome["v"]
+
+def _create_if_absent(firebase_db, path, record):
+    created = {"v": False}
+
+    def fn(current):
+        if current is not None:
+            return current
+        created["v"] = True
+        return record
+
+    firebase_db.reference(path).transaction(fn)
+    return created["v"]
+
+def _book_entry(firebase_db, sym, key, fill, trail, owned=False):
+    """
+    New entry leg + its ledger event in one multi-path update, if no record holds the key yet.
+    Returns False (nothing written) when the key exists or the ledger write fails; callers then
+    fall back to the transactional writers.
+    """
+    path = f"open_active_trades/{sym}/{key}"
+    if firebase_db.reference(f"/{path}").get(shallow=True) is not None:
+        return False
+    entry = _entry(fill, key, trail)
+    leg = {**entry, "fill_ids": {fill["exec_id"]: fill["qty"]}} if owned else entry
+    return ledger.record(firebase_db, "entry_filled", sym, key, extra_updates={path: leg},
+                         leg=entry, source="fill-stream")
+
+def _in_ledger(firebase_db, sym, key):
+    """Whether the ledger views already know this order id (open or closed)."""
+    for view in ("open_legs", "closed"):
+        if firebase_db.reference(f"/{ledger.LEDGER_ROOT}/{view}/{sym}/{key}").get(shallow=True) is not None:
+            return True
+    return False
+
+def _order_info(order_id, orders_by_id):
+    """(source, liquidation) from this cycle's get_orders, else one get_order call; ('', False) if unknown."""
+    order = orders_by_id.get(order_id)
+    if order is None:
+        try:
+            from tiger_client import get_client
+            order = get_client().get_order(id=int(order_id))
+        except Exception as e:
+            print(f"⚠️ [FILLS] get_order({order_id}) failed softly: {e}")
+            return "", False
+    return (str(getattr(order, "source", "") or "").strip().lower(),
+            getattr(order, "liquidation", False) is True)
+
+def _ticket(fill, key, info, link=None):
+    source, is_liq = info
+    trade_type = "LIQUIDATION" if is_liq else ("MANUAL_EXIT" if source in MANUAL_SOURCES else "EXIT")
+    ticket = ExitTicket(
+        order_id=key,
+        symbol=fill["symbol"],
+        action=fill["action"],
+        filled_price=fill["price"],
+        filled_qty=fill["qty"],
+        fill_time=_iso(fill["ms"]),
+        status="LIQUIDATION" if is_liq else "FILLED",
+        trade_type=trade_type,
+        source=source or None,
+        processed=False,
+    ).to_firebase()
+    ticket["fill_id"] = fill["exec_id"]
+    if key != fill["order_id"]:
+        ticket["parent_order_id"] = fill["order_id"]
+    if link:                                   # broker-native exit child: close the leg it protects
+        ticket["protects"] = link.get("leg")
+        ticket["exit_reason"] = broker_exits.EXIT_REASONS.get(link.get("role"), "FIFO Close")
+    return ticket
+
+def _entry(fill, key, trail):
+    trigger_points, offset_points = trail
+    leg = TradeLeg(
+        order_id=key,
+        symbol=fill["symbol"],
+        action=fill["action"],
+        trade_type="LONG_ENTRY" if fill["action"] == "BUY" else "SHORT_ENTRY",
+        status="FILLED",
+        filled_price=fill["price"],
+        quantity=fill["qty"],
+        contracts_remaining=fill["qty"],
+        filled=True,
+        entry_timestamp=_iso(fill["ms"]),
+        trail_mode="FALLBACK",
+        trail_trigger=trigger_points,
+        trail_offset=offset_points,
+        trail_hit=False,
+        trail_peak=fill["price"],
+        trade_state="open",
+        is_open=True,
+        is_ghost=False,
+        source="fill-stream",
+    ).to_firebase()
+    leg["fill_id"] = fill["exec_id"]
+    if key != fill["order_id"]:
+        leg["parent_order_id"] = fill["order_id"]
+    return leg
+
+def _finished(firebase_db, symbol, key):
+    """The entry order already reached a terminal state (ledger view or archive) — never resurrect it."""
+    for path in (f"/{ledger.LEDGER_ROOT}/closed/{symbol}/{key}", f"/archived_trades_log/{symbol}/{key}"):
+        if firebase_db.reference(path).get(shallow=True) is not None:
+            return True
+    return False
+
+def apply_fill(firebase_db, fill, kind, orders_by_id, trail):
+    """Write the one record for `fill`. Returns 'created' | 'existing' | 'finished'."""
+    sym, oid = fill["symbol"], fill["order_id"]
+    if kind == "exit":
+        path = f"/exit_orders_log/{sym}/{oid}"
+        # source/liquidation only matter for a ticket we create; looked up outside the (retrying) transaction
+        known = firebase_db.reference(path).get(shallow=True) is not None
+        info = ("", False) if known else _order_info(oid, orders_by_id)
+        link = None if known else broker_exits.lookup(firebase_db, sym, oid)
+        outcome = _claim_order_key(firebase_db, path, fill, lambda key: _ticket(fill, key, info, link))
+        if outcome == "sibling":
+            key = fill["exec_id"]
+            if known:
+                info, link = _order_info(oid, orders_by_id), broker_exits.lookup(firebase_db, sym, oid)
+            created = _create_if_absent(firebase_db, f"/exit_orders_log/{sym}/{key}",
+                                        _ticket(fill, key, info, link))
+            outcome = "created" if created else "existing"
+        return outcome
+
+    key = fill.get("key") or oid             # a zero-crossing fill's entry part is keyed by its execution id
+    if _finished(firebase_db, sym, key):
+        return "finished"
+    if _book_entry(firebase_db, sym, key, fill, trail, owned=True):
+        return "created"
+    outcome = _claim_order_key(firebase_db, f"/open_active_trades/{sym}/{key}", fill,
+                               lambda k: _entry(fill, k, trail), key=key)
+    if outcome == "sibling":
+        key = fill["exec_id"]
+        if _book_entry(firebase_db, sym, key, fill, trail):
+            return "created"
+        created = _create_if_absent(firebase_db, f"/open_active_trades/{sym}/{key}", _entry(fill, key, trail))
+        outcome = "created" if created else "existing"
+    if outcome == "created" or not _in_ledger(firebase_db, sym, key):
+        # a replay that finds its leg already written still owes the ledger its entry event
+        ledger.record(firebase_db, "entry_filled", sym, key, leg=_entry(fill, key, trail), source="fill-stream")
+    return outcome
+
+# ====================================================
+# 🟩 One ingest pass
+# ====================================================
+def _fetch_since(client, account, sec_type, symbol, start_ms):
+    """
+    Every execution for `symbol` at or after `start_ms` as fills, paged back (newest first) with end_time.
+    Returns (fills, complete); complete=False when MAX_PAGES ran out before reaching start_ms.
+    """
+    fills, seen, end_ms = [], set(), None
+    for _ in range(MAX_PAGES):
+        txs = client.get_transactions(account=account, symbol=symbol, sec_type=sec_type, start_time=start_ms,
+                                      end_time=end_ms, limit=FETCH_LIMIT) or []
+        page = [f for f in (fill_from_tx(t, symbol) for t in txs) if f and f["exec_id"] not in seen]
+        seen.update(f["exec_id"] for f in page)
+        fills.extend(page)
+        if len(txs) < FETCH_LIMIT or not page:
+            return fills, True
+        oldest = min(f["ms"] for f in page)
+        if oldest <= start_ms:
+            return fills, True
+        end_ms = oldest                            # inclusive: same-ms siblings dedupe on the execution id
+    return fills, False
+
+def ingest(firebase_db, symbol, orders_by_id=None, trail=(14.0, 5.0), client=None, account=None):
+    """
+    Pull executions since the cursor, write one record per new execution, advance the cursor.
+    Returns the number of new executions applied (None on a failed fetch).
+    """
+    from tiger_client import ACCOUNT, get_client, fut_segment
+
+    sw = metrics.Stopwatch("fill_stream")
+    cursor = load_cursor(firebase_db, symbol)
+    start_ms = max(0, int(cursor["since_ms"]) - OVERLAP_MS)
+    try:
+        fetched, complete = _fetch_since(client or get_client(), account or ACCOUNT, fut_segment(), symbol, start_ms)
+    except Exception as e:
+        print(f"⚠️ [FILLS] get_transactions failed for {symbol}: {e}")
+        sw.done(outcome="fetch_error")
+        return None
+    sw.lap("fetch")
+    if not complete:
+        # the oldest executions are still unfetched; applying the newer ones first would misread entry/exit
+        print(f"❌ [FILLS] {symbol}: more than {MAX_PAGES * FETCH_LIMIT} executions since the cursor; "
+              f"holding it — run rebuild_open_trades.py")
+        sw.done(outcome="backlog")
+        return None
+
+    opened_ms = int(cursor.get("opened_ms") or 0)
+    fills = [f for f in fetched if f["ms"] >= opened_ms and f["exec_id"] not in cursor["seen"]]
+    fills.sort(key=lambda f: (f["ms"], f["exec_id"]))
+    applied = 0
+    now_ms = _now_ms()
+    for fill in fills:
+        parts = split_fill(cursor["net"], fill)
+        kind, last = parts[-1]
+        if kind == "entry" and now_ms - fill["ms"] < ENTRY_SETTLE_S * 1000:
+            key = last.get("key") or fill["order_id"]
+            if firebase_db.reference(f"/open_active_trades/{symbol}/{key}").get(shallow=True) is None:
+                print(f"[FILLS] {symbol}: entry fill {fill['exec_id']} settling; next cycle")
+                break
+        outcomes = []
+        try:
+            for kind, part in parts:
+                outcomes.append((kind, part["qty"], apply_fill(firebase_db, part, kind, orders_by_id or {}, trail)))
+        except Exception as e:
+            print(f"❌ [FILLS] {symbol}: {kind} fill {fill['exec_id']} (order {fill['order_id']}) not recorded: {e}")
+            break                                  # cursor stays before it; replays land on the same keys
+        cursor["net"] += _signed(fill)
+        cursor["seen"][fill["exec_id"]] = fill["ms"]
+        cursor["since_ms"] = max(int(cursor["since_ms"]), fill["ms"])
+        applied += 1
+        for kind, qty, outcome in outcomes:
+            metrics.inc("fill_stream_fills", kind=kind, outcome=outcome)
+        print(f"[FILLS] {symbol}: {fill['action']} {fill['qty']} @ {fill['price']} (order {fill['order_id']}) "
+              f"→ {', '.join(f'{k} {q} {o}' for k, q, o in outcomes)}; net={cursor['net']}")
+    sw.lap("apply")
+
+    if applied or not cursor.get("updated_utc"):
+        _save_cursor(firebase_db, symbol, cursor)
+    sw.done(outcome="applied" if applied else "idle")
+    return applied
+
+#=========================  FILL_STREAM (END OF SCRIPT)  ================================
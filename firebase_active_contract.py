@@ -1,16 +1,4 @@
-from firebase_admin import credentials, initialize_app, db
-import os
-from firebase_admin import _apps
-
-# Load Firebase secret key
-firebase_key_path = "/etc/secrets/firebase_key.json" if os.path.exists("/etc/secrets/firebase_key.json") else "firebase_key.json"
-cred = credentials.Certificate(firebase_key_path)
-
-# Initialize Firebase Admin SDK
-if not _apps:
-    initialize_app(cred, {
-        'databaseURL': "https://tw2tt-firebase-default-rtdb.asia-southeast1.firebasedatabase.app"
-    })
+from firebase_client import firebase_db as db  # lazy: Admin SDK initializes on the first DB call
 
 def set_active_contract(symbol: str):
     ref = db.reference("/active_contract")
@@ -0,0 +1,81 @@
+#=========================  FIREBASE_CLIENT - LAZY, SHARED INITIALIZATION  ================================
+import os
+import metrics
+
+DATABASE_URL = "https://tw2tt-firebase-default-rtdb.asia-southeast1.firebasedatabase.app"
+# firebase (production RTDB) | memory | sqlite — the local backends live in datastore.py (load testing)
+FIREBASE_BACKEND = os.getenv("FIREBASE_BACKEND", "firebase").strip().lower()
+
+def firebase_key_path() -> str:
+    return "/etc/secrets/firebase_key.json" if os.path.exists("/etc/secrets/firebase_key.json") else "firebase_key.json"
+
+# ==============================================================
+# 🟩 Lazy init: firebase_admin is only imported on the first DB call
+# ==============================================================
+def init_firebase():
+    """
+    Import + initialize the Admin SDK once (per process) and return the firebase_admin.db module —
+    or, with FIREBASE_BACKEND=memory|sqlite, the local store that speaks the same reference() API.
+    """
+    if FIREBASE_BACKEND != "firebase":
+        import datastore
+        return datastore.get_backend(FIREBASE_BACKEND)
+
+    import firebase_admin
+    from firebase_admin import credentials, db
+
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(firebase_key_path())
+        firebase_admin.initialize_app(cred, {'databaseURL': DATABASE_URL})
+    return db
+
+# ==============================================================
+# 🟩 Timed references: every RTDB round trip lands in metrics
+# ==============================================================
+_TIMED_OPS = frozenset({"get", "set", "update", "delete", "push", "transaction",
+                        "get_if_changed", "set_if_unchanged"})
+_CHAINED_OPS = frozenset({"child", "order_by_child", "order_by_key", "order_by_value",
+                          "start_at", "end_at", "equal_to", "limit_to_first", "limit_to_last"})
+
+def _root_of(path) -> str:
+    """First path segment ('open_active_trades', 'live_prices', ...) — a bounded metric label."""
+    return (str(path or "").strip("/").split("/", 1)[0]) or "/"
+
+class _TimedRef:
+    """
+    Wraps a db.Reference / db.Query: I/O methods are timed into
+    firebase_seconds{op, root}; child()/order_by_*() keep the wrapper; everything else passes through.
+    """
+    __slots__ = ("_ref", "_root")
+
+    def __init__(self, ref, root):
+        self._ref = ref
+        self._root = root
+
+    def __getattr__(self, name):
+        attr = getattr(self._ref, name)
+        if name in _TIMED_OPS:
+            root = self._root
+
+            def timed(*args, **kwargs):
+                with metrics.timer("firebase_seconds", op=name, root=root):
+                    return attr(*args, **kwargs)
+            return timed
+        if name in _CHAINED_OPS:
+            return lambda *args, **kwargs: _TimedRef(attr(*args, **kwargs), self._root)
+        return attr
+
+class _LazyFirebaseDB:
+    """
+    Drop-in stand-in for `firebase_admin.db` — modules keep calling
+    firebase_db.reference(...) but nothing heavy happens until the first call.
+    """
+    def reference(self, path="/"):
+        return _TimedRef(init_firebase().reference(path), _root_of(path))
+
+    def __getattr__(self, name):
+        return getattr(init_firebase(), name)
+
+firebase_db = _LazyFirebaseDB()
+
+#=========================  FIREBASE_CLIENT (END OF SCRIPT)  ================================
@@ -0,0 +1,193 @@
+#=========================  INSTRUMENTS - CACHED PER-INSTRUMENT SPEC REGISTRY + VECTORIZED P&L  ================================
+# One table of contract specs keyed by root ('MGC2510' → 'MGC'):
+#
+#   tick_size             minimum price increment
+#   point_value           dollars per 1.0 price point
+#   commission_per_side   dollars per contract per side (round trip = 2×)
+#   sessions              [{tz, open "HH:MM", close "HH:MM", days [weekday the session OPENS, Mon=0]}]
+#
+# Loaded once per process, on first use: INSTRUMENTS_FILE (local JSON {root: {...}}) when set, else
+# /settings/instruments in Firebase; either is merged over DEFAULT_SPECS field by field, and a failed load
+# falls back to the defaults. reload() drops the cache (e.g. after editing the settings node).
+#
+# pnl() computes realized / commission / net for arrays of legs in one NumPy pass — batch FIFO closes and
+# the analytics jobs use it; the scalar helpers (point_value_for, commission_for) serve single closes.
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+SETTINGS_PATH = "/settings/instruments"
+DEFAULT_TICK = 0.1
+DEFAULT_POINT_VALUE = 1.0
+DEFAULT_COMMISSION_PER_SIDE = 2.50     # → 5.00 round trip, the old commission_for fallback
+
+# CME Globex: Sun–Thu 18:00 ET open → next day 17:00 ET close (daily 17:00–18:00 maintenance break)
+GLOBEX = [{"tz": "America/New_York", "open": "18:00", "close": "17:00", "days": [6, 0, 1, 2, 3]}]
+
+DEFAULT_SPECS = {
+    "MGC": {"tick_size": 0.1,  "point_value": 10.0,   "commission_per_side": 3.51},   # Micro Gold: tick = $1
+    "GC":  {"tick_size": 0.1,  "point_value": 100.0,  "commission_per_side": DEFAULT_COMMISSION_PER_SIDE},
+    "MES": {"tick_size": 0.25, "point_value": 5.0,    "commission_per_side": 1.32},   # Micro S&P: tick = $1.25
+    "ES":  {"tick_size": 0.25, "point_value": 50.0,   "commission_per_side": DEFAULT_COMMISSION_PER_SIDE},
+    "MNQ": {"tick_size": 0.25, "point_value": 2.0,    "commission_per_side": DEFAULT_COMMISSION_PER_SIDE},
+    "NQ":  {"tick_size": 0.25, "point_value": 20.0,   "commission_per_side": DEFAULT_COMMISSION_PER_SIDE},
+    "MCL": {"tick_size": 0.01, "point_value": 100.0,  "commission_per_side": 2.00},   # Micro Crude: tick = $1
+    "CL":  {"tick_size": 0.01, "point_value": 1000.0, "commission_per_side": DEFAULT_COMMISSION_PER_SIDE},
+}
+
+class InstrumentSpec:
+    __slots__ = ("root", "tick_size", "point_value", "commission_per_side", "sessions")
+
+    def __init__(self, root, tick_size=DEFAULT_TICK, point_value=DEFAULT_POINT_VALUE,
+                 commission_per_side=DEFAULT_COMMISSION_PER_SIDE, sessions=None):
+        self.root = root
+        self.tick_size = float(tick_size)
+        self.point_value = float(point_value)
+        self.commission_per_side = float(commission_per_side)
+        self.sessions = list(GLOBEX if sessions is None else sessions)
+
+    @property
+    def round_trip_commission(self):
+        return round(2 * self.commission_per_side, 2)
+
+    def round_tick(self, price):
+        return round(round(price / self.tick_size) * self.tick_size, 6)
+
+    def in_session(self, now_utc=None):
+        """True when `now_utc` falls inside one of the trading sessions."""
+        import pytz
+
+        now_utc = now_utc or datetime.now(timezone.utc)
+        for s in self.sessions:
+            tz = pytz.timezone(s.get("tz") or "UTC")
+            local = now_utc.astimezone(tz)
+            open_hm, close_hm = _hhmm(s.get("open")), _hhmm(s.get("close"))
+            overnight = close_hm <= open_hm
+            # the session that could contain `local` opened today, or yesterday for overnight sessions
+            for back in ((0, 1) if overnight else (0,)):
+                day = (local - timedelta(days=back)).date()
+                if day.weekday() not in s.get("days", range(7)):
+                    continue
+                start = tz.localize(datetime(day.year, day.month, day.day, *open_hm))
+                end_day = day + timedelta(days=1 if overnight else 0)
+                end = tz.localize(datetime(end_day.year, end_day.month, end_day.day, *close_hm))
+                if start <= local < end:
+                    return True
+        return False
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__ if k != "root"}
+
+    def __repr__(self):
+        return f"InstrumentSpec({self.root!r}, {self.to_dict()!r})"
+
+def _hhmm(text):
+    try:
+        hh, mm = map(int, str(text or "00:00").split(":"))
+    except Exception:
+        hh, mm = 0, 0
+    return hh, mm
+
+def root_of(symbol, known=()):
+    """Contract root: trailing expiry digits dropped ('MGC2510' → 'MGC'); else the longest known prefix."""
+    sym = str(symbol or "").upper().strip()
+    root = sym.rstrip("0123456789")
+    if root in known or not known:
+        return root
+    for k in sorted(known, key=len, reverse=True):
+        if sym.startswith(k):
+            return k
+    return root
+
+# ====================================================
+# 🟩 Registry (loaded once per process)
+# ====================================================
+class InstrumentRegistry:
+    def __init__(self, overrides=None):
+        self.specs = {}
+        for root in set(DEFAULT_SPECS) | set(overrides or {}):
+            fields = {**DEFAULT_SPECS.get(root, {}), **((overrides or {}).get(root) or {})}
+            fields = {k: v for k, v in fields.items() if k in InstrumentSpec.__slots__ and k != "root"}
+            self.specs[root] = InstrumentSpec(root, **fields)
+
+    def spec_for(self, symbol):
+        root = root_of(symbol, self.specs)
+        return self.specs.get(root) or InstrumentSpec(root)
+
+def _load_overrides():
+    path = os.getenv("INSTRUMENTS_FILE")
+    if path:
+        with open(path) as f:
+            return json.load(f) or {}
+    from firebase_client import firebase_db
+    return firebase_db.reference(SETTINGS_PATH).get() or {}
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            try:
+                overrides = _load_overrides()
+            except Exception as e:
+                print(f"⚠️ [INSTRUMENTS] spec load failed; using built-in defaults: {e}")
+                overrides = {}
+            _registry = InstrumentRegistry(overrides if isinstance(overrides, dict) else {})
+        return _registry
+
+def reload():
+    global _registry
+    with _registry_lock:
+        _registry = None
+
+def spec_for(symbol):
+    return registry().spec_for(symbol)
+
+def tick_for(symbol):
+    return spec_for(symbol).tick_size
+
+def point_value_for(symbol):
+    return spec_for(symbol).point_value
+
+def commission_for(symbol):
+    """Round-trip commission for one contract."""
+    return spec_for(symbol).round_trip_commission
+
+# ====================================================
+# 🟩 Vectorized P&L
+# ====================================================
+def pnl(entry, exit, qty, side, symbols=None, point_value=None, commission_per_side=None):
+    """
+    Realized / commission / net P&L for N legs in one pass. `side` is +1/-1 or 'BUY'/'SELL' per leg.
+    Point value and commission come from `symbols` (one per leg, or a single symbol for all) via the
+    registry unless given explicitly (scalars or arrays). Returns a dict of float64 arrays:
+    {points, realized, commission, net}.
+    """
+    import numpy as np
+
+    entry = np.asarray(entry, dtype=np.float64)
+    exit = np.asarray(exit, dtype=np.float64)
+    qty = np.asarray(qty, dtype=np.float64)
+    side = np.asarray(side)
+    if side.dtype.kind in "USO":
+        side = np.where(np.isin(np.char.upper(side.astype(str)), ("BUY", "LONG", "1", "+1")), 1.0, -1.0)
+    side = side.astype(np.float64)
+
+    if point_value is None or commission_per_side is None:
+        sym = np.asarray(symbols if symbols is not None else "", dtype=str)
+        uniq, inv = np.unique(sym, return_inverse=True)
+        specs = [spec_for(s) for s in uniq]
+        if point_value is None:
+            point_value = np.array([s.point_value for s in specs])[inv].reshape(sym.shape)
+        if commission_per_side is None:
+            commission_per_side = np.array([s.commission_per_side for s in specs])[inv].reshape(sym.shape)
+
+    points = (exit - entry) * side * qty
+    realized = points * np.asarray(point_value, dtype=np.float64)
+    commission = 2.0 * np.asarray(commission_per_side, dtype=np.float64) * qty
+    return {"points": points, "realized": realized, "commission": commission, "net": realized - commission}
+
+#=========================  INSTRUMENTS (END OF SCRIPT)  ================================
@@ -0,0 +1,415 @@
+#=========================  LEDGER - EVENT-SOURCED POSITION LEDGER  ================================
+# One append-only stream of position events per symbol, plus materialized views kept in step with it:
+#
+#   /ledger/events/{symbol}/{key}      append-only; key = "<ms>-<kind>-<order_id>" (time-ordered, order_by_key)
+#   /ledger/open_legs/{symbol}/{oid}   view: legs still open   {action, qty, price, entry_ts}
+#   /ledger/closed/{symbol}/{oid}      view: terminal order ids → kind that closed them
+#   /ledger/snapshots/{symbol}         {open_legs, closed, through_ms, taken_utc}
+#   /ledger/position/{symbol}          counter: {net, open}  net = signed contracts, open = open legs
+#
+# Event kinds:
+#   entry_filled   opens leg <order_id>
+#   exit_filled    exit <order_id> closed leg <closes> (FIFO anchor); with `remaining` > 0 it only reduced
+#                  the leg to that many contracts (partial FIFO match) and the leg stays open
+#   liquidated     same as exit_filled, broker liquidation
+#   ghosted        <order_id> will never be a live leg (expired/cancelled/stale exit); removes it if open
+#   zombie_purged  leg <order_id> removed after the symbol was broker-flat past the grace period
+#   reconciled     leg <order_id> set to `leg` (or removed when absent) by rebuild_open_trades from broker
+#                  truth; the writer sets the position counter outright in the same update
+#
+# Every writer emits the event and its view mutation as ONE multi-path update (event_updates), folded
+# into the writer's own multi-path commit where it has one, so the event and the views cannot diverge.
+# Readers (net position, "is this order finished?") read the small views instead of rescanning the
+# /open_active_trades and *_log trees. The position counter is moved by server-side increments inside the
+# same multi-path update as the event, so net/open-count reads are one tiny node (O(1), quantity-aware);
+# verify_position() re-derives it from a full scan in the background and repairs persistent drift.
+# A symbol is served from the views once bootstrap() has seeded it (marker "_init"); until then the
+# readers return None and callers fall back to the legacy scan.
+#
+# Snapshots: checkpoint() folds the event tail onto the last snapshot, so rebuilding the views (drift
+# check, repair, retention of old events) costs O(events since snapshot) rather than O(history).
+import time
+from datetime import datetime, timezone
+
+import metrics
+
+LEDGER_ROOT = "ledger"
+EVENT_KINDS = ("entry_filled", "exit_filled", "liquidated", "ghosted", "zombie_purged", "reconciled")
+CLOSING_KINDS = frozenset(("exit_filled", "liquidated", "ghosted", "zombie_purged"))
+INIT_MARKER = "_init"
+SNAPSHOT_LAG_MS = 60_000      # events younger than this stay in the tail (cross-process clock skew)
+POSITION_FIELDS = ("net", "open")
+LEGACY_CLOSED_LOGS = ("/archived_trades_log", "/ghost_trades_log", "/zombie_trades_log")
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+# ====================================================
+# 🟩 Events (pure)
+# ====================================================
+def make_event(kind, symbol, order_id, closes=None, leg=None, ts_ms=None, remaining=None, **data):
+    """
+    Build an event dict. `closes` is the leg an exit/liquidation closed (defaults to order_id for
+    ghosted/zombie_purged); `leg` is the opened leg for entry_filled, and for closing events the open
+    leg being removed (when the writer has it) — only then does the event move the position counter.
+    `remaining` (exit_filled/liquidated) > 0 marks a partial close that leaves the leg open with that qty.
+    For reconciled, `leg` is the leg's corrected state; no leg means the leg is gone.
+    """
+    if kind not in EVENT_KINDS:
+        raise ValueError(f"unknown ledger event kind: {kind}")
+    event = {"kind": kind, "symbol": symbol, "order_id": str(order_id), "ts_ms": ts_ms or _now_ms()}
+    if kind == "entry_filled":
+        event["leg"] = leg_from_trade(leg or {})
+    else:
+        event["closes"] = str(closes or order_id)
+        if leg:
+            event["leg"] = leg_from_trade(leg)
+        if remaining and kind in ("exit_filled", "liquidated"):
+            event["remaining"] = int(remaining)
+    event.update({k: v for k, v in data.items() if v is not None})
+    return event
+
+def leg_from_trade(trade):
+    """The minimal leg the views keep, from an open_active_trades record."""
+    return {
+        "action": str(trade.get("action") or "").upper(),
+        "qty": int(trade.get("contracts_remaining") or trade.get("quantity") or 1),
+        "price": float(trade.get("filled_price") or 0.0),
+        "entry_ts": trade.get("entry_timestamp") or trade.get("transaction_time"),
+    }
+
+def is_open_trade(trade):
+    """The legacy scans' notion of a live leg: not exited/closed/failed and contracts left."""
+    if not hasattr(trade, "get"):
+        return False
+    if trade.get("exited") or (str(trade.get("status") or "").lower() in ("closed", "failed")):
+        return False
+    return int(trade.get("contracts_remaining", 1) or 0) > 0
+
+def event_key(event):
+    key = f"{int(event['ts_ms']):013d}-{event['kind']}-{event['order_id']}"
+    closes = event.get("closes")
+    # one exit can match several legs: one event per leg, so the leg goes into the key
+    return key if not closes or closes == event["order_id"] else f"{key}-{closes}"
+
+def signed_qty(leg):
+    side = (leg.get("action") or "").upper()
+    return int(leg.get("qty") or 0) * (1 if side == "BUY" else -1 if side == "SELL" else 0)
+
+def position_delta(event):
+    """(net, open) change the event makes to the position counter."""
+    leg = event.get("leg")
+    if not isinstance(leg, dict) or event["kind"] == "reconciled":
+        return 0, 0
+    if event["kind"] == "entry_filled":
+        return signed_qty(leg), 1
+    remaining = int(event.get("remaining") or 0)
+    if remaining:
+        return -signed_qty({**leg, "qty": int(leg.get("qty") or 0) - remaining}), 0
+    return -signed_qty(leg), -1
+
+def _increment(n):
+    return {".sv": {"increment": n}}
+
+def event_updates(event):
+    """Multi-path entries (relative to root) that append `event` and apply it to the views and counter."""
+    sym = event["symbol"]
+    updates = {f"{LEDGER_ROOT}/events/{sym}/{event_key(event)}": event}
+    d_net, d_open = position_delta(event)
+    if d_net:
+        updates[f"{LEDGER_ROOT}/position/{sym}/net"] = _increment(d_net)
+    if d_open:
+        updates[f"{LEDGER_ROOT}/position/{sym}/open"] = _increment(d_open)
+    if event["kind"] == "entry_filled":
+        updates[f"{LEDGER_ROOT}/open_legs/{sym}/{event['order_id']}"] = event["leg"]
+    elif event["kind"] == "reconciled":
+        leg = event.get("leg")
+        updates[f"{LEDGER_ROOT}/open_legs/{sym}/{event['order_id']}"] = leg
+        updates[f"{LEDGER_ROOT}/closed/{sym}/{event['order_id']}"] = None if leg else event["kind"]
+    elif event.get("remaining"):
+        updates[f"{LEDGER_ROOT}/open_legs/{sym}/{event['closes']}/qty"] = event["remaining"]
+        updates[f"{LEDGER_ROOT}/closed/{sym}/{event['order_id']}"] = event["kind"]
+    else:
+        updates[f"{LEDGER_ROOT}/open_legs/{sym}/{event['closes']}"] = None
+        updates[f"{LEDGER_ROOT}/closed/{sym}/{event['closes']}"] = event["kind"]
+        if event["closes"] != event["order_id"]:
+            updates[f"{LEDGER_ROOT}/closed/{sym}/{event['order_id']}"] = event["kind"]
+    return updates
+
+def merge_updates(updates, more):
+    """updates.update(more), except counter increments on the same path add up (several events, one commit)."""
+    for path, value in more.items():
+        prev = updates.get(path)
+        if isinstance(prev, dict) and isinstance(value, dict) and ".sv" in prev and ".sv" in value:
+            value = _increment(prev[".sv"]["increment"] + value[".sv"]["increment"])
+        updates[path] = value
+    return updates
+
+def apply_event(view, event):
+    """Fold one event into {"open_legs": {...}, "closed": {...}} in place. Idempotent."""
+    legs, closed = view.setdefault("open_legs", {}), view.setdefault("closed", {})
+    oid = event["order_id"]
+    if event["kind"] == "entry_filled":
+        if oid not in closed:                  # never resurrect a finished order
+            legs[oid] = event["leg"]
+        return view
+    if event["kind"] == "reconciled":        # broker truth: may reopen a leg the views had closed
+        if event.get("leg"):
+            legs[oid] = event["leg"]
+            closed.pop(oid, None)
+        else:
+            legs.pop(oid, None)
+            closed[oid] = event["kind"]
+        return view
+    target = event["closes"]
+    closed[oid] = event["kind"]
+    if event.get("remaining"):
+        if target in legs:
+            legs[target] = {**legs[target], "qty": int(event["remaining"])}
+        return view
+    legs.pop(target, None)
+    closed[target] = event["kind"]
+    return view
+
+def position_from_legs(legs):
+    """{"net": signed contracts, "open": leg count} over a {oid: leg} map (view or leg_from_trade output)."""
+    net = count = 0
+    for oid, leg in (legs or {}).items():
+        if str(oid).startswith("_") or not isinstance(leg, dict):
+            continue
+        net += signed_qty(leg)
+        count += 1
+    return {"net": net, "open": count}
+
+def net_from_legs(legs):
+    """Net signed contracts (BUY legs minus SELL legs, each weighted by its quantity)."""
+    return position_from_legs(legs)["net"]
+
+# ====================================================
+# 🟩 Writers
+# ====================================================
+def record(firebase_db, kind, symbol, order_id, extra_updates=None, **kw):
+    """
+    Append one event (and its view mutation) in a single multi-path update, together with any
+    `extra_updates` the caller wants committed atomically with it. Fails soft; returns True on success.
+    """
+    if not (symbol and order_id):
+        return False
+    try:
+        event = make_event(kind, symbol, order_id, **kw)
+        updates = dict(extra_updates or {})
+        updates.update(event_updates(event))
+        firebase_db.reference("/").update(updates)
+        metrics.inc("ledger_events", kind=kind)
+        return True
+    except Exception as e:
+        print(f"⚠️ [LEDGER] {kind} {symbol}/{order_id} not recorded: {e}")
+        return False
+
+# ====================================================
+# 🟩 Readers (views)
+# ====================================================
+def open_legs(firebase_db, symbol):
+    """{oid: leg} from the view, or None when the symbol has not been bootstrapped."""
+    node = firebase_db.reference(f"/{LEDGER_ROOT}/open_legs/{symbol}").get() or {}
+    if INIT_MARKER not in node:
+        return None
+    return {k: v for k, v in node.items() if not str(k).startswith("_")}
+
+def position(firebase_db, symbol):
+    """{"net", "open"} from the counter (one small read), or None when the symbol has no counter yet."""
+    try:
+        node = firebase_db.reference(f"/{LEDGER_ROOT}/position/{symbol}").get()
+    except Exception as e:
+        print(f"⚠️ [LEDGER] position read failed for {symbol}: {e}")
+        return None
+    if not isinstance(node, dict) or INIT_MARKER not in node:
+        return None
+    return {f: int(node.get(f) or 0) for f in POSITION_FIELDS}
+
+def net_position(firebase_db, symbol):
+    """Net signed contracts for `symbol`; None → caller falls back to scanning /open_active_trades."""
+    pos = position(firebase_db, symbol)
+    return None if pos is None else pos["net"]
+
+def open_count(firebase_db, symbol):
+    """Open legs for `symbol`; None → caller falls back to scanning /open_active_trades."""
+    pos = position(firebase_db, symbol)
+    return None if pos is None else pos["open"]
+
+def closed_ids(firebase_db, symbol):
+    """Order ids in a terminal state for `symbol` (shallow read), or None when not bootstrapped."""
+    try:
+        node = firebase_db.reference(f"/{LEDGER_ROOT}/closed/{symbol}").get(shallow=True) or {}
+    except Exception as e:
+        print(f"⚠️ [LEDGER] closed read failed for {symbol}: {e}")
+        return None
+    if INIT_MARKER not in node:
+        return None
+    return {str(k) for k in node if not str(k).startswith("_")}
+
+# ====================================================
+# 🟩 Bootstrap (one-off seed from the legacy trees)
+# ====================================================
+def scan_open_legs(firebase_db, symbol):
+    """Full scan of /open_active_trades/{symbol} → {oid: leg} for the legs still open (the legacy rules)."""
+    opens = firebase_db.reference(f"/open_active_trades/{symbol}").get() or {}
+    return {str(oid): leg_from_trade(tr) for oid, tr in opens.items()
+            if not str(oid).startswith("_") and is_open_trade(tr)}
+
+def _seed_view(firebase_db, symbol):
+    legs = scan_open_legs(firebase_db, symbol)
+    closed = {}
+    for root in LEGACY_CLOSED_LOGS:
+        kind = "zombie_purged" if "zombie" in root else ("ghosted" if "ghost" in root else "exit_filled")
+        keys = firebase_db.reference(f"{root}/{symbol}").get(shallow=True) or {}
+        for oid in keys:
+            closed.setdefault(str(oid), kind)
+    for oid in closed:
+        legs.pop(oid, None)
+    return {"open_legs": legs, "closed": closed}
+
+def _seed_position(firebase_db, symbol, legs):
+    pos = position_from_legs(legs)
+    firebase_db.reference(f"/{LEDGER_ROOT}/position/{symbol}").set({**pos, INIT_MARKER: True})
+    print(f"[LEDGER] position counter seeded for {symbol}: {pos}")
+
+def bootstrap(firebase_db, symbols=None):
+    """
+    Seed the views (and a snapshot) for every symbol that has none yet, from /open_active_trades
+    and the symbol-scoped logs. Idempotent: symbols already carrying the _init marker are skipped.
+    """
+    try:
+        if symbols is None:
+            symbols = firebase_db.reference("/open_active_trades").get(shallow=True) or {}
+        seeded = []
+        for sym in symbols:
+            sym = str(sym)
+            if sym.startswith("_"):
+                continue
+            if firebase_db.reference(f"/{LEDGER_ROOT}/position/{sym}/{INIT_MARKER}").get() is not None:
+                continue
+            if firebase_db.reference(f"/{LEDGER_ROOT}/open_legs/{sym}/{INIT_MARKER}").get() is not None:
+                # views predate the counter: seed it from the open_legs view only
+                _seed_position(firebase_db, sym, open_legs(firebase_db, sym))
+                seeded.append(sym)
+                continue
+            view = _seed_view(firebase_db, sym)
+            through = _now_ms()
+            updates = {
+                f"{LEDGER_ROOT}/open_legs/{sym}": {**view["open_legs"], INIT_MARKER: True},
+                f"{LEDGER_ROOT}/closed/{sym}": {**view["closed"], INIT_MARKER: True},
+                f"{LEDGER_ROOT}/snapshots/{sym}": _snapshot_doc(view, through),
+                f"{LEDGER_ROOT}/position/{sym}": {**position_from_legs(view["open_legs"]), INIT_MARKER: True},
+            }
+            firebase_db.reference("/").update(updates)
+            seeded.append(sym)
+            print(f"[LEDGER] bootstrapped {sym}: {len(view['open_legs'])} open leg(s), "
+                  f"{len(view['closed'])} closed id(s)")
+        return seeded
+    except Exception as e:
+        print(f"⚠️ [LEDGER] bootstrap failed softly: {e}")
+        return []
+
+# ====================================================
+# 🟩 Snapshots / rebuild
+# ====================================================
+def _snapshot_doc(view, through_ms):
+    return {
+        "open_legs": dict(view.get("open_legs") or {}),
+        "closed": dict(view.get("closed") or {}),
+        "through_ms": int(through_ms),
+        "taken_utc": datetime.now(timezone.utc).isoformat(),
+    }
+
+def rebuild(firebase_db, symbol, until_ms=None):
+    """
+    Views recomputed from the last snapshot + the event tail after it (events up to `until_ms`).
+    Returns (view, through_ms) where through_ms is the newest event applied (or the snapshot's).
+    """
+    snap = firebase_db.reference(f"/{LEDGER_ROOT}/snapshots/{symbol}").get() or {}
+    view = {"open_legs": dict(snap.get("open_legs") or {}), "closed": dict(snap.get("closed") or {})}
+    through = int(snap.get("through_ms") or 0)
+    tail = (firebase_db.reference(f"/{LEDGER_ROOT}/events/{symbol}")
+            .order_by_key().start_at(f"{through:013d}").get()) or {}
+    for key in sorted(tail):
+        event = tail[key]
+        if not isinstance(event, dict):
+            continue
+        ts = int(event.get("ts_ms") or 0)
+        if until_ms is not None and ts > until_ms:
+            break
+        apply_event(view, event)
+        through = max(through, ts)
+    return view, through
+
+def checkpoint(firebase_db, symbol):
+    """
+    Write a new snapshot (events older than SNAPSHOT_LAG_MS folded in) and compare the live views
+    with a fresh rebuild. Drift is reported, not auto-repaired. Returns the number of drifted legs.
+    """
+    try:
+        view, through = rebuild(firebase_db, symbol, until_ms=_now_ms() - SNAPSHOT_LAG_MS)
+        firebase_db.reference(f"/{LEDGER_ROOT}/snapshots/{symbol}").set(_snapshot_doc(view, through))
+
+        full, _ = rebuild(firebase_db, symbol)
+        live = open_legs(firebase_db, symbol)
+        if live is None:
+            return 0
+        drift = set(live) ^ set(full["open_legs"])
+        if drift:
+            metrics.inc("ledger_view_drift", len(drift), symbol=symbol)
+            print(f"⚠️ [LEDGER] {symbol}: open_legs view drifted from events on {sorted(drift)}")
+        return len(drift)
+    except Exception as e:
+        print(f"⚠️ [LEDGER] checkpoint failed softly for {symbol}: {e}")
+        return 0
+
+# ====================================================
+# 🟩 Position counter self-check
+# ====================================================
+_position_suspect = {}
+
+def verify_position(firebase_db, symbol):
+    """
+    Compare the counter with a full /open_active_trades scan. A mismatch is repaired only when the
+    previous check saw the very same (counter, scan) pair — in-flight writes between the two reads
+    settle by then — and only if the counter is still unchanged (compare-and-set in a transaction).
+    Returns True when the counter agreed (or was repaired).
+    """
+    try:
+        counted = position(firebase_db, symbol)
+        if counted is None:
+            return True
+        scanned = position_from_legs(scan_open_legs(firebase_db, symbol))
+        if counted == scanned:
+            _position_suspect.pop(symbol, None)
+            return True
+        seen = (tuple(counted.values()), tuple(scanned.values()))
+        if _position_suspect.get(symbol) != seen:
+            _position_suspect[symbol] = seen
+            print(f"⚠️ [LEDGER] {symbol}: position counter {counted} != scan {scanned}; rechecking next pass")
+            return False
+
+        def repair(cur):
+            cur = cur if isinstance(cur, dict) else {}
+            if {f: int(cur.get(f) or 0) for f in POSITION_FIELDS} != counted:
+                raise _CounterMoved()
+            return {**cur, **scanned}
+        try:
+            firebase_db.reference(f"/{LEDGER_ROOT}/position/{symbol}").transaction(repair)
+        except _CounterMoved:
+            _position_suspect.pop(symbol, None)
+            return False
+        _position_suspect.pop(symbol, None)
+        metrics.inc("ledger_position_repairs", symbol=symbol)
+        print(f"🛠️ [LEDGER] {symbol}: position counter repaired {counted} → {scanned}")
+        return True
+    except Exception as e:
+        print(f"⚠️ [LEDGER] position check failed softly for {symbol}: {e}")
+        return False
+
+class _CounterMoved(Exception):
+    pass
+
+#=========================  LEDGER (END OF SCRIPT)  ================================
@@ -0,0 +1,195 @@
+#=========================  METRICS - IN-PROCESS LATENCY HISTOGRAMS + COUNTERS  ================================
+# Where do the milliseconds go? Every Firebase call (firebase_client), Tiger call (tiger_client),
+# Sheets append (fifo_close) and the named stages of webhook / push_orders_main / monitor_trades /
+# handle_exit_fill_from_tx land in fixed-bucket histograms here.
+#
+#   app.py            → GET /metrics (Prometheus text format)
+#   loop processes    → metrics.maybe_dump() once per cycle prints a compact summary every N seconds
+#
+# Stdlib only and lock-cheap: one dict lookup + bisect per observation. Metrics are per process
+# (each gunicorn worker / loop process keeps its own registry).
+import bisect
+import os
+import threading
+import time
+
+METRIC_PREFIX = "tw2tt_"
+DUMP_INTERVAL_S = float(os.getenv("METRICS_DUMP_INTERVAL_S", "300"))
+
+# Seconds. Tuned for RTDB round trips (~20–300 ms) and Tiger fills (up to tens of seconds).
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> float
+_histograms = {}   # (name, labels) -> [bucket_counts, sum, count]
+_last_dump = [time.monotonic()]
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items())) if labels else ()
+
+# ====================================================
+# 🟩 Recording
+# ====================================================
+def inc(name, value=1, **labels):
+    """Add `value` to counter `name` (exported as <prefix><name>_total)."""
+    key = (name, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, seconds, **labels):
+    """Record one duration (seconds) into histogram `name`."""
+    key = (name, _labels_key(labels))
+    idx = bisect.bisect_left(DEFAULT_BUCKETS, seconds)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [[0] * (len(DEFAULT_BUCKETS) + 1), 0.0, 0]
+        h[0][idx] += 1
+        h[1] += seconds
+        h[2] += 1
+
+class timer:
+    """
+    Time a block (or a function, as a decorator) into histogram `name`.
+    An `outcome` label ("ok"/"error") is added so slow failures are visible separately.
+        with metrics.timer("firebase_seconds", op="get", root="open_active_trades"): ...
+    """
+    __slots__ = ("name", "labels", "t0")
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.t0,
+                outcome="error" if exc_type else "ok", **self.labels)
+        return False
+
+    def __call__(self, fn):
+        name, labels = self.name, self.labels
+
+        def wrapped(*args, **kwargs):
+            with timer(name, **labels):
+                return fn(*args, **kwargs)
+        wrapped.__name__ = getattr(fn, "__name__", "wrapped")
+        wrapped.__doc__ = getattr(fn, "__doc__", None)
+        return wrapped
+
+class Stopwatch:
+    """
+    Stage timer for one pass of a hot function:
+        sw = metrics.Stopwatch("webhook")
+        ...; sw.lap("parse")
+        ...; sw.lap("entry_order")
+        sw.done()
+    Each lap records the time since the previous lap into stage_seconds{fn=..., stage=...};
+    done() records the whole pass into stage_seconds{stage="total"}.
+    """
+    __slots__ = ("fn", "t0", "last")
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.t0 = self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        observe("stage_seconds", now - self.last, fn=self.fn, stage=stage)
+        self.last = now
+
+    def done(self, outcome="ok"):
+        observe("stage_seconds", time.perf_counter() - self.t0, fn=self.fn, stage="total", outcome=outcome)
+
+# ====================================================
+# 🟩 Export
+# ====================================================
+def _fmt_labels(labels, extra=None):
+    items = list(labels) + (list(extra) if extra else [])
+    if not items:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in items)
+    return "{" + body + "}"
+
+def snapshot():
+    """Consistent copy of the registry: (counters, histograms)."""
+    with _lock:
+        counters = dict(_counters)
+        hists = {k: [list(v[0]), v[1], v[2]] for k, v in _histograms.items()}
+    return counters, hists
+
+def render_prometheus():
+    """Prometheus text exposition (version 0.0.4) of every counter and histogram."""
+    counters, hists = snapshot()
+    lines = []
+
+    seen = set()
+    for (name, labels), value in sorted(counters.items()):
+        full = f"{METRIC_PREFIX}{name}_total"
+        if full not in seen:
+            lines.append(f"# TYPE {full} counter")
+            seen.add(full)
+        lines.append(f"{full}{_fmt_labels(labels)} {value}")
+
+    for (name, labels), (buckets, total, count) in sorted(hists.items()):
+        full = f"{METRIC_PREFIX}{name}"
+        if full not in seen:
+            lines.append(f"# TYPE {full} histogram")
+            seen.add(full)
+        running = 0
+        for bound, n in zip(DEFAULT_BUCKETS, buckets):
+            running += n
+            lines.append(f"{full}_bucket{_fmt_labels(labels, [('le', repr(bound))])} {running}")
+        lines.append(f"{full}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {count}")
+        lines.append(f"{full}_sum{_fmt_labels(labels)} {total:.6f}")
+        lines.append(f"{full}_count{_fmt_labels(labels)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+def quantile(buckets, count, q):
+    """Approximate quantile from bucket counts (linear within the bucket)."""
+    if not count:
+        return 0.0
+    target = q * count
+    running = 0
+    lower = 0.0
+    for i, n in enumerate(buckets):
+        upper = DEFAULT_BUCKETS[i] if i < len(DEFAULT_BUCKETS) else DEFAULT_BUCKETS[-1]
+        if running + n >= target and n:
+            return lower + (upper - lower) * ((target - running) / n)
+        running += n
+        lower = upper
+    return DEFAULT_BUCKETS[-1]
+
+def dump(title="metrics"):
+    """Print a compact per-series summary (count, avg, ~p50, ~p95 in ms; counters as-is)."""
+    counters, hists = snapshot()
+    print(f"📊 {title} @ {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    for (name, labels), (buckets, total, count) in sorted(hists.items()):
+        if not count:
+            continue
+        tag = ",".join(f"{k}={v}" for k, v in labels)
+        print(f"   {name}[{tag}] n={count} avg={1000 * total / count:.1f}ms "
+              f"p50≈{1000 * quantile(buckets, count, 0.5):.1f}ms p95≈{1000 * quantile(buckets, count, 0.95):.1f}ms")
+    for (name, labels), value in sorted(counters.items()):
+        tag = ",".join(f"{k}={v}" for k, v in labels)
+        print(f"   {name}[{tag}] = {value:g}")
+
+def maybe_dump(title="metrics", interval_s=None):
+    """Call once per loop cycle; dumps at most every `interval_s` seconds (METRICS_DUMP_INTERVAL_S)."""
+    interval = DUMP_INTERVAL_S if interval_s is None else interval_s
+    now = time.monotonic()
+    if interval <= 0 or now - _last_dump[0] < interval:
+        return False
+    _last_dump[0] = now
+    dump(title)
+    return True
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+#=========================  METRICS (END OF SCRIPT)  ================================
@@ -0,0 +1,196 @@
+#=========================  MONITOR_SHARDS - SHARDED MONITOR (N WORKERS, CONSISTENT HASH BY SYMBOL)  ================================
+# `python monitor_shards.py` replaces `python monitor_trades_loop.py` when there are several contracts:
+#
+#   parent   spawns MONITOR_SHARDS worker processes, restarts any that die (with backoff), stops them on SIGTERM
+#   worker k each cycle:
+#              1) renews its membership lease   /runtime/monitor_shards/workers/<k>
+#              2) reads the live members        (leases not expired)
+#              3) runs monitor_trades(owns=...) over the symbols the consistent-hash ring maps to it,
+#                 holding a per-symbol lease    /runtime/monitor_shards/symbols/<symbol>
+#
+# A dead worker stops renewing: after its lease it drops out of every ring and only ITS symbols move
+# (consistent hashing), each picked up once the old per-symbol lease expires — so two workers never
+# trail/flatten the same symbol. A slow exit on one symbol now only delays that worker's other symbols.
+# Leases are renewed once per cycle (membership) / before each symbol (ownership), so their length is
+# derived from the slowest task interval plus the worst-case cycle (lease_seconds), never shorter.
+import bisect
+import hashlib
+import os
+import signal
+import socket
+import sys
+import time
+
+import claims
+from firebase_client import firebase_db  # lazy: Admin SDK initializes on the first DB call
+
+MONITOR_SHARDS = int(os.getenv("MONITOR_SHARDS", "2"))
+SHARD_ROOT = "/runtime/monitor_shards"
+MISSED_CYCLES = 3            # a lease outlives this many scheduler intervals without a renewal...
+MAX_CYCLE_S = 120.0          # ...plus the slowest cycle (each exit polls Tiger up to ~10 s for its fill)
+RING_VNODES = 64             # virtual nodes per worker (evens out the symbol spread)
+SUPERVISE_EVERY_S = 5.0
+RESTART_BACKOFF_S = (5, 10, 30, 60)
+HEALTHY_RUN_S = 300.0
+
+# ====================================================
+# 🟩 Consistent-hash ring
+# ====================================================
+def _hash(key):
+    return int(hashlib.md5(str(key).encode()).hexdigest()[:16], 16)
+
+class HashRing:
+    """Symbol → shard index; adding/removing a shard only moves that shard's symbols."""
+
+    def __init__(self, nodes, vnodes=RING_VNODES):
+        points = sorted((_hash(f"shard{n}#{v}"), n) for n in nodes for v in range(vnodes))
+        self.nodes = frozenset(nodes)
+        self._keys = [p[0] for p in points]
+        self._owners = [p[1] for p in points]
+
+    def owner(self, key):
+        if not self._keys:
+            return None
+        i = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[i]
+
+# ====================================================
+# 🟩 Worker-side membership + symbol ownership
+# ====================================================
+def lease_seconds(*intervals):
+    """Membership / symbol lease length for a worker task scheduled every `intervals` (active, idle, closed)."""
+    return MISSED_CYCLES * max(intervals) + MAX_CYCLE_S
+
+class ShardMembership:
+    def __init__(self, firebase_db, index, shards, lease_s):
+        self.firebase_db = firebase_db
+        self.index = index
+        self.shards = shards
+        self.lease_s = lease_s
+        self.owner = f"{socket.gethostname()}/shard{index}"   # stable across restarts of this slot
+        self.ring = HashRing([index])
+        self._held = {}                                         # symbol → local expiry of our lease
+
+    def heartbeat(self):
+        """Renew our membership lease and rebuild the ring from the live members."""
+        lease = claims.acquire(self.firebase_db, f"{SHARD_ROOT}/workers/{self.index}",
+                               lease_s=self.lease_s, owner=self.owner, pid=os.getpid())
+        if lease is None:
+            print(f"⚠️ [SHARD {self.index}] membership slot held by another process; idling this cycle")
+            self.ring = HashRing([])
+            return
+        try:
+            members = self.firebase_db.reference(f"{SHARD_ROOT}/workers").get() or {}
+        except Exception as e:
+            print(f"⚠️ [SHARD {self.index}] member read failed; keeping the previous ring: {e}")
+            return
+        if isinstance(members, list):   # RTDB returns small integer-keyed maps as lists
+            members = {i: v for i, v in enumerate(members) if v}
+        now = time.time()
+        live = {int(k) for k, v in members.items()
+                if str(k).isdigit() and int(k) < self.shards and claims.is_held(v, now=now)}
+        live.add(self.index)
+        if live != self.ring.nodes:
+            print(f"[SHARD {self.index}] live workers: {sorted(live)}")
+            self.ring = HashRing(sorted(live))
+
+    def owns(self, symbol):
+        """True when the ring maps `symbol` to us AND we hold its lease (renewed right before acting on it)."""
+        path = f"{SHARD_ROOT}/symbols/{symbol}"
+        if self.ring.owner(symbol) != self.index:
+            if self._held.pop(symbol, None) is not None:
+                claims.Lease(self.firebase_db, path, {"owner": self.owner}).release()  # hand over now, not at expiry
+                print(f"[SHARD {self.index}] released {symbol}")
+            return False
+        now = time.time()
+        lease = claims.acquire(self.firebase_db, path, lease_s=self.lease_s, owner=self.owner)
+        if lease is None:
+            print(f"[SHARD {self.index}] {symbol} still leased by its previous owner; waiting")
+            self._held.pop(symbol, None)
+            return False
+        if symbol not in self._held:
+            print(f"[SHARD {self.index}] took ownership of {symbol}")
+        self._held[symbol] = now + self.lease_s
+        return True
+
+def run_worker(index, shards):
+    """Entry point of one worker process."""
+    # journal records are per worker slot, so a restarted slot replays exactly its own
+    os.environ["TRADE_JOURNAL_OWNER"] = f"monitor_shard{index}"
+    import monitor_trades_loop as mtl
+    import profiler
+    import scheduler
+    import trade_journal
+
+    name = f"monitor_shard{index}"
+    lease_s = lease_seconds(mtl.MONITOR_ACTIVE_S, mtl.MONITOR_IDLE_S, mtl.MONITOR_CLOSED_S)
+    member = ShardMembership(firebase_db, index, shards, lease_s)
+    prof = profiler.LoopProfiler(name, firebase_db)
+    trade_journal.recover(firebase_db)
+
+    def _cycle():
+        with prof.iteration():
+            member.heartbeat()
+            return mtl.monitor_trades(owns=member.owns)
+
+    scheduler.run_forever([
+        scheduler.Task(name, _cycle, active_s=mtl.MONITOR_ACTIVE_S, idle_s=mtl.MONITOR_IDLE_S,
+                       closed_s=mtl.MONITOR_CLOSED_S),
+    ], title=name)
+
+# ====================================================
+# 🟩 Parent: spawn + supervise
+# ====================================================
+def supervise(shards=MONITOR_SHARDS):
+    import multiprocessing as mp
+
+    ctx = mp.get_context("spawn")   # fresh interpreter per worker: no SDK threads/sockets inherited
+    procs, restarts, next_start, started_at = {}, {}, {}, {}
+    stopping = {"flag": False}
+
+    def _stop(*_):
+        stopping["flag"] = True
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    # records left by a single-process monitor run before sharding was switched on
+    import trade_journal
+    trade_journal.recover(firebase_db, owner="monitor_trades_loop")
+
+    print(f"[SHARDS] supervising {shards} monitor worker(s)")
+    while not stopping["flag"]:
+        now = time.monotonic()
+        for k in range(shards):
+            p = procs.get(k)
+            if p is not None and p.is_alive():
+                continue
+            if p is not None:
+                if now - started_at.get(k, now) > HEALTHY_RUN_S:
+                    restarts[k] = 0        # it ran fine for a while: crash-loop backoff starts over
+                n = restarts.get(k, 0)
+                delay = RESTART_BACKOFF_S[min(n, len(RESTART_BACKOFF_S) - 1)]
+                print(f"❌ [SHARDS] worker {k} exited (code {p.exitcode}); restart #{n + 1} in {delay}s")
+                restarts[k] = n + 1
+                next_start[k] = now + delay
+                procs[k] = None
+            if now < next_start.get(k, 0.0):
+                continue
+            proc = ctx.Process(target=run_worker, args=(k, shards), name=f"monitor_shard{k}", daemon=False)
+            proc.start()
+            procs[k] = proc
+            started_at[k] = now
+            print(f"[SHARDS] started worker {k} (pid {proc.pid})")
+        time.sleep(SUPERVISE_EVERY_S)
+
+    print("[SHARDS] stopping workers")
+    for p in procs.values():
+        if p is not None and p.is_alive():
+            p.terminate()
+    for p in procs.values():
+        if p is not None:
+            p.join(timeout=10)
+
+if __name__ == "__main__":
+    supervise(int(sys.argv[1]) if len(sys.argv) > 1 else MONITOR_SHARDS)
+
+#=========================  MONITOR_SHARDS (END OF SCRIPT)  ================================
@@ -1,45 +1,36 @@
 # ========================= MONITOR_TRADES_LOOP - Segment 1 ================================
-import firebase_admin
-from firebase_admin import credentials, initialize_app, db
-import requests
-import subprocess
-import firebase_active_contract
-import os
 from execute_trade_live import place_exit_trade
-import pprint
 from fifo_close import handle_exit_fill_from_tx
+import strategy_core
+import metrics
+import claims
+import ledger
+from trade_model import ExitTicket, TradeLeg, legs_from_node, stamped
+import session_calendar
 from collections import defaultdict
 import time
-import pytz
 from datetime import timezone
-from datetime import datetime, timezone as dt_timezone, timedelta
+from datetime import datetime, timezone as dt_timezone
 import datetime as dt
 from datetime import timezone as _utc_tz
+from firebase_client import firebase_db  # lazy: Admin SDK initializes on the first DB call
 # (UTC-only) — removed NZ local timezone usage
 
 processed_exit_order_ids = set()
 last_cleanup_timestamp = None
 DRAIN_VERBOSE = False  
 
-#Important: Do NOT set trade_type to "closed". Use 'status' or 'trade_state' to indicate closure.
-
-#================================
-# 🟩 FIREBASE INITIALIZATION======
-#================================
+# Scheduler intervals (seconds): open legs / pending exit tickets → active; flat → idle; Globex closed → closed
+MONITOR_ACTIVE_S = 5
+MONITOR_IDLE_S = 15
+MONITOR_CLOSED_S = 60
 
-# === Firebase Key ===
-firebase_key_path = "/etc/secrets/firebase_key.json" if os.path.exists("/etc/secrets/firebase_key.json") else "firebase_key.json"
-cred = credentials.Certificate(firebase_key_path)
+# Claim leases (seconds): how long a crashed claimant blocks others before its claim expires
+EXIT_CLAIM_LEASE_S = 120
+DRAIN_CLAIM_LEASE_S = 60
+FLATTEN_CLAIM_LEASE_S = 300
 
-# === Firebase Initialization ===
-if not firebase_admin._apps:
-    firebase_key_path = "/etc/secrets/firebase_key.json" if os.path.exists("/etc/secrets/firebase_key.json") else "firebase_key.json"
-    cred = credentials.Certificate(firebase_key_path)
-    initialize_app(cred, {
-        'databaseURL': "https://tw2tt-firebase-default-rtdb.asia-southeast1.firebasedatabase.app"
-    })
-
-firebase_db = db
+#Important: Do NOT set trade_type to "closed". Use 'status' or 'trade_state' to indicate closure.
 
 
 #################### ALL HELPERS FOR THIS SCRIPT ####################
@@ -63,6 +54,18 @@ MAX_OFFSET_CAP    = 4.0       # cap offset so it doesn’t blow out
 # ATR state cache
 _ema_absdiff = defaultdict(float)
 
+def _trail_params():
+    """Current module knobs as a strategy_core params dict (so live and backtest share one shape)."""
+    return {
+        "atr_alpha":         _ATR_ALPHA,
+        "atr_trigger_mult":  ATR_TRIGGER_MULT,
+        "atr_offset_mult":   ATR_OFFSET_MULT,
+        "min_trigger_floor": MIN_TRIGGER_FLOOR,
+        "min_offset_floor":  MIN_OFFSET_FLOOR,
+        "max_trigger_cap":   MAX_TRIGGER_CAP,
+        "max_offset_cap":    MAX_OFFSET_CAP,
+    }
+
 # ==================================================================
 # 🟩 HELPER - CANONICAL TIME PARSER (single source of truth for parsing)
 # ==================================================================
@@ -190,14 +193,20 @@ def run_zombie_cleanup_if_ready(trades_list, firebase_db, current_symbol, grace_
             return
 
         print(f"[ZOMBIE] 🧟 Purging {len(to_purge)} open entries for {current_symbol} after {int(elapsed)}s flat")
-        # archive then delete
+        # archive + delete + ledger zombie_purged event, one multi-path update per leg
         for oid, tr in list(to_purge.items()):
             try:
-                if isinstance(tr, dict):
+                leg = tr if ledger.is_open_trade(tr) else None
+                if isinstance(tr, (dict, TradeLeg)):
                     # mark closed-ish for record
                     tr = {**tr, "trade_state": "closed", "is_open": False, "contracts_remaining": 0}
-                archive_sym_ref.child(str(oid)).set(tr)
-                open_sym_ref.child(str(oid)).delete()
+                purged = ledger.record(firebase_db, "zombie_purged", current_symbol, str(oid), extra_updates={
+                    f"zombie_trades_log/{current_symbol}/{oid}": stamped(tr),
+                    f"open_active_trades/{current_symbol}/{oid}": None,
+                }, leg=leg, grace_s=int(elapsed))
+                if not purged:  # ledger write failed → legacy two-step purge
+                    archive_sym_ref.child(str(oid)).set(stamped(tr))
+                    open_sym_ref.child(str(oid)).delete()
             except Exception as e:
                 print(f"[ZOMBIE] ❌ failed to purge {current_symbol}/{oid}: {e}")
 
@@ -250,71 +259,27 @@ def ensure_session_guards_defaults(firebase_db):
     _need("london/duration_min", 15)
     _need("london/tz", "Europe/London")
 
-# ==============================================================
-# 🟩 Helper: Get active session guard (Tokyo, London, New York)
-# ==============================================================
-def _today_local_window(start_hhmm: str, duration_min: int, tzname: str, now_utc=None):
-    """Build today's [start,end) window in UTC for a given local time + duration."""
-    now_utc = now_utc or datetime.now(dt_timezone.utc)
-    tz = pytz.timezone(tzname or "UTC")
-
-    # "today" in that tz
-    local_now = now_utc.astimezone(tz)
-    try:
-        hh, mm = map(int, (start_hhmm or "00:00").split(":"))
-    except Exception:
-        hh, mm = 0, 0
-
-    # today's local start at hh:mm
-    start_local = local_now.replace(hour=hh, minute=mm, second=0, microsecond=0)
-
-    # convert to UTC (pytz handles DST)
-    start_utc = tz.localize(start_local.replace(tzinfo=None)).astimezone(dt_timezone.utc)
-    end_utc   = start_utc + timedelta(minutes=int(duration_min or 0))
-    return start_utc, end_utc
-
 # Track last seen guard across calls
 _last_guard = {"session": None}
 
+# ==============================================================
+# 🟩 Helper: Get active session guard (Tokyo, London, New York)
+# ==============================================================
 def get_active_session_guard(firebase_db, now_utc=None):
     """
-    Reads /settings/session_guards and returns a dict when 'now_utc' is inside a window:
+    Returns a dict when 'now_utc' is inside a guard window:
       {"session": "<tokyo|new_york|london>", "start_utc": "...", "end_utc": "..."}
+    Answered from the precomputed session calendar (config cached, see session_calendar).
     """
-    global _last_guard
     now_utc = now_utc or datetime.now(dt_timezone.utc)
-    cfg = firebase_db.reference("/settings/session_guards").get() or {}
-    if not cfg or not cfg.get("enabled", False):
-        if _last_guard["session"]:
-            print(f"[SESSION] { _last_guard['session'] } guard released (global disabled)")
-            _last_guard["session"] = None
-        return None
-
-    for name in ("tokyo", "new_york", "london"):
-        s = cfg.get(name) or {}
-        if not s.get("enabled", False):
-            continue
-        dur = int(s.get("duration_min", 0))
-        if dur <= 0:
-            continue
+    guard = session_calendar.active_guard(firebase_db, now_utc)
 
-        start_utc, end_utc = _today_local_window(
-            s.get("start_local", "00:00"),
-            dur,
-            s.get("tz", "UTC"),
-            now_utc=now_utc
-        )
-
-        if start_utc <= now_utc <= end_utc:
-            # Announce on *enter*
-            if _last_guard["session"] != name:
-                print(f"[SESSION] {name} guard ACTIVE {start_utc} → {end_utc} UTC")
-                _last_guard["session"] = name
-            return {
-                "session": name,
-                "start_utc": start_utc.isoformat(),
-                "end_utc": end_utc.isoformat(),
-            }
+    if guard:
+        # Announce on *enter*
+        if _last_guard["session"] != guard["session"]:
+            print(f"[SESSION] {guard['session']} guard ACTIVE {guard['start_utc']} → {guard['end_utc']} UTC")
+            _last_guard["session"] = guard["session"]
+        return guard
 
     # Announce on *exit*
     if _last_guard["session"]:
@@ -322,29 +287,44 @@ def get_active_session_guard(firebase_db, now_utc=None):
         _last_guard["session"] = None
     return None
 
+# ==============================================
+# Helper: Ledger upkeep (bootstrap + snapshots)
+# ==============================================
+LEDGER_CHECKPOINT_S = 600
+POSITION_CHECK_S = 60
+_ledger_bootstrapped = set()
+_ledger_next_checkpoint = {}
+_position_next_check = {}
+
+def ledger_upkeep(firebase_db, symbol):
+    """
+    Seed the ledger views for `symbol` once per process; snapshot + drift check every LEDGER_CHECKPOINT_S;
+    position counter vs full-scan self-check every POSITION_CHECK_S.
+    """
+    if symbol not in _ledger_bootstrapped:
+        ledger.bootstrap(firebase_db, [symbol])
+        _ledger_bootstrapped.add(symbol)
+    now = time.time()
+    if now >= _ledger_next_checkpoint.get(symbol, 0.0):
+        _ledger_next_checkpoint[symbol] = now + LEDGER_CHECKPOINT_S
+        ledger.checkpoint(firebase_db, symbol)
+    if now >= _position_next_check.get(symbol, 0.0):
+        _position_next_check[symbol] = now + POSITION_CHECK_S
+        ledger.verify_position(firebase_db, symbol)
+
 # ==============================================
 # Helper: Net position from /open_active_trades
 # ==============================================
 def net_position(firebase_db, symbol: str) -> int:
     """
-    Net = (# BUY legs) - (# SELL legs) for *open* trades of this symbol.
+    Net signed contracts (BUY minus SELL, by contracts remaining) for *open* trades of this symbol.
     Ignores exited/closed/failed and zero-qty legs.
+    Served from the ledger's position counter; scans /open_active_trades for symbols not yet bootstrapped.
     """
-    snap = firebase_db.reference(f"/open_active_trades/{symbol}").get() or {}
-    net = 0
-    for v in snap.values():
-        if not isinstance(v, dict):
-            continue
-        if v.get("exited") or (v.get("status", "").lower() in ("closed", "failed")):
-            continue
-        if int(v.get("contracts_remaining", 1) or 0) <= 0:
-            continue
-        side = (v.get("action") or "").upper()
-        if side == "BUY":
-            net += 1
-        elif side == "SELL":
-            net -= 1
-    return net
+    net = ledger.net_position(firebase_db, symbol)
+    if net is not None:
+        return net
+    return ledger.net_from_legs(ledger.scan_open_legs(firebase_db, symbol))
 
 
 # ==============================================
@@ -384,7 +364,18 @@ def log_every_n(msg: str, n: int = LOG_EVERY):
 # 🟩 HELPER: Load Live Prices from Firebase
 # =========================================
 def load_live_prices():
-    return db.reference("live_prices").get() or {}
+    """{symbol: price_feed.Quote} from this process's /live_prices replica (stream or delta poll)."""
+    import price_feed
+
+    return price_feed.feed_for(firebase_db).quotes()
+
+def _stale_skip(engine, symbol, quote, what):
+    import price_feed
+
+    age = quote.age_s() if quote is not None else None
+    print(f"[{symbol}] ⏸️ [{engine.upper()}] price stale (age={'?' if age is None else f'{age:.0f}s'}, "
+          f"limit {price_feed.PRICE_STALE_S:.0f}s) — {what}")
+    metrics.inc("price_stale_skips", engine=engine)
 
 # ===============================================================
 # 🟩 HELPER: Both symbol and falt check in Zombie and ghost logs
@@ -410,7 +401,7 @@ def _log_ids_for(dbh, path, symbol):
 
 def load_trailing_tp_settings():
     try:
-        ref = db.reference('/trailing_tp_settings')
+        ref = firebase_db.reference('/trailing_tp_settings')
         cfg = ref.get() or {}
 
         if cfg.get("enabled", False):
@@ -460,13 +451,11 @@ def is_archived_trade(order_id, firebase_db):
 
 def load_open_trades(symbol):
     try:
-        ref = db.reference(f"/open_active_trades/{symbol}")
+        ref = firebase_db.reference(f"/open_active_trades/{symbol}")
         data = ref.get() or {}
         trades = []
         if isinstance(data, dict):
-            for order_id, td in data.items():
-                td['order_id'] = order_id
-                trades.append(td)
+            trades = list(legs_from_node(data).values())
         print(f"🔄 Loaded {len(trades)} open trades from Firebase.")
         return trades
     except Exception as e:
@@ -474,57 +463,46 @@ def load_open_trades(symbol):
         return []
 
 
-def save_open_trades(symbol, trades, grace_seconds: int = 18):
+# Leg fields other writers own: the exit claim lease (claims) and broker-side children (broker_exits)
+_FOREIGN_LEG_FIELDS = ("exit_pending", "broker_exit")
 
+def snapshot_legs(trades):
+    """{order_id: Firebase dict} copy of the legs as loaded — the baseline save_open_trades diffs against."""
+    return {t.get("order_id"): (t.to_firebase() if isinstance(t, TradeLeg) else dict(t))
+            for t in trades if isinstance(t, (dict, TradeLeg)) and t.get("order_id")}
+
+def save_open_trades(symbol, trades, baseline=None, finished=()):
     """
-    Atomic overwrite of /open_active_trades/{symbol} with a short grace period:
-    - Writes all valid 'trades' you pass in.
-    - Keeps any *existing* Firebase trade for this symbol if its entry_timestamp is within the last `grace_seconds`.
-    - Flushes old/zombie entries.
+    Per-field multi-path update of /open_active_trades/{symbol} — never a node overwrite:
+    - Writes only the fields of each leg in `trades` that changed since `baseline` (snapshot_legs at load).
+    - Skips legs no longer in Firebase (closed/archived meanwhile) so no stub is resurrected.
+    - Removes the `finished` order ids (terminal legs the loop filtered out).
+    exit_pending leases, broker children and legs parked or added by other workers are left untouched.
     """
-    ref = db.reference(f"/open_active_trades/{symbol}")
-
+    baseline = baseline or {}
     try:
-        # 1) Build fresh payload from provided trades
-        fresh = {}
+        present = firebase_db.reference(f"/open_active_trades/{symbol}").get(shallow=True) or {}
+        updates = {}
+        for oid in finished:
+            if oid in present:
+                updates[f"open_active_trades/{symbol}/{oid}"] = None
         for t in trades:
-            if not isinstance(t, dict):
+            if not isinstance(t, (dict, TradeLeg)):
                 continue
             oid = t.get("order_id")
-            if not oid:
+            if not oid or oid not in present or oid in finished:
                 continue
             if t.get("symbol") not in (None, "", symbol):  # drop mismatched symbols
                 continue
-            status = (t.get("status") or "").lower()
-            if t.get("exited") or status in ("closed", "failed") or (t.get("contracts_remaining", 0) or 0) <= 0:
-                continue
-            fresh[oid] = t
-
-        # 2) Load existing to apply short grace for very-new trades
-        existing = ref.get() or {}
-        now_utc = datetime.now(dt_timezone.utc)
-        cutoff = now_utc - timedelta(seconds=grace_seconds)
-
-        # Keep any existing recent trade not present in `fresh`
-        for oid, tr in existing.items():
-            if oid in fresh:
-                continue
-            if not isinstance(tr, dict):
-                continue
-            if tr.get("symbol") not in (None, "", symbol):
-                continue
-            status = (tr.get("status") or "").lower()
-            if tr.get("exited") or status in ("closed", "failed") or (tr.get("contracts_remaining", 0) or 0) <= 0:
-                continue
-            # Use entry_timestamp; fallback to transaction_time if needed
-            ts = tr.get("entry_timestamp") or tr.get("transaction_time") or ""
-            ts_utc = parse_any_ts_to_utc(ts)
-            if ts_utc >= cutoff:
-                fresh[oid] = tr  # protect very recent trade
-
-        # 3) Atomic overwrite with protected set
-        ref.set(fresh)
-        print(f"✅ Open Active Trades overwritten atomically (kept {len(fresh)}; grace={grace_seconds}s)")
+            now = t.to_firebase() if isinstance(t, TradeLeg) else dict(t)
+            was = baseline.get(oid) or {}
+            for field in set(now) | set(was):
+                if field in _FOREIGN_LEG_FIELDS or now.get(field) == was.get(field):
+                    continue
+                updates[f"open_active_trades/{symbol}/{oid}/{field}"] = now.get(field)
+        if updates:
+            firebase_db.reference("/").update(updates)
+        print(f"✅ Open Active Trades updated ({len(updates)} path(s); {len(finished)} finished)")
     except Exception as e:
         print(f"❌ Failed to save open trades to Firebase: {e}")
 
@@ -537,7 +515,7 @@ def process_trailing_tp_and_exits(active_trades, prices, trigger_points, offset_
     print(f"[DEBUG] process_trailing_tp_and_exits() called with {len(active_trades)} active trades")
 
     for i, trade in enumerate(active_trades):
-        if not trade or not isinstance(trade, dict):
+        if not trade or not isinstance(trade, (dict, TradeLeg)):
             continue
         if trade.get("status") == "closed":
             print(f"🔒 Skipping closed trade {trade.get('order_id')}")
@@ -547,23 +525,27 @@ def process_trailing_tp_and_exits(active_trades, prices, trigger_points, offset_
         symbol = trade.get('symbol')
         print(f"🔄 Processing trade {order_id}")
 
-        # ---- Guard: skip if an exit is already pending for this trade ----
-        try:
-            pend_ref = firebase_db.reference(f"/open_active_trades/{symbol}/{order_id}/exit_pending")
-            if trade.get("exit_pending") or bool(pend_ref.get()):
-                print(f"⏭️ Skip {order_id}: exit_pending is set")
-                continue
-        except Exception as e:
-            print(f"⚠️ exit_pending pre-check failed for {order_id}: {e}")
+        # ---- Guard: skip if an exit is already claimed (this cycle's snapshot; the claim itself is atomic) ----
+        if claims.is_held(trade.get("exit_pending")):
+            print(f"⏭️ Skip {order_id}: exit_pending is set")
+            continue
+        # ---- Guard: broker-native exit children are working at Tiger (broker_exits) ----
+        if trade.get("broker_exit"):
+            print(f"⏭️ Skip {order_id}: broker-side exit orders attached")
+            continue
 
         direction = 1 if (trade.get('action') or '').upper() == 'BUY' else -1
-        price_node = prices.get(symbol)
-        current_price = price_node.get('price') if isinstance(price_node, dict) else price_node
-        ema50 = price_node.get('ema50') if isinstance(price_node, dict) else None
-
-        if current_price is None:
+        quote = prices.get(symbol)
+        if quote is None or quote.price is None:
             print(f"⚠️ No price for {symbol} — skipping {order_id}")
             continue
+        if quote.stale:
+            # a frozen feed must not ratchet stops or fire exits at an old price
+            _stale_skip("trailing", symbol, quote, f"skipping {order_id}")
+            continue
+        current_price = quote.price
+        ema50 = quote.ema50
+        tick_atr = quote.atr  # published by app (tick_buffer)
 
         entry = trade.get('filled_price')
         if entry is None:
@@ -573,95 +555,67 @@ def process_trailing_tp_and_exits(active_trades, prices, trigger_points, offset_
         # ---- Adaptive “ATR-like” range update (per symbol) ----
         try:
             global _ema_absdiff
-            raw_range = abs((current_price - ema50)) if ema50 is not None else abs(current_price - entry)
-            prev = _ema_absdiff.get(symbol, raw_range)
-            smoothed = (_ATR_ALPHA * raw_range) + ((1.0 - _ATR_ALPHA) * prev)
+            if tick_atr:
+                # true ATR at tick resolution wins; the 10s single-sample proxy is the fallback
+                smoothed = float(tick_atr)
+            else:
+                smoothed = strategy_core.atr_proxy_update(_ema_absdiff.get(symbol), current_price, entry, ema50, _ATR_ALPHA)
             _ema_absdiff[symbol] = smoothed
+            adaptive_trigger, adaptive_offset = strategy_core.adaptive_trail(smoothed, _trail_params())
 
-            adaptive_trigger = max(MIN_TRIGGER_FLOOR, min(MAX_TRIGGER_CAP, ATR_TRIGGER_MULT * smoothed))
-            adaptive_offset  = max(MIN_OFFSET_FLOOR,  min(MAX_OFFSET_CAP,  ATR_OFFSET_MULT  * smoothed))
-
-            print(f"[ATR] {symbol} smoothed={smoothed:.2f} trig={adaptive_trigger:.2f} off={adaptive_offset:.2f} ema50={ema50}")
-
-            # Snapshot trail settings → Firebase
-            try:
-                node = firebase_db.reference(f"/open_active_trades/{symbol}/{order_id}")
-                trigger_pts = float(adaptive_trigger)
-                offset_pts  = float(adaptive_offset)
-                trigger_price = (entry + trigger_pts) if direction == 1 else (entry - trigger_pts)
-                node.update({
-                    "trail_mode": "ATR",
-                    "trail_trigger": trigger_pts,
-                    "trail_offset":  offset_pts,
-                    "trail_trigger_price": trigger_price
-                })
-                trade["trail_mode"] = "ATR"
-                trade["trail_trigger"] = trigger_pts
-                trade["trail_offset"]  = offset_pts
-                trade["trail_trigger_price"] = trigger_price
-            except Exception as e:
-                print(f"⚠️ Trail snapshot failed for {order_id}: {e}")
-
+            print(f"[ATR] {symbol} smoothed={smoothed:.2f} trig={adaptive_trigger:.2f} off={adaptive_offset:.2f} "
+                  f"ema50={ema50} src={'tick' if tick_atr else 'proxy'}")
+            trail_mode = "ATR"
         except Exception as e:
             print(f"⚠️ ATR adapt error for {symbol}: {e}")
             adaptive_trigger = float(trigger_points)
             adaptive_offset  = float(offset_points)
+            trail_mode = "FALLBACK"
+
+        # Snapshot trail settings → Firebase
+        try:
+            node = firebase_db.reference(f"/open_active_trades/{symbol}/{order_id}")
+            trigger_price = strategy_core.trigger_price_for(entry, direction, float(adaptive_trigger))
+            snapshot = {
+                "trail_mode": trail_mode,
+                "trail_trigger": float(adaptive_trigger),
+                "trail_offset":  float(adaptive_offset),
+                "trail_trigger_price": trigger_price
+            }
+            node.update(snapshot)
+            trade.update(snapshot)
+        except Exception as e:
+            print(f"⚠️ Trail snapshot failed for {order_id}: {e}")
+
+        # ---- Trigger arming / peak update / exit check (pure rules in strategy_core) ----
+        prev_peak = trade.get('trail_peak', entry)
+        events = strategy_core.trail_step(trade, current_price, adaptive_trigger, adaptive_offset)
+        if not events["armed"] and not trade.get('trail_hit'):
+            print(f"[DEBUG] {order_id} trigger @ {events['trigger_price']:.2f} (entry {entry:.2f}, dir {'LONG' if direction==1 else 'SHORT'})")
+
+        if events["armed"]:
+            print(f"[INFO] TP trigger HIT for {order_id} at {current_price:.2f}")
             try:
-                node = firebase_db.reference(f"/open_active_trades/{symbol}/{order_id}")
-                trigger_price = (entry + adaptive_trigger) if direction == 1 else (entry - adaptive_trigger)
-                node.update({
-                    "trail_mode": "FALLBACK",
-                    "trail_trigger": adaptive_trigger,
-                    "trail_offset":  adaptive_offset,
-                    "trail_trigger_price": trigger_price
+                firebase_db.reference(f"/open_active_trades/{symbol}").child(order_id).update({
+                    "trail_hit": True,
+                    "trail_peak": trade["trail_peak"],
+                    "trail_stop_price": trade["trail_stop_price"]
                 })
-                trade["trail_mode"] = "FALLBACK"
-                trade["trail_trigger"] = adaptive_trigger
-                trade["trail_offset"]  = adaptive_offset
-                trade["trail_trigger_price"] = trigger_price
-            except Exception as e2:
-                print(f"⚠️ Fallback trail snapshot failed for {order_id}: {e2}")
-
-        # ---- Trigger arming (first time only) ----
-        if not trade.get('trail_hit'):
-            trade['trail_peak'] = entry
-            trigger_price = entry + adaptive_trigger if direction == 1 else entry - adaptive_trigger
-            print(f"[DEBUG] {order_id} trigger @ {trigger_price:.2f} (entry {entry:.2f}, dir {'LONG' if direction==1 else 'SHORT'})")
-            if (direction == 1 and current_price >= trigger_price) or (direction == -1 and current_price <= trigger_price):
-                trade['trail_hit'] = True
-                trade['trail_peak'] = current_price
-                print(f"[INFO] TP trigger HIT for {order_id} at {current_price:.2f}")
-                try:
-                    open_trades_ref = firebase_db.reference(f"/open_active_trades/{symbol}")
-                    open_trades_ref.child(order_id).update({
-                        "trail_hit": True,
-                        "trail_peak": current_price,
-                        "trail_stop_price": (current_price - float(adaptive_offset)) if direction == 1 else (current_price + float(adaptive_offset))
-                    })
-                    trade["trail_hit"] = True
-                    trade["trail_peak"] = current_price
-                    trade["trail_stop_price"] = (current_price - float(adaptive_offset)) if direction == 1 else (current_price + float(adaptive_offset))
-                except Exception as e:
-                    print(f"❌ Failed to update trail_hit for {order_id}: {e}")
+            except Exception as e:
+                print(f"❌ Failed to update trail_hit for {order_id}: {e}")
 
-        # ---- Trail peak update + exit check ----
         if trade.get('trail_hit'):
-            prev_peak = trade.get('trail_peak', entry)
-            new_peak = max(prev_peak, current_price) if direction == 1 else min(prev_peak, current_price)
-
-            if new_peak != prev_peak:
-                print(f"[DEBUG] New trail peak for {order_id}: {new_peak:.2f} (prev: {prev_peak:.2f})")
-                trade['trail_peak'] = new_peak
+            if events["peak_moved"]:
+                print(f"[DEBUG] New trail peak for {order_id}: {trade['trail_peak']:.2f} (prev: {prev_peak:.2f})")
                 try:
                     firebase_db.reference(f"/open_active_trades/{symbol}").child(order_id).update({
-                        "trail_peak": new_peak,
-                        "trail_stop_price": (new_peak - float(adaptive_offset)) if direction == 1 else (new_peak + float(adaptive_offset))
+                        "trail_peak": trade["trail_peak"],
+                        "trail_stop_price": trade["trail_stop_price"]
                     })
-                    trade["trail_stop_price"] = (new_peak - float(adaptive_offset)) if direction == 1 else (new_peak + float(adaptive_offset))
                 except Exception as e:
                     print(f"❌ Failed to update trail_peak for {order_id}: {e}")
             else:
-                print(f"[DEBUG] Trail peak unchanged for {order_id}: {prev_peak:.2f}")
+                print(f"[DEBUG] Trail peak unchanged for {order_id}: {trade['trail_peak']:.2f}")
 
             buffer_amt = float(adaptive_offset)
             print(f"[DEBUG] Buffer for {order_id}: {buffer_amt:.2f} | price {current_price:.2f} vs peak {trade['trail_peak']:.2f}")
@@ -671,29 +625,20 @@ def process_trailing_tp_and_exits(active_trades, prices, trigger_points, offset_
                 firebase_db.reference(f"/open_active_trades/{symbol}/{order_id}").update({
                     "trail_offset": buffer_amt
                 })
-                trade["trail_offset"] = buffer_amt
             except Exception:
                 pass
 
-            exit_trigger = (
-                (direction == 1 and current_price <= trade['trail_peak'] - buffer_amt) or
-                (direction == -1 and current_price >= trade['trail_peak'] + buffer_amt)
-            )
+            exit_trigger = events["exit"]
             if exit_trigger:
                 print(f"[INFO] Trailing TP EXIT condition met for {order_id}")
 
-                # ---- Claim to avoid duplicate exits ----
-                node_ref = firebase_db.reference(f"/open_active_trades/{symbol}/{order_id}")
-                try:
-                    current = node_ref.get() or {}
-                    if current.get("exit_pending"):
-                        print(f"⏭️ {order_id} already claimed (exit_pending). Skipping duplicate exit.")
-                        continue
-                    node_ref.update({"exit_pending": True})
-                    trade["exit_pending"] = True
-                except Exception as e:
-                    print(f"❌ Failed to claim {order_id} (set exit_pending): {e}")
+                # ---- Claim to avoid duplicate exits (one transaction; lease expires if we crash) ----
+                lease = claims.acquire(firebase_db, f"/open_active_trades/{symbol}/{order_id}/exit_pending",
+                                       lease_s=EXIT_CLAIM_LEASE_S)
+                if lease is None:
+                    print(f"⏭️ {order_id} already claimed (exit_pending). Skipping duplicate exit.")
                     continue
+                trade["exit_pending"] = lease.value
 
                 # ---- Place exit ----
                 try:
@@ -722,31 +667,26 @@ def process_trailing_tp_and_exits(active_trades, prices, trigger_points, offset_
 
                         tickets_ref = firebase_db.reference(f"/exit_orders_log/{symbol}")
                         try:
-                            tickets_ref.child(tx_dict["order_id"]).set({**tx_dict, "_processed": False})
+                            # create-if-absent: fill_stream may already have ticketed (and drained) this fill
+                            tickets_ref.child(tx_dict["order_id"]).transaction(
+                                lambda cur: cur or stamped({**tx_dict, "_processed": False}))
                         except Exception as e2:
                             print(f"❌ Failed to enqueue exit ticket {tx_dict.get('order_id')}: {e2}")
-                            try:
-                                node_ref.update({"exit_pending": False})
-                                trade["exit_pending"] = False
-                            except Exception:
-                                pass
+                            lease.release()
+                            trade.pop("exit_pending", None)
                         else:
                             print(f"[INFO] Exit ticket enqueued (not processed here): {tx_dict['order_id']}")
+                            lease.done(exit_order_id=tx_dict["order_id"])
+                            trade["exit_pending"] = lease.value
                     else:
                         print(f"❌ Exit order failed for {order_id}: {result}")
-                        try:
-                            node_ref.update({"exit_pending": False})
-                            trade["exit_pending"] = False
-                        except Exception:
-                            pass
+                        lease.release()
+                        trade.pop("exit_pending", None)
 
                 except Exception as e:
                     print(f"❌ Exception placing exit for {order_id}: {e}")
-                    try:
-                        node_ref.update({"exit_pending": False})
-                        trade["exit_pending"] = False
-                    except Exception:
-                        pass
+                    lease.release()
+                    trade.pop("exit_pending", None)
 
         # Write back in-place
         active_trades[i] = trade
@@ -757,8 +697,15 @@ def process_trailing_tp_and_exits(active_trades, prices, trigger_points, offset_
 # MONITOR TRADES LOOP - CENTRAL LOOP  (multi-symbol, symbol-scoped logs)
 # ========================================================
 
-def monitor_trades():
+def monitor_trades(owns=None):
+    """
+    One pass over every symbol in /open_active_trades.
+    `owns(symbol) -> bool` restricts the pass to one shard's symbols (see monitor_shards); None = all.
+    """
    #print("[DEBUG] - entering monitor_trades()")
+    sw = metrics.Stopwatch("monitor_trades")
+    open_legs = 0        # scheduler activity signal (see return at the bottom)
+    pending_exits = 0
 
     # Ensure global/session guards once per loop (unchanged)
     ensure_session_guards_defaults(firebase_db)
@@ -766,7 +713,7 @@ def monitor_trades():
     # Load trailing TP settings once (global defaults or your Firebase-backed values)
     trigger_points, offset_points = load_trailing_tp_settings()
 
-    # Single fetch of live prices for this loop; dict of {symbol: {price:..., ema...} or number}
+    # Live prices for this loop from the local replica; {symbol: Quote} (stale quotes are flagged, not dropped)
     prices = load_live_prices()
 
     # Pull ALL symbols' open trades and iterate per symbol
@@ -774,6 +721,7 @@ def monitor_trades():
         all_trades_by_symbol = firebase_db.reference("/open_active_trades").get() or {}
     except Exception as e:
         print(f"❌ Failed to load /open_active_trades: {e}")
+        sw.done(outcome="error")
         return
 
     # --- AnchorGate toggle (global; default OFF if missing/error)
@@ -782,10 +730,12 @@ def monitor_trades():
     except Exception:
         ag_enabled = False
     log_on_change("[CFG] AnchorGate enabled:", ag_enabled)
+    sw.lap("load")
 
     if not isinstance(all_trades_by_symbol, dict) or not all_trades_by_symbol:
         print("⚠️ No open trades found; nothing to monitor")
-        return
+        sw.done(outcome="idle")
+        return False
 
     # Heartbeat (60s) — print a quick per-symbol price snapshot
     now = time.time()
@@ -801,10 +751,14 @@ def monitor_trades():
             continue
         if not open_trades_map:
             continue
+        if owns is not None and not owns(symbol):
+            continue
 
         if do_hb:
-            sym_px = (prices.get(symbol) or {}).get('price') if isinstance(prices.get(symbol), dict) else prices.get(symbol)
-            print(f"🛰️  Worker alive — {symbol} price: {sym_px}")
+            q = prices.get(symbol)
+            age = q.age_s() if q is not None else None
+            print(f"🛰️  Worker alive — {symbol} price: {q.price if q is not None else None} "
+                  f"(age {'?' if age is None else f'{age:.0f}s'})")
 
         # 🔑 Ensure per-symbol toggles exist (harmless if already set)
         try:
@@ -817,6 +771,8 @@ def monitor_trades():
                 cref.set(6)
         except Exception as e:
             print(f"⚠️ Settings seed skipped for {symbol}: {e}")
+        ledger_upkeep(firebase_db, symbol)
+        sw.lap("settings_seed")
 
         # === Session guard: auto-flatten once at window start (per symbol) ===
         try:
@@ -827,15 +783,21 @@ def monitor_trades():
                 last = firebase_db.reference(stamp_key).get()
 
                 if not last or last < guard["start_utc"]:
-                    cur = net_position(firebase_db, symbol)
-                    if cur != 0:
-                        side = "SELL" if cur > 0 else "BUY"
-                        n = abs(cur)
-                        print(f"[SESSION] Auto-flatten {n} legs ({side}) for {symbol} "
-                            f"during {guard['session']} window {guard['start_utc']}→{guard['end_utc']}")
-
-                        for _ in range(n):
-                            r = place_exit_trade(symbol, side, 1, firebase_db)
+                    # one worker per symbol per window: the claim's tag is the window start
+                    lease = claims.acquire(firebase_db, f"/runtime/claims/session_flatten/{symbol}",
+                                           lease_s=FLATTEN_CLAIM_LEASE_S, tag=guard["start_utc"])
+                    if lease is None:
+                        print(f"[SESSION] {symbol} flatten for {guard['session']} claimed by another worker; skipping.")
+                    else:
+                        cur = net_position(firebase_db, symbol)
+                        if cur != 0:
+                            side = "SELL" if cur > 0 else "BUY"
+                            n = abs(cur)
+                            print(f"[SESSION] Auto-flatten {n} contract(s) ({side}) for {symbol} "
+                                f"during {guard['session']} window {guard['start_utc']}→{guard['end_utc']}")
+
+                            # one N-lot exit; the FIFO close matches it across the open legs
+                            r = place_exit_trade(symbol, side, n, firebase_db)
                             if r and str(r.get("order_id","")).isdigit():
                                 tx = {
                                     "status": r.get("status","SUCCESS"),
@@ -843,7 +805,7 @@ def monitor_trades():
                                     "trade_type": "SESSION_GUARD_EXIT",
                                     "symbol": symbol,
                                     "action": side,
-                                    "quantity": 1,
+                                    "quantity": r.get("quantity") or n,
                                     "filled_price": r.get("filled_price"),
                                     "transaction_time": normalize_to_utc_iso(
                                         r.get("transaction_time") or datetime.utcnow().isoformat()
@@ -852,18 +814,21 @@ def monitor_trades():
                                 }
                                 handle_exit_fill_from_tx(firebase_db, tx)
                             else:
-                                print(f"[SESSION] Exit place failed (skipping this leg): {r}")
-                    else:
-                        print(f"[SESSION] Net already flat for {symbol}; nothing to flatten.")
+                                print(f"[SESSION] Exit place failed: {r}")
+                        else:
+                            print(f"[SESSION] Net already flat for {symbol}; nothing to flatten.")
 
-                    firebase_db.reference(stamp_key).set(guard["start_utc"])
-                    print(f"[SESSION] Flattened at {guard['session']} open ({guard['start_utc']}).")
+                        firebase_db.reference(stamp_key).set(guard["start_utc"])
+                        print(f"[SESSION] Flattened at {guard['session']} open ({guard['start_utc']}).")
+                        lease.done()
         except Exception as e:
             print(f"⚠️ Session guard flatten block failed softly for {symbol}: {e}")
+        sw.lap("session_guard")
 
         print(f"[ZOMBIE] check {symbol}: using broker flatness via /live_total_positions/by_symbol")
         # Load open trades list for this symbol; if None, the zombie helper will purge everything for the symbol
         all_trades = load_open_trades(symbol)
+        loaded_legs = snapshot_legs(all_trades)   # baseline for the per-field save at the end of the loop
 
         # (Optional fetch if you want to inspect broker nets; not needed by the helper)
         # live_pos_data = firebase_db.reference("/live_total_positions").get() or {}
@@ -876,28 +841,41 @@ def monitor_trades():
             symbol,
             grace_period_seconds=ZOMBIE_GRACE_SECONDS
         )
+        sw.lap("zombie_cleanup")
         # Filter active trades (symbol-scoped ghost/zombie logs)
         active_trades = []
+        finished_legs = set()   # terminal legs still in the node; save_open_trades removes them
         GHOST_STATUSES = {"EXPIRED", "CANCELLED", "LACK_OF_MARGIN"}
-        existing_zombies = _log_ids_for(firebase_db, "/zombie_trades_log", symbol)
-        existing_ghosts  = _log_ids_for(firebase_db, "/ghost_trades_log",  symbol)
+        finished_ids = ledger.closed_ids(firebase_db, symbol)   # one shallow read of the ledger view
+        if finished_ids is None:
+            existing_zombies = _log_ids_for(firebase_db, "/zombie_trades_log", symbol)
+            existing_ghosts  = _log_ids_for(firebase_db, "/ghost_trades_log",  symbol)
 
         for t in all_trades:
             order_id = t.get('order_id')
             if not order_id:
                 print(f"[{symbol}] ⚠️ Skipping trade with no order_id")
                 continue
-            if is_archived_trade(order_id, firebase_db):
+            if finished_ids is not None:
+                if order_id in finished_ids:
+                    print(f"[{symbol}] ⏭️ Skipping finished trade {order_id} (ledger)")
+                    finished_legs.add(order_id)
+                    continue
+            elif is_archived_trade(order_id, firebase_db):
                 print(f"[{symbol}] ⏭️ Skipping archived trade {order_id}")
+                finished_legs.add(order_id)
                 continue
-            if order_id in existing_zombies:
+            elif order_id in existing_zombies:
                 print(f"[{symbol}] ⏭️ Skipping zombie trade {order_id}")
+                finished_legs.add(order_id)
                 continue
-            if order_id in existing_ghosts:
+            elif order_id in existing_ghosts:
                 print(f"[{symbol}] ⏭️ Skipping ghost trade {order_id}")
+                finished_legs.add(order_id)
                 continue
             if t.get('exited') or t.get('status') in ['failed', 'closed']:
                 print(f"[{symbol}] 🔁 Skipping exited/closed trade {order_id}")
+                finished_legs.add(order_id)
                 continue
             if not t.get('filled') and (t.get('status', '').upper() not in GHOST_STATUSES):
                 print(f"[{symbol}] 🧾 Skipping {order_id} ⚠️ not filled and not a ghost trade")
@@ -907,6 +885,7 @@ def monitor_trades():
                       f"trigger={trigger_points}, buffer={offset_points}")
                 continue
             active_trades.append(t)
+        sw.lap("filter_active")
 
         if not active_trades:
             print(f"[{symbol}] ⚠️ No active trades — Trade Worker happy & awake.")
@@ -969,51 +948,26 @@ def monitor_trades():
                 handoff_active = time.time() < monitor_trades._handoff_clear_at
 
                 # ---- compute anchor unrealized (points) vs current price
-                cur_px = (prices.get(symbol) or {}).get("price") if isinstance(prices.get(symbol), dict) else prices.get(symbol)
+                quote  = prices.get(symbol)
                 entry  = float(anchor.get("filled_price", 0.0) or 0.0)
                 side   = (anchor.get("action") or "BUY").upper()
 
-                if cur_px is None:
-                    cur_px = entry  # last resort to avoid None math
-
-                if side == "BUY":
-                    unreal_pts = float(cur_px) - entry
+                # ---- stale price → freeze the gate: keep sticky state and stored gate flags, no trailing
+                gate_frozen = quote is None or quote.stale
+                if gate_frozen:
+                    _stale_skip("anchorgate", symbol, quote, "gate frozen, trailing skipped this loop")
+                    gate_updates = []
                 else:
-                    unreal_pts = entry - float(cur_px)
+                    unreal_pts = strategy_core.unrealized_points(side, entry, quote.price)
 
-                # ---- sticky unlock: once >= threshold, it stays unlocked until handoff
-                sticky = monitor_trades._sticky_unlock.get(symbol_of_anchor, False)
-                if (unreal_pts >= GATE_UNLOCK_PTS) and not handoff_active:
-                    if not sticky:
+                    # ---- sticky unlock + follower gating (anchor always unlocked)
+                    was_sticky = monitor_trades._sticky_unlock.get(symbol_of_anchor, False)
+                    sticky, gate_updates = strategy_core.apply_anchor_gate(
+                        active_trades, anchor, unreal_pts, GATE_UNLOCK_PTS, was_sticky, handoff_active
+                    )
+                    if sticky and not was_sticky:
                         print(f"[{symbol}] [GATE] Sticky UNLOCK set (+{unreal_pts:.2f}≥{GATE_UNLOCK_PTS})")
-                    sticky = True
-                    monitor_trades._sticky_unlock[symbol_of_anchor] = True
-
-                # ---- apply gating to followers (anchor always unlocked)
-                gate_updates = []
-                for t in active_trades:
-                    if t is anchor:
-                        if t.get("gate_state") != "UNLOCKED":
-                            t["gate_state"] = "UNLOCKED"
-                            gate_updates.append((t.get("order_id"), {"gate_state": "UNLOCKED"}))
-                        t["anchor_order_id"] = anchor_id
-                        continue
-
-                    was = t.get("gate_state", "PARKED")
-                    t["anchor_order_id"] = anchor_id
-
-                    if sticky and not handoff_active:
-                        # followers may arm TP/trailing
-                        t["gate_state"] = "UNLOCKED"
-                        t.pop("skip_tp_trailing", None)
-                        if was != "UNLOCKED":
-                            gate_updates.append((t.get("order_id"), {"gate_state": "UNLOCKED"}))
-                    else:
-                        # parked until sticky unlock
-                        t["gate_state"] = "PARKED"
-                        t["skip_tp_trailing"] = True
-                        if was != "PARKED" or "gate_state" not in t:
-                            gate_updates.append((t.get("order_id"), {"gate_state": "PARKED"}))
+                    monitor_trades._sticky_unlock[symbol_of_anchor] = sticky
 
                 # ---- best-effort write of gate states (symbol-scoped)
                 try:
@@ -1025,17 +979,18 @@ def monitor_trades():
                     print(f"[{symbol}] ⚠️ Gate state update skipped: {e}")
 
                 # ---- filter for trailing/TP processing (parked followers are skipped)
-                gated_trades = [t for t in active_trades if not (t.get("gate_state") == "PARKED" and t.get("skip_tp_trailing"))]
+                gated_trades = strategy_core.gated(active_trades)
                 print(f"[{symbol}] [DEBUG] Processing {len(gated_trades)} trades post AnchorGate")
 
-                if TRAILING_ENABLED:
+                if TRAILING_ENABLED and not gate_frozen:
                     try:
                         active_trades = process_trailing_tp_and_exits(gated_trades, prices, trigger_points, offset_points)
                     except Exception as e:
                         print(f"[{symbol}] ❌ process_trailing_tp_and_exits error: {e}")
-                else:
+                elif not TRAILING_ENABLED:
                     print(f"[{symbol}] [TRAIL] disabled — skipping trailing/ATR exits (AnchorGate)")
         # =========================  END EXIT PROCESSING  =========================
+        sw.lap("exit_processing")
 
         # Track anchors closed in this loop so they cannot be written back
         closed_anchor_ids = set()
@@ -1046,45 +1001,41 @@ def monitor_trades():
             open_ref    = firebase_db.reference(f"/open_active_trades/{symbol}")
             tickets     = tickets_ref.get() or {}
 
-            # Oldest first by fill_time/transaction_time
+            # Oldest first by fill time (ExitTicket folds the legacy transaction_time in)
             if isinstance(tickets, dict):
                 items = sorted(
-                    tickets.items(),
-                    key=lambda kv: parse_any_ts_to_utc((kv[1] or {}).get("fill_time") or (kv[1] or {}).get("transaction_time") or "")
+                    ((tx_id, ExitTicket.from_firebase(tx_id, tx)) for tx_id, tx in tickets.items() if isinstance(tx, dict)),
+                    key=lambda kv: parse_any_ts_to_utc(kv[1].fill_time or "")
                 )
             else:
                 items = []
+            pending_exits += sum(1 for _, tx in items if not tx.done)
 
             for tx_id, tx in items:
-                # --- type check
-                if not isinstance(tx, dict):
-                    print(f"[{symbol}] [DRAIN] Skip {tx_id}: not a dict")
-                    continue
-
                 # --- idempotency check (either flag means already handled)
-                if bool(tx.get("_processed")) or bool(tx.get("_handled")):
+                if tx.done:
                     if DRAIN_VERBOSE:
                         print(f"[{symbol}] [DRAIN] Skip {tx_id}: already processed (_processed/_handled set)")
                     continue
 
                 # --- ensure symbol (legacy/manual tickets may lack it)
-                if not tx.get("symbol"):
-                    tx["symbol"] = symbol
+                if not tx.symbol:
+                    tx.symbol = symbol
                     tickets_ref.child(tx_id).update({"symbol": symbol})
                     print(f"[{symbol}] [PATCH] Added symbol to stale exit ticket {tx_id}")
 
                 # --- ensure source on manual desktop tickets (so Sheets shows it)
-                if not tx.get("source") and tx.get("trade_type") == "MANUAL_EXIT":
-                    tx["source"] = "desktop-mac"  # safe default
+                if not tx.source and tx.trade_type == "MANUAL_EXIT":
+                    tx.source = "desktop-mac"  # safe default
 
                 # --- trace: missing time fields (just a warning; handler will still decide)
-                if not (tx.get("transaction_time") or tx.get("fill_time")):
+                if not tx.fill_time:
                     print(f"[{symbol}] [DRAIN] Warn {tx_id}: missing time (transaction_time/fill_time)")
 
                 # === Option A: pre-filter stale/orphan exits so they can't close new trades ===
                 try:
                     # Parse ticket time and compute age vs now
-                    exit_dt = (tx.get("fill_time") or tx.get("transaction_time") or "")
+                    exit_dt = tx.fill_time or ""
                     exit_utc = parse_any_ts_to_utc(exit_dt)
                     now_utc  = datetime.now(timezone.utc)
                     age_s    = int((now_utc - exit_utc).total_seconds())
@@ -1092,14 +1043,11 @@ def monitor_trades():
                     STALE_TICKET_WINDOW_S = 120  # 2 minutes
 
                     # Snapshot current opens and earliest open entry (FIFO head)
-                    opens = open_ref.get() or {}
+                    opens = legs_from_node(open_ref.get())
                     fifo_head_dt = None
-                    if isinstance(opens, dict) and opens:
+                    if opens:
                         try:
-                            fifo_head_dt = min(
-                                parse_any_ts_to_utc((tr or {}).get("entry_timestamp") or (tr or {}).get("transaction_time") or "")
-                                for tr in opens.values()
-                            )
+                            fifo_head_dt = min(parse_any_ts_to_utc(leg.entry_timestamp or "") for leg in opens.values())
                         except Exception:
                             fifo_head_dt = None
 
@@ -1115,14 +1063,21 @@ def monitor_trades():
 
                     if stale_vs_no_opens or stale_vs_fifo_head:
                         # Mark handled/processed and mirror to ghost bucket with context
-                        tickets_ref.child(tx_id).update({"_handled": True, "_processed": True})
-                        firebase_db.reference(f"/ghost_trades_log/{symbol}/{tx_id}").set({
+                        ghost = stamped({
                             "reason": "stale_exit_ticket_pre_filter",
                             "exit_time": exit_utc.isoformat(),
                             "earliest_entry": fifo_head_dt.isoformat() if fifo_head_dt else None,
                             "age_s": age_s,
-                            "payload": tx
+                            "payload": tx.to_firebase()
                         })
+                        ghosted = ledger.record(firebase_db, "ghosted", symbol, tx_id, extra_updates={
+                            f"exit_orders_log/{symbol}/{tx_id}/_handled": True,
+                            f"exit_orders_log/{symbol}/{tx_id}/_processed": True,
+                            f"ghost_trades_log/{symbol}/{tx_id}": ghost,
+                        }, reason="stale_exit_ticket_pre_filter")
+                        if not ghosted:  # ledger write failed → legacy two-step quarantine
+                            tickets_ref.child(tx_id).update({"_handled": True, "_processed": True})
+                            firebase_db.reference(f"/ghost_trades_log/{symbol}/{tx_id}").set(ghost)
                         print(f"[{symbol}] [PRE] Quarantined stale exit {tx_id} (age={age_s}s, "
                               f"fifo_head={fifo_head_dt.isoformat() if fifo_head_dt else 'N/A'})")
                         continue  # skip this ticket; do NOT pass to handler
@@ -1130,24 +1085,43 @@ def monitor_trades():
                     print(f"[{symbol}] [PRE] Quarantine check skipped for {tx_id}: {e}")
                 # === end Option A pre-filter ===
 
-                ok = handle_exit_fill_from_tx(firebase_db, tx)
+                # another monitor may be draining the same ticket: claim it first
+                lease = claims.acquire(firebase_db, f"/exit_orders_log/{symbol}/{tx_id}/_claim",
+                                       lease_s=DRAIN_CLAIM_LEASE_S)
+                if lease is None:
+                    print(f"[{symbol}] [DRAIN] Skip {tx_id}: claimed by another worker")
+                    continue
 
-                # If we got an anchor_id back, hide it locally immediately to prevent double-FIFO in this loop
-                if isinstance(ok, str):
-                    try:
-                        open_ref.child(ok).delete()
-                        closed_anchor_ids.add(ok)
-                        print(f"[{symbol}] [LOCAL] Removed {ok} from open_active_trades (same-loop protection)")
-                    except Exception as e:
-                        print(f"[{symbol}] [LOCAL] Could not delete {ok} locally: {e}")
+                ok = handle_exit_fill_from_tx(firebase_db, tx)
+                if ok is None:
+                    # FIFO commit failed: nothing persisted — free the claim and leave the ticket for a retry
+                    lease.release()
+                    print(f"[{symbol}] ⚠️ Exit ticket {tx_id} not committed; released for retry next cycle")
+                    break
+
+                # The FIFO commit already archived every fully matched leg and decremented a partially matched
+                # one; mirror that into this loop's snapshot so the save below cannot resurrect or re-grow them
+                if isinstance(ok, dict):
+                    for t in active_trades:
+                        remaining = ok.get(t.get("order_id"))
+                        if remaining is None:
+                            continue
+                        if int(remaining) <= 0:
+                            closed_anchor_ids.add(t.get("order_id"))
+                        else:
+                            t["contracts_remaining"] = int(remaining)
+                    print(f"[{symbol}] [LOCAL] Exit {tx_id} matched {ok}; snapshot updated (same-loop protection)")
 
                 # Mark processed either way (matches prior behavior)
                 tickets_ref.child(tx_id).update({"_processed": True})
+                lease.done()
                 print(f"[{symbol}] [INFO] Exit ticket {tx_id} processed and marked _processed")
+                pending_exits -= 1
 
                 break  # process only ONE ticket per loop (per symbol)
         except Exception as e:
             print(f"[{symbol}] ❌ Exit ticket drain error: {e}")
+        sw.lap("exit_drain")
 
         # 3B: Remove any trades from Firebase that were closed by exit tickets
         open_trades_ref = firebase_db.reference(f"/open_active_trades/{symbol}")
@@ -1172,17 +1146,30 @@ def monitor_trades():
             and not t.get('exited')
             and t.get('status') not in ('closed', 'failed')
         ]
-        save_open_trades(symbol, active_trades)
+        save_open_trades(symbol, active_trades, baseline=loaded_legs, finished=finished_legs)
         print(f"[{symbol}] [DEBUG] Saved {len(active_trades)} active trades after processing")
+        sw.lap("persist")
+        open_legs += len(active_trades)
 
+    sw.done()
+    return bool(open_legs or pending_exits)
     ##========END OF MAIN MONITOR TRADES LOOP FUNCTION========##
 
 if __name__ == '__main__':
-    while True:
-        try:
-            monitor_trades()
-        except Exception as e:
-            print(f"❌ ERROR in monitor_trades(): {e}")
-        time.sleep(10)
+    import profiler
+    import scheduler
+    import trade_journal
+    prof = profiler.LoopProfiler("monitor_trades", firebase_db)
+    prof.install_signal_handler()
+    trade_journal.recover(firebase_db)  # finish exits a previous crash left between Tiger and Firebase
+
+    def _monitor_cycle():
+        with prof.iteration():
+            return monitor_trades()
+
+    scheduler.run_forever([
+        scheduler.Task("monitor_trades", _monitor_cycle,
+                       active_s=MONITOR_ACTIVE_S, idle_s=MONITOR_IDLE_S, closed_s=MONITOR_CLOSED_S),
+    ], title="monitor_trades")
 
 # =========================  END OF SCRIPT ================================
\ No newline at end of file
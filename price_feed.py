@@ -0,0 +1,205 @@
+#=========================  PRICE_FEED - LOCAL REPLICA OF /live_prices WITH STALENESS  ================================
+# monitor_trades used to download the whole /live_prices node every loop and trust whatever it found. A
+# PriceFeed keeps a per-process replica instead and hands out normalized quotes:
+#
+#   Quote(symbol, price, ema9, ema20, ema50, atr, vwap, updated_at)   (legacy scalar nodes → price only)
+#   quote.age_s()  seconds since app.py published it (None when the node has no updated_at)
+#   quote.stale    age unknown or > PRICE_STALE_S → trailing / AnchorGate must not act on it
+#
+# Sync modes (PRICE_FEED_MODE):
+#   stream  (default) firebase_admin listen() on /live_prices; put/patch events are applied to the replica as
+#           they arrive, so a loop reads memory only. Falls back to poll when listen() is unavailable
+#           (local datastore backends) or the stream dies.
+#   poll    coalesced polling: at most one fetch per PRICE_POLL_MIN_S however many callers/shards ask, and
+#           only symbols whose updated_at moved since the last fetch (order_by_child("updated_at"); needs
+#           ".indexOn": ["updated_at"] on /live_prices, else a full read). Full resync every RESYNC_S.
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import metrics
+from trade_model import parse_utc
+
+ROOT = "live_prices"
+FIELDS = ("ema9", "ema20", "ema50", "atr", "vwap")
+PRICE_FEED_MODE = os.getenv("PRICE_FEED_MODE", "stream").strip().lower()
+PRICE_STALE_S = float(os.getenv("PRICE_STALE_S", "60"))
+PRICE_POLL_MIN_S = float(os.getenv("PRICE_POLL_MIN_S", "1.0"))
+RESYNC_S = 300.0
+
+def _float(v):
+    try:
+        return float(v) if v is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class Quote:
+    __slots__ = ("symbol", "price", "ema9", "ema20", "ema50", "atr", "vwap", "updated_at")
+
+    def __init__(self, symbol, price=None, updated_at=None, **fields):
+        self.symbol = symbol
+        self.price = _float(price)
+        self.updated_at = updated_at
+        for f in FIELDS:
+            setattr(self, f, _float(fields.get(f)))
+
+    @classmethod
+    def from_node(cls, symbol, node):
+        """A /live_prices/{symbol} value: {price, updated_at, ema*, atr, vwap} or a bare number."""
+        if isinstance(node, dict):
+            return cls(symbol, node.get("price"), parse_utc(node.get("updated_at")),
+                       **{f: node.get(f) for f in FIELDS})
+        return cls(symbol, node)
+
+    def age_s(self, now_utc=None):
+        if self.updated_at is None:
+            return None
+        return max(0.0, ((now_utc or datetime.now(timezone.utc)) - self.updated_at).total_seconds())
+
+    def is_stale(self, max_age_s=None, now_utc=None):
+        age = self.age_s(now_utc)
+        return self.price is None or age is None or age > (PRICE_STALE_S if max_age_s is None else max_age_s)
+
+    @property
+    def stale(self):
+        return self.is_stale()
+
+    def __repr__(self):
+        age = self.age_s()
+        return f"Quote({self.symbol} {self.price} age={'?' if age is None else f'{age:.0f}s'})"
+
+class PriceFeed:
+    """Per-process replica of /live_prices. Thread-safe; use feed_for(firebase_db)."""
+
+    def __init__(self, firebase_db, mode=PRICE_FEED_MODE):
+        self.firebase_db = firebase_db
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._raw = {}               # symbol → raw node (what the stream/poll delivered)
+        self._quotes = {}            # symbol → Quote
+        self._cursor = None          # newest updated_at seen (poll deltas)
+        self._synced_at = 0.0        # monotonic time of the last fetch / stream event
+        self._full_at = 0.0          # monotonic time of the last full read
+        self._listener = None
+        self._indexed = True
+
+    # ---------- replica maintenance ----------
+    def _put(self, symbol, node):
+        if node is None:
+            self._raw.pop(symbol, None)
+            self._quotes.pop(symbol, None)
+            return
+        self._raw[symbol] = node
+        q = self._quotes[symbol] = Quote.from_node(symbol, node)
+        if q.updated_at is not None:
+            stamp = node.get("updated_at")
+            if self._cursor is None or str(stamp) > self._cursor:
+                self._cursor = str(stamp)
+
+    def _apply_event(self, event):
+        """Stream event → replica. Paths are relative to /live_prices ('/', '/SYM', '/SYM/field')."""
+        parts = [p for p in (event.path or "/").split("/") if p]
+        metrics.inc("price_feed_events", kind=event.event_type)
+        with self._lock:
+            self._synced_at = time.monotonic()
+            if not parts:
+                if event.event_type == "put":
+                    self._raw, self._quotes = {}, {}
+                for sym, node in (event.data or {}).items():
+                    self._put(sym, node)
+                return
+            sym = parts[0]
+            if len(parts) == 1:
+                if event.event_type == "patch" and isinstance(self._raw.get(sym), dict) and isinstance(event.data, dict):
+                    self._put(sym, {**self._raw[sym], **event.data})
+                else:
+                    self._put(sym, event.data)
+                return
+            node = dict(self._raw.get(sym) or {}) if isinstance(self._raw.get(sym), dict) else {}
+            node[parts[1]] = event.data
+            self._put(sym, node)
+
+    def _start_stream(self):
+        try:
+            self._listener = self.firebase_db.reference(ROOT).listen(self._apply_event)
+            print("[PRICES] streaming /live_prices")
+            return True
+        except Exception as e:
+            print(f"⚠️ [PRICES] stream unavailable; polling instead: {e}")
+            self.mode = "poll"
+            return False
+
+    def _poll(self):
+        now = time.monotonic()
+        full = (not self._indexed or self._cursor is None or now - self._full_at >= RESYNC_S)
+        nodes = None
+        if not full:
+            try:
+                nodes = (self.firebase_db.reference(ROOT).order_by_child("updated_at")
+                         .start_at(self._cursor).get()) or {}
+                metrics.inc("price_feed_polls", kind="delta")
+            except Exception as e:
+                if "index" not in str(e).lower():
+                    raise
+                print("⚠️ [PRICES] /live_prices has no .indexOn updated_at; full reads from now on")
+                self._indexed = False
+        if nodes is None:
+            nodes = self.firebase_db.reference(ROOT).get() or {}
+            metrics.inc("price_feed_polls", kind="full")
+            self._full_at = now
+            self._raw, self._quotes = {}, {}
+        for sym, node in (nodes.items() if isinstance(nodes, dict) else ()):
+            self._put(str(sym), node)
+        self._synced_at = now
+
+    def refresh(self):
+        """Bring the replica up to date (stream: only when it has never synced or went quiet)."""
+        with self._lock:
+            if self.mode == "stream" and self._listener is None:
+                self._start_stream()
+            if self.mode == "stream":
+                if self._synced_at and time.monotonic() - self._synced_at < RESYNC_S:
+                    return
+                if self._synced_at:
+                    print("⚠️ [PRICES] stream quiet for too long; resyncing by poll")
+                self._full_at = 0.0
+            elif time.monotonic() - self._synced_at < PRICE_POLL_MIN_S:
+                metrics.inc("price_feed_polls", kind="coalesced")
+                return
+            try:
+                self._poll()
+            except Exception as e:
+                print(f"⚠️ [PRICES] refresh failed; serving the replica as is: {e}")
+
+    # ---------- reads ----------
+    def quotes(self):
+        """{symbol: Quote} after a refresh — the per-loop snapshot."""
+        self.refresh()
+        with self._lock:
+            return dict(self._quotes)
+
+    def quote(self, symbol):
+        self.refresh()
+        with self._lock:
+            return self._quotes.get(symbol) or Quote(symbol)
+
+    def close(self):
+        if self._listener is not None:
+            try:
+                self._listener.close()
+            except Exception:
+                pass
+            self._listener = None
+
+_feeds = {}
+_feeds_lock = threading.Lock()
+
+def feed_for(firebase_db):
+    with _feeds_lock:
+        feed = _feeds.get(id(firebase_db))
+        if feed is None:
+            feed = _feeds[id(firebase_db)] = PriceFeed(firebase_db)
+        return feed
+
+#=========================  PRICE_FEED (END OF SCRIPT)  ================================
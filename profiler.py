@@ -0,0 +1,204 @@
+#=========================  PROFILER - RUNTIME-TOGGLED SAMPLING PROFILER FOR LOOP PROCESSES  ================================
+# Diagnose a slow production loop without redeploying:
+#
+#   Firebase:  /runtime/profile/<loop name> = 5      → profile the next 5 iterations (true = PROFILE_ITERATIONS)
+#   Signal:    kill -USR1 <pid>                      → same, PROFILE_ITERATIONS iterations
+#
+# While on, a daemon thread samples the loop thread's stack every PROFILE_INTERVAL_S and, after the
+# last iteration, writes to PROFILE_DIR:
+#   <name>-<utc>.collapsed   one 'frame;frame;frame count' line per stack (flamegraph.pl / speedscope)
+#   <name>-<utc>.txt         per-function self/cumulative time + per-iteration wall times
+#
+# Off = one monotonic() compare per iteration; the Firebase flag is polled at most every PROFILE_POLL_S.
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_ITERATIONS = int(os.getenv("PROFILE_ITERATIONS", "5"))
+PROFILE_INTERVAL_S = float(os.getenv("PROFILE_INTERVAL_S", "0.005"))
+PROFILE_POLL_S = float(os.getenv("PROFILE_POLL_S", "30"))
+PROFILE_FLAG_PATH = "/runtime/profile"
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+class _Sampler(threading.Thread):
+    """Samples one thread's stack via sys._current_frames() until stopped."""
+
+    def __init__(self, target_ident, interval_s):
+        super().__init__(name="profiler-sampler", daemon=True)
+        self.target_ident = target_ident
+        self.interval_s = interval_s
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_evt = threading.Event()
+
+    def run(self):
+        while not self._stop_evt.wait(self.interval_s):
+            frame = sys._current_frames().get(self.target_ident)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_evt.set()
+        self.join(timeout=1.0)
+
+class LoopProfiler:
+    """
+    One per loop process. Wrap each iteration:
+
+        prof = profiler.LoopProfiler("monitor_trades", firebase_db)
+        prof.install_signal_handler()
+        while True:
+            with prof.iteration():
+                monitor_trades()
+            time.sleep(10)
+    """
+
+    def __init__(self, name, firebase_db=None, out_dir=None):
+        self.name = name
+        self.firebase_db = firebase_db
+        self.out_dir = out_dir or PROFILE_DIR
+        self._requested = 0          # iterations requested (signal or flag), consumed on next iteration
+        self._remaining = 0
+        self._sampler = None
+        self._iter_times = []
+        self._started_at = None
+        self._next_poll = 0.0
+
+    # ---------- triggers ----------
+    def request(self, iterations=None):
+        """Arm the profiler for the next `iterations` loop iterations (safe from a signal handler)."""
+        self._requested = max(1, int(iterations or PROFILE_ITERATIONS))
+
+    def install_signal_handler(self, signum=None):
+        """SIGUSR1 → request(); no-op where the signal does not exist (e.g. Windows) or off the main thread."""
+        signum = signum if signum is not None else getattr(signal, "SIGUSR1", None)
+        if signum is None:
+            return False
+        try:
+            signal.signal(signum, lambda *_: self.request())
+            return True
+        except ValueError:
+            return False
+
+    def _poll_flag(self):
+        now = time.monotonic()
+        if self.firebase_db is None or now < self._next_poll:
+            return
+        self._next_poll = now + PROFILE_POLL_S
+        try:
+            ref = self.firebase_db.reference(f"{PROFILE_FLAG_PATH}/{self.name}")
+            flag = ref.get()
+            if not flag:
+                return
+            iterations = PROFILE_ITERATIONS if flag is True else int(flag)
+            ref.delete()  # consume: one flag = one profile
+            self.request(iterations)
+            print(f"[PROFILE] {self.name}: flag set → profiling {iterations} iterations")
+        except Exception as e:
+            print(f"⚠️ [PROFILE] flag poll failed softly: {e}")
+
+    # ---------- iteration hook ----------
+    def iteration(self):
+        return _Iteration(self)
+
+    def _begin(self):
+        self._poll_flag()
+        if self._requested and not self._sampler:
+            self._remaining = self._requested
+            self._requested = 0
+            self._iter_times = []
+            self._started_at = datetime.now(timezone.utc)
+            self._sampler = _Sampler(threading.get_ident(), PROFILE_INTERVAL_S)
+            self._sampler.start()
+        return time.perf_counter() if self._sampler else None
+
+    def _end(self, t0):
+        if not self._sampler or t0 is None:
+            return
+        self._iter_times.append(time.perf_counter() - t0)
+        self._remaining -= 1
+        if self._remaining <= 0:
+            sampler, self._sampler = self._sampler, None
+            sampler.stop()
+            try:
+                paths = self._write(sampler)
+                print(f"[PROFILE] {self.name}: {sampler.samples} samples over {len(self._iter_times)} iterations → {paths[0]}")
+                self._report(paths)
+            except Exception as e:
+                print(f"⚠️ [PROFILE] write failed: {e}")
+
+    # ---------- output ----------
+    def _write(self, sampler):
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = self._started_at.strftime("%Y%m%dT%H%M%S") + f"{self._started_at.microsecond // 1000:03d}Z"
+        base = os.path.join(self.out_dir, f"{self.name}-{stamp}")
+
+        with open(base + ".collapsed", "w") as f:
+            for stack, n in sampler.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+        self_counts, cum_counts = Counter(), Counter()
+        for stack, n in sampler.stacks.items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] += n
+            for fr in set(frames):  # count recursion once per sample
+                cum_counts[fr] += n
+
+        total = max(1, sampler.samples)
+        wall = sum(self._iter_times)
+        per_sample = wall / total  # effective interval (sleep granularity + GIL make it > PROFILE_INTERVAL_S)
+        with open(base + ".txt", "w") as f:
+            f.write(f"# {self.name} profile started {self._started_at.isoformat()}\n")
+            f.write(f"# iterations={len(self._iter_times)} wall={wall:.3f}s samples={sampler.samples} "
+                    f"interval≈{per_sample * 1000:.1f}ms\n")
+            f.write("# per-iteration wall (s): " + ", ".join(f"{t:.3f}" for t in self._iter_times) + "\n\n")
+            f.write(f"{'cum_s':>9} {'cum%':>6} {'self_s':>9} {'self%':>6}  function\n")
+            for fr, n in cum_counts.most_common():
+                s = self_counts.get(fr, 0)
+                f.write(f"{n * per_sample:9.3f} {100.0 * n / total:6.1f} "
+                        f"{s * per_sample:9.3f} {100.0 * s / total:6.1f}  {fr}\n")
+        return base + ".collapsed", base + ".txt"
+
+    def _report(self, paths):
+        """Leave a breadcrumb in Firebase so whoever set the flag knows where the files are."""
+        if self.firebase_db is None:
+            return
+        try:
+            self.firebase_db.reference(f"/runtime/profile_last/{self.name}").set({
+                "started_utc": self._started_at.isoformat(),
+                "iterations": len(self._iter_times),
+                "collapsed": paths[0],
+                "summary": paths[1],
+            })
+        except Exception as e:
+            print(f"⚠️ [PROFILE] breadcrumb write failed softly: {e}")
+
+class _Iteration:
+    __slots__ = ("prof", "t0")
+
+    def __init__(self, prof):
+        self.prof = prof
+
+    def __enter__(self):
+        self.t0 = self.prof._begin()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.prof._end(self.t0)
+        return False
+
+#=========================  PROFILER (END OF SCRIPT)  ================================
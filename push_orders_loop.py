@@ -1,8 +1,23 @@
-import time
+import profiler
+import scheduler
+from firebase_client import firebase_db
 from push_orders_to_firebase import push_orders_main  # Make sure this matches your file structure
 
-while True:
+# Fixed-rate schedule (was: run, then sleep 30s). Tight while legs/working orders exist, relaxed when flat.
+LOOP_ACTIVE_S = 15
+LOOP_IDLE_S = 30
+LOOP_CLOSED_S = 120
+
+prof = profiler.LoopProfiler("push_orders_loop", firebase_db)
+prof.install_signal_handler()
+
+def _cycle():
     print("🔄 Running push_orders_main()...")
-    push_orders_main()
+    with prof.iteration():
+        active = push_orders_main()
     print("🔁 Worker Happy: Still Running...")
-    time.sleep(30)
\ No newline at end of file
+    return active
+
+scheduler.run_forever([
+    scheduler.Task("push_orders_loop", _cycle, active_s=LOOP_ACTIVE_S, idle_s=LOOP_IDLE_S, closed_s=LOOP_CLOSED_S),
+], title="push_orders_loop")
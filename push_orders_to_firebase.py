@@ -1,48 +1,24 @@
 #=========================  PUSH_ORDERS_TO_FIREBASE - PART 1  ================================
-from tigeropen.tiger_open_config import TigerOpenClientConfig
-from tigeropen.trade.trade_client import TradeClient
-from tigeropen.common.consts import SegmentType, OrderStatus  # ✅ correct on Render!
-import random
-import string
-from datetime import datetime, timedelta, timezone as dt_timezone
-from pytz import timezone
-import requests
-import json
+from datetime import datetime
 import firebase_active_contract
-import firebase_admin
-from firebase_admin import credentials, initialize_app, db
-import os
 import time
-from typing import Optional
 import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+import ledger
+import fill_stream
+from trade_model import ExitTicket, TradeLeg, stamped
+from firebase_client import firebase_db  # lazy: Admin SDK initializes on the first DB call
+from tiger_client import ACCOUNT, get_client, fut_segment  # lazy: TradeClient builds on first get_orders
 
 grace_cache = {}
 _logged_order_ids = set()
 
-#================================
-# 🟩 FIREBASE INITIALIZATION======
-#================================
-
-# === Firebase Key ===
-firebase_key_path = "/etc/secrets/firebase_key.json" if os.path.exists("/etc/secrets/firebase_key.json") else "firebase_key.json"
-cred = credentials.Certificate(firebase_key_path)
-
-# === Firebase Initialization ===
-if not firebase_admin._apps:
-    firebase_key_path = "/etc/secrets/firebase_key.json" if os.path.exists("/etc/secrets/firebase_key.json") else "firebase_key.json"
-    cred = credentials.Certificate(firebase_key_path)
-    initialize_app(cred, {
-        'databaseURL': "https://tw2tt-firebase-default-rtdb.asia-southeast1.firebasedatabase.app"
-    })
-
-firebase_db = db
-
-
-#================================
-# 🟩 TIGER API SET UP ============
-#================================
-config = TigerOpenClientConfig()
-client = TradeClient(config)
+# Scheduler intervals (seconds): open legs / working orders → active; flat → idle; Globex closed → closed
+PUSH_ORDERS_ACTIVE_S = 10
+PUSH_ORDERS_IDLE_S = 20
+PUSH_ORDERS_CLOSED_S = 60
+WORKING_ORDER_STATUSES = {"NEW", "HELD", "PENDING_NEW", "PARTIALLY_FILLED", "PENDING_CANCEL"}
 
 #################### ALL HELPERS FOR THIS SCRIPT ####################
 
@@ -107,32 +83,12 @@ def get_exit_reason(status, reason, filled, is_open=False):
         return "FILLED"
     return status
 
-# ==================================================
-# 🟩 Helper: read IDs from flat or {symbol}/... logs
-# ==================================================
-def _log_ids_for(dbh, path, symbol):
-    try:
-        node = dbh.reference(path).get() or {}
-    except Exception:
-        return set()
-    ids = set()
-    if isinstance(node, dict):
-        # symbol-scoped
-        sym_child = node.get(symbol)
-        if isinstance(sym_child, dict):
-            ids |= set(map(str, sym_child.keys()))
-        # flat layout (ids at top-level)
-        for k in node.keys():
-            if str(k).isdigit():
-                ids.add(str(k))
-    return ids
-
 # ====================================================
 # 🟩 Helper: Load_trailing_tp_settings() From Firebase
 # ====================================================
 def load_trailing_tp_settings():
     try:
-        ref = db.reference('/trailing_tp_settings')
+        ref = firebase_db.reference('/trailing_tp_settings')
         cfg = ref.get() or {}
 
         if cfg.get("enabled", False):
@@ -142,75 +98,371 @@ def load_trailing_tp_settings():
     return 14.0, 5.0
 
 
-#===============================================
-# 🟩 Helper: Check if Trade ID is a Known Zombie
-#===============================================
+# =====================================================================
+# 🟩 Helper: Per-cycle Firebase I/O (parallel reads, one multi-path commit)
+# =====================================================================
+PUSH_IO_WORKERS = 8   # bounded fan-out for the per-cycle Firebase reads
+LOG_ROOTS = ("/exit_orders_log", "/zombie_trades_log", "/archived_trades_log", "/ghost_trades_log")
 
-def is_zombie_trade(order_id, firebase_db, symbol=None):
-    if not order_id:
-        return False
-    # symbol-scoped
-    if symbol and firebase_db.reference(f"/zombie_trades_log/{symbol}/{order_id}").get():
+def _shallow_keys(dbh, path):
+    """Return the child keys under `path` using a shallow read (no payloads downloaded)."""
+    try:
+        node = dbh.reference(path).get(shallow=True) or {}
+    except Exception as e:
+        print(f"⚠️ Shallow read failed for {path}: {e}")
+        return set()
+    return set(map(str, node.keys())) if isinstance(node, dict) else set()
+
+def _read_node(dbh, path):
+    try:
+        return dbh.reference(path).get() or {}
+    except Exception as e:
+        print(f"⚠️ Read failed for {path}: {e}")
+        return {}
+
+def _parallel_reads(jobs):
+    """
+    Run independent read callables on a bounded thread pool.
+    jobs: {key: callable} → {key: result}. Callables must swallow their own errors.
+    """
+    if not jobs:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(PUSH_IO_WORKERS, len(jobs))) as pool:
+        futures = {key: pool.submit(fn) for key, fn in jobs.items()}
+        return {key: fut.result() for key, fut in futures.items()}
+
+def _commit_updates(dbh, updates):
+    """Apply every write of this cycle as ONE multi-path update at the root."""
+    if not updates:
         return True
-    # flat
-    return bool(firebase_db.reference(f"/zombie_trades_log/{order_id}").get())
+    try:
+        dbh.reference("/").update(updates)
+        print(f"💾 Committed {len(updates)} path(s) in one multi-path update")
+        return True
+    except Exception as e:
+        print(f"❌ Multi-path commit failed ({len(updates)} paths): {e}")
+        return False
 
-#======================================================
-# 🟩 Helper: Check if Trade ID is a Known Archived Trade
-#======================================================
+def _queue_update(cycle, base_path, fields):
+    """Queue a Firebase `update()` on base_path as per-field multi-path entries."""
+    for key, value in fields.items():
+        cycle["updates"][f"{base_path}/{key}"] = value
 
-def is_archived_trade(order_id, firebase_db, symbol=None):
-    if not order_id:
+def _order_symbol(order):
+    """Prefer explicit symbol; otherwise parse from 'contract' like 'MGC2510/FUT/USD/None'."""
+    contract_str = str(getattr(order, "contract", "") or "")
+    sym_from_contract = contract_str.split("/", 1)[0] if contract_str else ""
+    return ((getattr(order, "symbol", "") or "") or sym_from_contract).strip()
+
+def _in_log(cycle, log_root, order_id, order_symbol):
+    """Symbol-scoped OR flat-layout membership, answered from the prefetched key sets."""
+    return (order_id in cycle["log_keys"].get((log_root, order_symbol), set())
+            or order_id in cycle["log_keys"].get((log_root, ""), set()))
+
+def _prefetch_cycle(dbh, active_symbol, order_symbols, trail=None):
+    """
+    One parallel round of reads for the whole cycle:
+      - shallow key sets of every log (flat root + each order symbol)
+      - /open_active_trades/{symbol} for every symbol we may touch
+      - shallow /open_active_trades (heartbeat check) + trailing TP settings (unless `trail` was already read)
+    """
+    symbols = {s for s in set(order_symbols) | {active_symbol} if s}
+    jobs = {}
+    for root in LOG_ROOTS:
+        jobs[("log", root, "")] = (lambda p=root: _shallow_keys(dbh, p))
+        for sym in symbols:
+            jobs[("log", root, sym)] = (lambda p=f"{root}/{sym}": _shallow_keys(dbh, p))
+    for sym in symbols:
+        jobs[("open", sym)] = (lambda p=f"/open_active_trades/{sym}": _read_node(dbh, p))
+    jobs[("open_root",)] = lambda: _shallow_keys(dbh, "/open_active_trades")
+    if trail is None:
+        jobs[("trail",)] = load_trailing_tp_settings
+
+    results = _parallel_reads(jobs)
+    return {
+        "log_keys": {(k[1], k[2]): v for k, v in results.items() if k[0] == "log"},
+        "open_by_symbol": {k[1]: v for k, v in results.items() if k[0] == "open"},
+        "open_root_keys": results[("open_root",)],
+        "trail": trail if trail is not None else results[("trail",)],
+    }
+
+# ==================================================
+# 🟩 Per-order classification stages
+#   Each stage returns True when it consumed the order (skip or queued writes).
+# ==================================================
+
+def _stage_exit_fence(order, oid, osym, cycle):
+    # 🔐 EARLY EXIT-TICKET FENCE — block exit fills from being processed as opens
+    if _in_log(cycle, "/exit_orders_log", oid, osym):
+        print(f"⏭️ Skipping EXIT ticket {oid} (early fence)")
+        return True
+    return False
+
+def _stage_liquidation(order, oid, osym, cycle):
+    # ✅ Route Tiger liquidations as exit tickets (do NOT touch open_active_trades here)
+    if getattr(order, "liquidation", False) is not True:
         return False
-    if symbol and firebase_db.reference(f"/archived_trades_log/{symbol}/{order_id}").get():
+    liq_px = (getattr(order, "avg_fill_price", None)
+              or getattr(order, "filled_price", None)
+              or getattr(order, "latest_price", None)
+              or 0.0)
+    liq_ts = (getattr(order, "update_time", None)
+              or getattr(order, "trade_time", None)
+              or getattr(order, "order_time", None))
+    cycle["updates"][f"exit_orders_log/{osym}/{oid}"] = ExitTicket(
+        order_id=oid,
+        symbol=osym,
+        action=getattr(order, "action", "") or "",
+        filled_price=liq_px,
+        filled_qty=getattr(order, "quantity", 1) or 1,
+        fill_time=_safe_iso(liq_ts),
+        status="LIQUIDATION",
+        trade_type="LIQUIDATION",
+    ).to_firebase()
+    print(f"[LIQ] Queued liquidation as exit ticket {oid} for {osym} at {liq_px}")
+    return True
+
+MANUAL_SOURCES = {"desktop-mac", "desktop", "ios", "iphone", "ipad", "android", "tiger-mobile", "mobile"}
+MANUAL_MAX_AGE_S = 180.0  # <= 3 minutes
+
+def _stage_manual_exit(order, oid, osym, cycle):
+    # ✅ Manual exits (desktop or mobile) → enqueue exit ticket (no open_active_trades writes)
+    try:
+        src_raw = str(getattr(order, "source", "") or "").strip().lower()
+        if src_raw not in MANUAL_SOURCES:
+            return False
+        # pick the freshest Tiger time (ms since epoch)
+        ts_ms = (getattr(order, "update_time", None)
+                 or getattr(order, "trade_time", None)
+                 or getattr(order, "order_time", None))
+        if not ts_ms:
+            return False
+        age = time.time() - float(ts_ms) / 1000.0
+        if age > MANUAL_MAX_AGE_S:
+            print(f"[MANUAL] ignored stale manual order (age {age:.1f}s, source={src_raw})")
+            return False
+        if not osym:
+            print(f"[MANUAL] missing symbol on manual order id={oid}; contract='{getattr(order, 'contract', '')}'. Skipping enqueue.")
+            return True
+        man_px = (getattr(order, "avg_fill_price", None)
+                  or getattr(order, "filled_price", None)
+                  or getattr(order, "latest_price", None)
+                  or 0.0)
+        _queue_update(cycle, f"exit_orders_log/{osym}/{oid}", ExitTicket(
+            order_id=oid,
+            symbol=osym,
+            action=getattr(order, "action", "") or "",
+            filled_price=man_px,
+            filled_qty=1,                     # close 1 FIFO leg
+            fill_time=_safe_iso(ts_ms),
+            status="FILLED",
+            trade_type="MANUAL_EXIT",
+            source=src_raw,                   # preserve exact source (e.g., "ios")
+        ).to_firebase())
+        print(f"[MANUAL] Queued manual exit ticket {oid} ({src_raw}) for {osym} at {man_px} (age {age:.1f}s)")
+        # Do NOT touch /open_active_trades here; FIFO drain will close it.
         return True
-    return bool(firebase_db.reference(f"/archived_trades_log/{order_id}").get())
+    except Exception as e:
+        print(f"⚠️ Manual exit block failed softly: {e}")
+        return False
 
-# ====================================================
-#🟩 Helper: to Check if Trade ID is a Known Ghost Trade
-# ====================================================
-def is_ghostflag_trade(order_id, firebase_db, symbol=None):
-    if not order_id:
+def _stage_known_logs(order, oid, osym, cycle):
+    if _in_log(cycle, "/zombie_trades_log", oid, osym):
+        print(f"⏭️ ⛔ Skipping zombie trade {oid} during API push")
+        return True
+    if _in_log(cycle, "/archived_trades_log", oid, osym):
+        print(f"⏭️ ⛔ Skipping archived trade {oid} during API push")
+        return True
+    if _in_log(cycle, "/ghost_trades_log", oid, osym):
+        print(f"⏭️ ⛔ Skipping ghost trade {oid} during API push (detected by helper)")
+        return True
+    return False
+
+def _order_state(order):
+    raw_status = getattr(order, "status", "")
+    status = "FILLED" if raw_status == "SUCCESS" else str(raw_status).split('.')[-1].upper()
+    raw_reason = getattr(order, "reason", "")
+    filled = getattr(order, "filled", 0)
+    is_open = getattr(order, "is_open", False)
+    return status, raw_reason, filled, is_open
+
+def _stage_filled_skip(order, oid, osym, cycle):
+    # 🚫 Hard rule: never accept Tiger orders whose status is FILLED.
+    # (Prevents exit fills & historical fills from reappearing as new opens.)
+    status, _, _, _ = _order_state(order)
+    if status == "FILLED":
+        print(f"⏭️ Skipping FILLED order {oid} for {osym}")
+        return True
+    return False
+
+def _stage_closed(order, oid, osym, cycle):
+    # ===== NO-MAN'S-LAND GUARD: treat truly closed orders as closed, not opens =====
+    status_up = str(getattr(order, 'status', '')).split('.')[-1].upper()
+    is_open = bool(getattr(order, 'is_open', False))
+    # CLOSED if: explicit CLOSED/EXPIRED/CANCELLED, OR FILLED but not open.
+    if not (status_up in {'CLOSED', 'EXPIRED', 'CANCELLED'} or (status_up == 'FILLED' and not is_open)):
+        return False
+    cycle["updates"][f"archived_trades_log/{osym}/{oid}"] = stamped({
+        "order_id":        oid,
+        "symbol":          osym,
+        "status":          status_up,
+        "is_open":         is_open,
+        "filled":          int(getattr(order, "filled", 0) or 0),
+        "action":          str(getattr(order, 'action', '')).upper(),
+        "reason":          str(getattr(order, "reason", "") or status_up),
+        "source":          map_source(getattr(order, 'source', None)),
+        "order_time":      getattr(order, "order_time", None),
+        "update_time":     getattr(order, "update_time", None),
+        "is_ghost":        False,
+        "trade_state":     "closed",
+    })
+    print(f"🗄️ Queued archive of closed trade {oid}; skipping open_active_trades push")
+    return True
+
+GHOST_STATUSES = {"EXPIRED", "CANCELLED", "LACK_OF_MARGIN"}
+
+def _stage_ghost(order, oid, osym, cycle):
+    # 🧱 GHOST GATE — EXPIRED / CANCELLED / LACK_OF_MARGIN
+    status, raw_reason, filled, is_open = _order_state(order)
+    if not ((status in GHOST_STATUSES) or (not is_open and filled == 0 and status != "FILLED")):
         return False
-    if symbol and firebase_db.reference(f"/ghost_trades_log/{symbol}/{order_id}").get():
+    reason_text = (str(raw_reason) or status).strip()
+    ghost_record = stamped({
+        "order_id": oid,
+        "symbol": osym,
+        "status": status,
+        "reason": reason_text,
+        "filled": int(filled or 0),
+        "is_open": bool(is_open),
+        "ghost": True,
+        "source": map_source(getattr(order, 'source', None)),
+        "order_time": getattr(order, "order_time", None),
+        "update_time": getattr(order, "update_time", None),
+    })
+    # 1) Archive (audit)  2) Index in ghost log  3) Remove any live copy from open_active_trades
+    cycle["updates"][f"archived_trades_log/{osym}/{oid}"] = ghost_record
+    cycle["updates"][f"ghost_trades_log/{osym}/{oid}"] = ghost_record
+    live_copy = (cycle["open_by_symbol"].get(osym) or {}).get(oid)
+    if live_copy is not None:
+        cycle["updates"][f"open_active_trades/{osym}/{oid}"] = None
+        print(f"🗑️ Queued removal of ghost {oid} from /open_active_trades/{osym}")
+    if osym:
+        # 4) Ledger event (+ view removal, + counter when a live leg goes), committed with the rest of the cycle
+        ledger.merge_updates(cycle["updates"], ledger.event_updates(ledger.make_event(
+            "ghosted", osym, oid, leg=live_copy if ledger.is_open_trade(live_copy) else None, status=status)))
+    print(f"👻 Queued ghost archive {oid} ({status}: {reason_text})")
+    return True
+
+def _stage_merge(order, oid, osym, cycle):
+    """Merge-only refresh of an existing open trade; never creates new opens here."""
+    symbol = cycle["active_symbol"]
+    status, raw_reason, filled, is_open = _order_state(order)
+    exit_reason_raw = get_exit_reason(status, raw_reason, filled, is_open)
+
+    # Tiger order_time sanity (raw ms); an unparsable time downgrades the reason only
+    raw_ts = getattr(order, 'order_time', 0)
+    try:
+        datetime.utcfromtimestamp(raw_ts / 1000.0)
+    except Exception as e:
+        print(f"⚠️ Failed to parse Tiger order_time: {raw_ts} → {e}")
+        exit_reason_raw = "UNKNOWN"
+
+    existing_raw = (cycle["open_by_symbol"].get(symbol) or {}).get(oid) or {}
+    if not isinstance(existing_raw, dict) or not existing_raw:
+        print(f"⏭️ Merge-only: skipping new order {oid} (no existing open trade in Firebase)")
         return True
-    return bool(firebase_db.reference(f"/ghost_trades_log/{order_id}").get())
+    leg = TradeLeg.from_firebase(oid, existing_raw)
+    # 🛡️ Do not resurrect closed/exited trades
+    if leg.exited or leg.trade_state == "closed":
+        print(f"⏭️ Not resurrecting closed trade {oid}; skipping write.")
+        return True
+
+    trigger_points, offset_points = cycle["trail"]
+    # Keep original entry timestamp if it exists (from_firebase already folded transaction_time in)
+    if not leg.entry_timestamp:
+        leg.entry_timestamp = getattr(order, "transaction_time", None) or datetime.utcnow().isoformat() + "Z"
+
+    leg.update(
+        symbol=symbol,
+        filled_price=leg.get("filled_price", 0.0),                 # preserve original from app.py
+        action=getattr(order, 'action', ''),
+        trade_type=getattr(order, "trade_type", None) or leg.get("trade_type", ""),
+        status=status,
+        contracts_remaining=getattr(order, "contracts_remaining", 1),
+        trail_trigger=leg.get("trail_trigger", trigger_points),
+        trail_offset=leg.get("trail_offset", offset_points),
+        trail_hit=leg.get("trail_hit", False),                         # preserve
+        trail_peak=leg.get("trail_peak", leg.filled_price),            # preserve
+        filled=bool(filled),
+        just_executed=leg.get("just_executed", False),                 # sticky
+        trade_state="open" if status == "FILLED" and is_open else "closed",
+        quantity=getattr(order, 'quantity', 0),
+        realized_pnl=0.0,
+        net_pnl=0.0,
+        tiger_commissions=0.0,
+        exit_reason=leg.get("exit_reason", exit_reason_raw),           # raw; FIFO will prettify
+        liquidation=getattr(order, 'liquidation', False),
+        source=map_source(getattr(order, 'source', None)),
+        is_open=getattr(order, 'is_open', False),
+        is_ghost=False,
+    )
+    # Safe merge (hard FILLED-skip ran earlier; closed-trade guard ran earlier).
+    # Held until the late fence has re-checked the exit log.
+    cycle["merges"].append((oid, osym, symbol, leg.to_firebase()))
+    return True
+
+ORDER_STAGES = (
+    ("exit_fence",  _stage_exit_fence),
+    ("liquidation", _stage_liquidation),
+    ("manual_exit", _stage_manual_exit),
+    ("known_logs",  _stage_known_logs),
+    ("filled_skip", _stage_filled_skip),
+    ("closed",      _stage_closed),
+    ("ghost",       _stage_ghost),
+    ("merge",       _stage_merge),
+)
+# With the fill stream on, liquidations and manual exits arrive as executions (any age, any source);
+# the order-list heuristics would only duplicate them.
+FILL_STREAM_STAGES = {"liquidation", "manual_exit"}
+if fill_stream.FILL_STREAM:
+    ORDER_STAGES = tuple(s for s in ORDER_STAGES if s[0] not in FILL_STREAM_STAGES)
+
+def _classify_order(order, cycle):
+    """Run an order through ORDER_STAGES; returns the name of the stage that consumed it."""
+    # Always use the TigerTrade long ID from get_orders()
+    oid = str(getattr(order, 'id', '')).strip()
+    # Single validation – ensures it's a numeric string
+    if not oid.isdigit():
+        print(f"❌ Skipping order due to invalid order_id: '{oid}'. Order raw data: {order}")
+        return "invalid"
+    osym = _order_symbol(order)
+    for name, stage in ORDER_STAGES:
+        if stage(order, oid, osym, cycle):
+            return name
+    return "unhandled"
 
 #################### END OF ALL HELPERS FOR THIS SCRIPT ####################
-    
+
 # =======================================================
 # ======MAIN FUNCTION ==PUSH ORDERS TO FIREBASE==========
 # =======================================================
 def push_orders_main():
-
-    #=======Definitions ===========
-    symbol = firebase_active_contract.get_active_contract()
-     #=====Time function ===
-    now = datetime.utcnow()
-   
-    #====Initialize counters here, BEFORE the order loop: =====
-    open_trades_count = 0
-    cancelled_count = 0
-    lack_margin_count = 0
-    unknown_count = 0
-
-    # Reason map dictionary to more user friendly names
-    REASON_MAP = {
-        "trailing_tp_exit": "Trailing Take Profit",
-        "manual_close": "Manual Close",
-        "ema_flattening_exit": "EMA Flattening",
-        "liquidation": "Liquidation",
-        "LACK_OF_MARGIN": "Lack of Margin",
-        "CANCELLED": "Cancelled",
-        "EXPIRED": "Lack of Margin",
-    }
-
+    """
+    One cycle: fetch Tiger orders, prefetch every Firebase read in parallel,
+    classify each order through ORDER_STAGES (pure, no I/O), then commit all
+    writes in a single multi-path update.
+    Returns True when there is something to watch (open legs or working orders),
+    False when flat, None when the cycle aborted — the scheduler's activity signal.
+    """
     # ================== Use Active Contract Symbol For Efficiency ====================
     # Before fetching orders from TigerTrade API, fetch the active contract from Firebase
+    sw = metrics.Stopwatch("push_orders_main")
     active_symbol = firebase_active_contract.get_active_contract()
     if not active_symbol:
         print("❌ No active contract symbol found in Firebase; aborting orders fetch")
-        return 
+        sw.done(outcome="no_active_contract")
+        return None
+    sw.lap("active_contract")
 
     # Default small fetch
     limit = 20
@@ -220,374 +472,66 @@ def push_orders_main():
         limit = 50
         push_orders_main._recent_burst = False # reset after one wide fetch
 
-    orders = client.get_orders(
-    account="21807597867063647",
-    seg_type=SegmentType.FUT,
+    orders = get_client().get_orders(
+    account=ACCOUNT,
+    seg_type=fut_segment(),
     limit=limit
     )
     print(f"\n📦 Total FUT orders returned (limit={limit}): {len(orders)}")
+    sw.lap("tiger_get_orders")
+
+    # 0) Executions since the cursor → exit tickets / entry legs, before the exit fence reads the logs
+    #    (trailing settings read once here and handed to the prefetch, not read again)
+    trail = None
+    if fill_stream.FILL_STREAM:
+        trail = load_trailing_tp_settings()
+        fill_stream.ingest(firebase_db, active_symbol,
+                           orders_by_id={str(getattr(o, "id", "")): o for o in orders}, trail=trail)
+        sw.lap("fill_stream")
 
-   #=========================================================================================
+    #=========================================================================================
     # ====================== START THE FUNCTION: Push Orders Processing ======================
     #=========================================================================================
 
-    # 🟩 Refresh archived trades cache inside main loop
-    archived_order_ids = _log_ids_for(firebase_db, "/archived_trades_log", active_symbol)
-
-    tiger_ids = set()
+    # 1) One parallel round of reads for the whole cycle
+    cycle = _prefetch_cycle(firebase_db, active_symbol, {_order_symbol(o) for o in orders}, trail=trail)
+    cycle.update({"active_symbol": active_symbol, "updates": {}, "merges": []})
+    sw.lap("prefetch")
 
+    # 2) Classify every order (no Firebase round trips in here)
+    counts = {}
     for order in orders:
         try:
-            # Always use the TigerTrade long ID from get_orders()
-            order_id = str(getattr(order, 'id', '')).strip()
-            active_symbol = getattr(order, "symbol", "")
-
-            # Single validation – ensures it's a numeric string
-            if not (isinstance(order_id, str) and order_id.isdigit()):
-                print(f"❌ Skipping order due to invalid order_id: '{order_id}'. Order raw data: {order}")
-                continue
-
-          # 🔐 EARLY EXIT-TICKET FENCE — block exit fills from being processed as opens
-            if firebase_db.reference(f"/exit_orders_log/{active_symbol}/{order_id}").get() \
-            or firebase_db.reference(f"/exit_orders_log/{order_id}").get():
-                print(f"⏭️ Skipping EXIT ticket {order_id} (early fence)")
-                continue
-
-            # ✅ Route Tiger liquidations as exit tickets (do NOT touch open_active_trades here)
-            if getattr(order, "liquidation", False) is True:
-                liq_oid = str(getattr(order, "id", "") or getattr(order, "order_id", "")).strip()  # Tiger uses 0 for order_id; use 'id'
-                liq_px  = (getattr(order, "avg_fill_price", None)
-                        or getattr(order, "filled_price", None)
-                        or getattr(order, "latest_price", None)
-                        or 0.0)
-                liq_ts  = (getattr(order, "update_time", None)
-                        or getattr(order, "trade_time", None)
-                        or getattr(order, "order_time", None))
-                liq_iso = _safe_iso(liq_ts)
-                liq_side = str(getattr(order, "action", "") or "").upper()
-                contract_str = str(getattr(order, "contract", "") or "")
-                sym_from_contract = contract_str.split("/", 1)[0] if contract_str else ""
-                liq_sym_raw = getattr(order, "symbol", "") or ""
-                liq_sym = (liq_sym_raw or sym_from_contract or active_symbol).strip()
-
-                firebase_db.reference(f"/exit_orders_log/{liq_sym}/{liq_oid}").set({
-                    "order_id": liq_oid,
-                    "symbol": liq_sym,
-                    "action": liq_side,
-                    "filled_price": float(liq_px),
-                    "filled_qty": int(getattr(order, "quantity", 1) or 1),
-                    "fill_time": liq_iso,
-                    "status": "LIQUIDATION",
-                    "trade_type": "LIQUIDATION"
-                })
-                print(f"[LIQ] Queued liquidation as exit ticket {liq_oid} for {liq_sym} at {liq_px}")
-                continue
-
-                        # ✅ Manual manual exits (desktop or mobile) → enqueue exit ticket (no open_active_trades writes)
-            #    - Sources: desktop-mac / desktop / ios / iphone / ipad / android / tiger-mobile / mobile
-            try:
-                src_raw = str(getattr(order, "source", "") or "").strip().lower()
-                manual_sources = {"desktop-mac", "desktop", "ios", "iphone", "ipad", "android", "tiger-mobile", "mobile"}
-                if src_raw in manual_sources:
-                    # pick the freshest Tiger time (ms since epoch)
-                    ts_ms = (getattr(order, "update_time", None)
-                            or getattr(order, "trade_time", None)
-                            or getattr(order, "order_time", None))
-                    if ts_ms:
-                        now_s = time.time()
-                        t_s   = float(ts_ms) / 1000.0
-                        age   = now_s - t_s  # seconds
-                        if age <= 180.0:  # <= 3 minutes
-                            man_oid = str(getattr(order, "id", "") or getattr(order, "order_id", "")).strip()
-                            if man_oid and man_oid.isdigit():
-                                man_px   = (getattr(order, "avg_fill_price", None)
-                                            or getattr(order, "filled_price", None)
-                                            or getattr(order, "latest_price", None)
-                                            or 0.0)
-                                man_iso  = _safe_iso(ts_ms)
-                                man_side = str(getattr(order, "action", "") or "").upper()
-                                # Prefer explicit symbol; otherwise parse from 'contract' like 'MGC2510/FUT/USD/None'
-                                contract_str = str(getattr(order, "contract", "") or "")
-                                sym_from_contract = contract_str.split("/", 1)[0] if contract_str else ""
-                                man_sym_raw = getattr(order, "symbol", "") or ""
-                                man_sym = (man_sym_raw or sym_from_contract).strip()
-
-                                if not man_sym:
-                                    print(f"[MANUAL] missing symbol on manual order id={man_oid}; contract='{contract_str}'. Skipping enqueue.")
-                                    continue
-
-                                firebase_db.reference(f"/exit_orders_log/{man_sym}/{man_oid}").update({
-                                    "order_id": man_oid,
-                                    "symbol": man_sym,
-                                    "action": man_side,
-                                    "filled_price": float(man_px),
-                                    "filled_qty": 1,                  # close 1 FIFO leg
-                                    "fill_time": man_iso,
-                                    "status": "FILLED",
-                                    "trade_type": "MANUAL_EXIT",
-                                    "source": src_raw,                 # preserve exact source (e.g., "ios")
-                                })
-                                print(f"[MANUAL] Queued manual exit ticket {man_oid} ({src_raw}) for {man_sym} at {man_px} (age {age:.1f}s)")
-                                # Do NOT touch /open_active_trades here; FIFO drain will close it.
-                                continue
-                            else:
-                                print(f"[MANUAL] recent manual order has non-numeric id; skipping: id={man_oid}, source={src_raw}")
-                        else:
-                            print(f"[MANUAL] ignored stale manual order (age {age:.1f}s, source={src_raw})")
-            except Exception as e:
-                print(f"⚠️ Manual exit block failed softly: {e}")
-
-            # ===================== Check if order ID is already processed and filter out ====================
-
-            if not order_id:
-                print("⚠️ Skipping order with empty or missing order_id")
-                continue
-            print(f"🔍 Processing order_id: {order_id}")
-
-            if is_zombie_trade(order_id, db, active_symbol):
-                print(f"⏭️ ⛔ Skipping zombie trade {order_id} during API push")
-                continue
-            else:
-                print(f"✅ Order ID {order_id} not a zombie, proceeding")
-
-            if is_archived_trade(order_id, db, active_symbol):
-                print(f"⏭️ ⛔ Skipping archived trade {order_id} during API push")
-                continue
-
-            if is_ghostflag_trade(order_id, db, active_symbol):
-                print(f"⏭️ ⛔ Skipping ghost trade {order_id} during API push (detected by helper)")
-                continue
-            else:
-                print(f"✅ Order ID {order_id} not a ghost, proceeding")
-
-
-            # ===================================End of First filtering=======================================
-
-            #=========================== Extract order information for further processing ====================
-            tiger_ids.add(order_id)
-
-            raw_status = getattr(order, "status", "")
-            status = "FILLED" if raw_status == "SUCCESS" else str(raw_status).split('.')[-1].upper()
-            raw_reason = getattr(order, "reason", "")
-            filled = getattr(order, "filled", 0)
-            is_open = getattr(order, "is_open", False)
-            exit_reason_raw = get_exit_reason(status, raw_reason, filled, is_open)
-
-            #==========================================================================================
-            # 🚫 Hard rule: never accept Tiger orders whose status is FILLED.
-            # (Prevents exit fills & historical fills from reappearing as new opens.)
-            #SUPER IMPORTANT CODE THAT STOP OPEN ORDERS GETTING FILLED WITH JUNK ++ TEMPEORY REPLACEMENT 
-            if status == "FILLED":
-                print(f"⏭️ Skipping FILLED order {order_id} for {active_symbol}")
-                continue
-            #==========================================================================================
-
-            # ===== NO-MAN'S-LAND GUARD: treat truly closed orders as closed, not opens =====
-            status_up = str(getattr(order, 'status', '')).split('.')[-1].upper()
-            is_open   = bool(getattr(order, 'is_open', False))
-
-            # CLOSED if: explicit CLOSED/EXPIRED/CANCELLED, OR FILLED but not open.
-            is_truly_closed = (
-                status_up in {'CLOSED', 'EXPIRED', 'CANCELLED'} or
-                (status_up == 'FILLED' and not is_open)
-            )
-
-            if is_truly_closed:
-                # Build a minimal record for logging/archiving without touching open_active_trades
-                closed_payload = {
-                    "order_id":        order_id,
-                    "symbol":          active_symbol,
-                    "status":          status_up,
-                    "is_open":         is_open,
-                    "filled":          int(getattr(order, "filled", 0) or 0),
-                    "action":          str(getattr(order, 'action', '')).upper(),
-                    "reason":          str(getattr(order, "reason", "") or status_up),
-                    "source":          map_source(getattr(order, 'source', None)),
-                    "order_time":      getattr(order, "order_time", None),
-                    "update_time":     getattr(order, "update_time", None),
-                    "is_ghost":        False,
-                    "trade_state":     "closed",
-                }
-
-                try:
-                    firebase_db.reference(f"/archived_trades_log/{active_symbol}/{order_id}").set(closed_payload)
-                    print(f"🗄️ Archived closed trade {order_id} to /archived_trades_log")
-                except Exception as e:
-                    print(f"⚠️ Archive failed for closed trade {order_id}: {e}")
-
-                print(f"⚠️ Skipping closed trade {order_id} for open_active_trades push")
-                continue
-
-            # 🧱 GHOST GATE — EXPIRED / CANCELLED / LACK_OF_MARGIN
-            ghost_statuses = {"EXPIRED", "CANCELLED", "LACK_OF_MARGIN"}
-            is_ghost = (status in ghost_statuses) or (not is_open and filled == 0 and status != "FILLED")
-
-            if is_ghost:
-                reason_text = (str(raw_reason) or status).strip()
-                ghost_record = {
-                    "order_id": order_id,
-                    "symbol": active_symbol,  # already resolved above
-                    "status": status,
-                    "reason": reason_text,
-                    "filled": int(filled or 0),
-                    "is_open": bool(is_open),
-                    "ghost": True,
-                    "source": map_source(getattr(order, 'source', None)),
-                    "order_time": getattr(order, "order_time", None),
-                    "update_time": getattr(order, "update_time", None),
-                }
-                try:
-                    # 1) Archive (audit)
-                    firebase_db.reference(f"/archived_trades_log/{active_symbol}/{order_id}").set(ghost_record)
-                    # 2) Index in ghost log
-                    firebase_db.reference(f"/ghost_trades_log/{active_symbol}/{order_id}").set(ghost_record)
-                    # 3) Remove any live copy from open_active_trades
-                    open_ref = firebase_db.reference(f"/open_active_trades/{active_symbol}")
-                    if open_ref.child(order_id).get() is not None:
-                        open_ref.child(order_id).delete()
-                        print(f"🗑️ Removed ghost {order_id} from /open_active_trades/{active_symbol}")
-                    print(f"👻 Archived ghost trade {order_id} ({status}: {reason_text})")
-                except Exception as e:
-                    print(f"❌ Ghost archive/delete failed for {order_id}: {e}")
-                continue
-
-            # ======================= Normalize TigerTrade timestamp (raw ms → ISO UTC) ======================
-            raw_ts = getattr(order, 'order_time', 0)
-            try:
-                ts_dt = datetime.utcfromtimestamp(raw_ts / 1000.0)
-                exit_time_str = ts_dt.strftime("%Y-%m-%d %H:%M:%S")  # For Google Sheets
-            except Exception as e:
-                print(f"⚠️ Failed to parse Tiger order_time: {raw_ts} → {e}")
-                exit_time_str = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-                exit_reason_raw = "UNKNOWN"
-
-            symbol = firebase_active_contract.get_active_contract()
-            if not symbol:
-                print(f"❌ No active contract symbol found in Firebase; skipping order ID {order_id}")
-                continue  # Skip processing this order
-
-            existing_trade = firebase_db.reference(f"/open_active_trades/{symbol}/{order_id}").get() or {}
-            trigger_points, offset_points = load_trailing_tp_settings()
-
-            # Keep original entry timestamp if it exists
-            entry_timestamp = existing_trade.get("entry_timestamp")
-            if not entry_timestamp:
-                entry_timestamp = getattr(order, "transaction_time", None) or datetime.utcnow().isoformat() + "Z"
-
-            filled_price_final = existing_trade.get("filled_price", 0.0)
-            just_executed_final = existing_trade.get("just_executed", False)
-            trail_hit = existing_trade.get("trail_hit", False)
-            trail_peak = existing_trade.get("trail_peak", existing_trade.get("filled_price"))
-            trade_type_final = existing_trade.get("trade_type", "")
-            if getattr(order, "trade_type", None):
-                trade_type_final = getattr(order, "trade_type")
-
-        except Exception as e:
-            print(f"❌ push_orders_main pre-update error for order {locals().get('order_id', '<unknown>')}: {e}")
-            continue
-
-        # ========================= BUILD PAYLOAD READY TO PUSH TO FIREBASE ================================
-        print(f"[DEBUG] existing_trade data: {existing_trade}")
-        print(f"[DEBUG] filled_price_final: {filled_price_final}")
-
-        payload = {
-            "order_id": order_id,
-            "symbol": symbol,
-            "filled_price": filled_price_final,  # preserve original from app.py
-            "action": str(getattr(order, 'action', '')).upper(),
-            "trade_type": trade_type_final,
-            "status": status,
-            "contracts_remaining": getattr(order, "contracts_remaining", 1),
-            "trail_trigger": existing_trade.get("trail_trigger", trigger_points),
-            "trail_offset": existing_trade.get("trail_offset", offset_points),
-            "trail_hit": trail_hit,                                   # preserve
-            "trail_peak": trail_peak,                                 # preserve
-            "filled": bool(filled),
-            "entry_timestamp": entry_timestamp,                       # sticky
-            "just_executed": just_executed_final,                     # sticky
-            "exit_timestamp": existing_trade.get("exit_timestamp") or None,  # preserve only
-            "trade_state": "open" if status == "FILLED" and is_open else "closed",
-            "quantity": getattr(order, 'quantity', 0),
-            "realized_pnl": 0.0,
-            "net_pnl": 0.0,
-            "tiger_commissions": 0.0,
-            "exit_reason": existing_trade.get("exit_reason", exit_reason_raw),  # raw; FIFO will prettify
-            "liquidation": getattr(order, 'liquidation', False),
-            "source": map_source(getattr(order, 'source', None)),
-            "is_open": getattr(order, 'is_open', False),
-            "is_ghost": False,
-        }
-
-            # 🛡️ Do not resurrect closed/exited trades
-        if existing_trade.get("exited") or existing_trade.get("trade_state") == "closed":
-            print(f"⏭️ Not resurrecting closed trade {order_id}; skipping write.")
-            continue
-        # 🛑 Never write ghosts into open_active_trades
-        if payload.get("is_ghost"):
-            print(f"👻 Skipping write of ghost {order_id} to /open_active_trades/{symbol}")
-            continue
-
-        # 🔒 LATE EXIT‑TICKET FENCE — last check before we touch /open_active_trades
-        if firebase_db.reference(f"/exit_orders_log/{active_symbol}/{order_id}").get() \
-        or firebase_db.reference(f"/exit_orders_log/{order_id}").get():
-            print(f"⏭️ Skipping EXIT ticket {order_id} (late fence)")
-            continue
-
-        ref = firebase_db.reference(f"/open_active_trades/{symbol}/{order_id}")
-        try:
-            existing_trade = ref.get() or {}
-
-            # Merge-only: never create new open trades here
-            if not existing_trade:
-                print(f"⏭️ Merge-only: skipping new order {order_id} (no existing open trade in Firebase)")
-                continue
-
-            # Safe merge (hard FILLED-skip ran earlier; closed-trade guard ran earlier)
-            merged_trade = {**existing_trade, **payload}
-            ref.update(merged_trade)
-            print(f"✅ Merged into existing open trade {order_id}")
-
+            stage = _classify_order(order, cycle)
         except Exception as e:
-            print(f"❌ Failed to upsert /open_active_trades/{symbol}/{order_id}: {e}")
-
-        
-            # ===========🟩 Skip if trade already archived ghost or Zombie and cached in the new run coming up=====================
-            if order_id in archived_order_ids:
-                print(f"⏭️ ⛔ Archived trade {order_id} already processed this run; skipping duplicate archive")
-                continue
-
-            if is_ghostflag_trade(order_id, db):
-                print(f"⏭️ ⛔ Skipping ghost trade {order_id} during API push (detected by helper)")
-                continue
-
-            if is_zombie_trade(order_id, db):
-                print(f"⏭️ ⛔ Skipping zombie trade {order_id} during API push (detected by helper)")
+            stage = "error"
+            print(f"❌ push_orders_main classify error for order {getattr(order, 'id', '<unknown>')}: {e}")
+        counts[stage] = counts.get(stage, 0) + 1
+        metrics.inc("push_orders_classified", stage=stage)
+    sw.lap("classify")
+
+    # 3) 🔒 LATE EXIT‑TICKET FENCE — re-read exit logs right before we touch /open_active_trades
+    if cycle["merges"]:
+        fence_paths = {"/exit_orders_log"} | {f"/exit_orders_log/{osym}" for _, osym, _, _ in cycle["merges"]}
+        fence = _parallel_reads({p: (lambda p=p: _shallow_keys(firebase_db, p)) for p in fence_paths})
+        for oid, osym, symbol, merged_trade in cycle["merges"]:
+            if oid in fence.get(f"/exit_orders_log/{osym}", set()) or oid in fence["/exit_orders_log"]:
+                print(f"⏭️ Skipping EXIT ticket {oid} (late fence)")
                 continue
+            _queue_update(cycle, f"open_active_trades/{symbol}/{oid}", merged_trade)
+            print(f"✅ Queued merge into existing open trade {oid}")
 
-            print(f"Order ID {order_id} not archived, ghost, or zombie; proceeding")
-
-            if payload.get("is_open", False):
-                open_trades_count += 1
-            elif exit_reason_raw == "CANCELLED":
-                cancelled_count += 1
-            elif exit_reason_raw == "LACK_OF_MARGIN":
-                lack_margin_count += 1
-            else:
-                unknown_count += 1
+    sw.lap("late_fence")
 
-            archived_order_ids.add(order_id)
-
-            # Use order_id safely from here on
-            ref = db.reference(f'/open_active_trades/{symbol}/{order_id}')
-
-            # Simple guard: skip closed but filled trades
-            if not payload.get("is_open", False) and payload.get("status", "").upper() == "FILLED":
-                print(f"⚠️ Skipping closed filled trade {payload.get('order_id')} before open check")
-                continue
+    # ======= Ensure /open_active_trades/ path stays alive, even if no trades written =====
+    if not cycle["open_root_keys"]:
+        print("🫀 Writing /open_active_trades/_heartbeat to keep path alive")
+        cycle["updates"]["open_active_trades/_heartbeat"] = "alive"
 
-        except Exception as e:
-            print(f"❌ Error processing order {order}: {e}")
-            continue
+    # 4) Single multi-path commit for the whole cycle
+    _commit_updates(firebase_db, cycle["updates"])
+    sw.lap("commit")
+    print(f"[PUSH] cycle summary: {counts}")
 
     # --- Burst detector (place AFTER the loop, BEFORE the heartbeat) ---
     try:
@@ -601,27 +545,28 @@ def push_orders_main():
         push_orders_main._last_seen_id = new_max
     except Exception as e:
         print(f"[BURST] detector skipped: {e}")
+    sw.done()
 
-    # ======= Ensure /open_active_trades/ path stays alive, even if no trades written =====
-    try:
-        open_active_trades_root = db.reference("/open_active_trades")
-        snapshot = open_active_trades_root.get() or {}
-        if not snapshot:
-            print("🫀 Writing /open_active_trades/_heartbeat to keep path alive")
-            open_active_trades_root.child("_heartbeat").set("alive")
-    except Exception as e:
-        print(f"❌ Failed to write /open_active_trades/_heartbeat: {e}")
+    open_symbols = {k for k in cycle["open_root_keys"] if not str(k).startswith("_")}
+    working = any(str(getattr(o, "status", "")).split(".")[-1].upper() in WORKING_ORDER_STATUSES for o in orders)
+    return bool(open_symbols or cycle["merges"] or working)
 
 #=============================================================================================================================================
 #=============================================END OF MAIN PUSH_ORDERS_MAIN_FUNCTION===========================================================
 #=============================================================================================================================================
 
 if __name__ == "__main__":
-    import time
-    while True:
-        try:
-            push_orders_main()  # <-- your existing main function
-        except Exception as e:
-            print(f"❌ Error running push_orders_main(): {e}")
-        time.sleep(20)  # wait 20 seconds before next loop
+    import profiler
+    import scheduler
+    prof = profiler.LoopProfiler("push_orders", firebase_db)
+    prof.install_signal_handler()
+
+    def _push_orders_cycle():
+        with prof.iteration():
+            return push_orders_main()  # <-- your existing main function
+
+    scheduler.run_forever([
+        scheduler.Task("push_orders", _push_orders_cycle,
+                       active_s=PUSH_ORDERS_ACTIVE_S, idle_s=PUSH_ORDERS_IDLE_S, closed_s=PUSH_ORDERS_CLOSED_S),
+    ], title="push_orders")
 #===============================================================(END OF SCRIPT) ======================================================================
\ No newline at end of file
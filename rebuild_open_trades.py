@@ -0,0 +1,331 @@
+#=========================  REBUILD_OPEN_TRADES - RECONCILE /open_active_trades WITH TIGER  ================================
+# Recovery for when Firebase has drifted from the broker (missed fills, stray legs, wrong sizes). Replaces
+# the per-trade set/delete scripts (archive_leftover_trades, set_active_contract_manual, manual zombie purges):
+#
+#   1) one get_positions call → signed net + average cost per symbol (broker truth)
+#   2) per non-flat symbol, recent executions (get_transactions, paged back until |net| is covered)
+#   3) FIFO legs rebuilt from them: exits always consume the oldest lots, so the open legs are the newest
+#      fills on the side of net (strategy_core.fifo_open_lots), aggregated per order id with their real
+#      entry prices and times. Whatever the fetched history cannot cover becomes one "rebuild-<ms>" leg at
+#      the broker's average cost (reused on the next run, so reruns are idempotent).
+#   4) diff against ONE read of /open_active_trades: add / resize / reprice / remove per leg
+#   5) every correction for every symbol in ONE multi-path update: the legs, a `reconciled` ledger event
+#      per leg (ledger views follow), removed legs archived to /zombie_trades_log, and the position
+#      counter set outright to the rebuilt net/open
+#
+# --dry-run prints the same report and writes nothing. Legs younger than SETTLE_S are never removed (the
+# broker's position report can trail a fresh fill). Run it while the bots are quiet: a fill landing
+# between the reads and the commit is not seen (ledger.verify_position repairs the counter afterwards).
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import ledger
+import metrics
+import strategy_core
+from fill_stream import fill_from_tx
+from firebase_client import firebase_db as db  # lazy: Admin SDK initializes on the first DB call
+from trade_model import TradeLeg, legs_from_node, stamped
+
+DEFAULT_LOOKBACK_HOURS = 72
+FETCH_LIMIT = 100             # executions per get_transactions page
+MAX_PAGES = 10                # per symbol; older history than that → average-cost leg
+FETCH_WORKERS = 4             # concurrent symbol fetches (tiger_client's gateway still rate-limits)
+SETTLE_S = 60                 # never remove a leg younger than this
+PRICE_EPS = 1e-6
+SYNTHETIC_PREFIX = "rebuild-"
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+def _iso(ms):
+    return datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+# ====================================================
+# 🟩 Broker truth (bulk reads)
+# ====================================================
+def broker_positions(client, account, sec_type):
+    """{symbol: (signed net, average cost)} from one get_positions call."""
+    out = {}
+    for pos in (client.get_positions(account=account, sec_type=sec_type) or []):
+        sym = str(getattr(pos, "contract", getattr(pos, "symbol", "")) or "").split("/", 1)[0].strip()
+        try:
+            qty = int(float(getattr(pos, "quantity", getattr(pos, "position_qty", 0)) or 0))
+        except (TypeError, ValueError):
+            qty = 0
+        if not sym or not qty:
+            continue
+        net, _ = out.get(sym, (0, None))
+        out[sym] = (net + qty, float(getattr(pos, "average_cost", 0.0) or 0.0))
+    return out
+
+def broker_fills(client, account, sec_type, symbol, net, since_ms):
+    """Executions for `symbol` since `since_ms`, paged back (newest first) until they cover |net|."""
+    fills, seen, end_ms = [], set(), None
+    for _ in range(MAX_PAGES):
+        txs = client.get_transactions(account=account, symbol=symbol, sec_type=sec_type, start_time=since_ms,
+                                      end_time=end_ms, limit=FETCH_LIMIT) or []
+        page = [f for f in (fill_from_tx(t, symbol) for t in txs) if f and f["exec_id"] not in seen]
+        seen.update(f["exec_id"] for f in page)
+        fills.extend(page)
+        _, shortfall = strategy_core.fifo_open_lots(fills, net)
+        if len(txs) < FETCH_LIMIT or not page or not shortfall:
+            break
+        end_ms = min(f["ms"] for f in page) - 1
+    return fills
+
+# ====================================================
+# 🟩 Rebuilt legs (pure)
+# ====================================================
+def rebuilt_legs(symbol, net, avg_cost, fills, existing=None, now_ms=None):
+    """
+    {key: {action, qty, price, ms, order_id}} the book should hold for broker `net`: FIFO-surviving lots
+    grouped per order id (VWAP price, first execution time), plus an average-cost leg for any shortfall.
+    """
+    legs = {}
+    if not net:
+        return legs
+    lots, shortfall = strategy_core.fifo_open_lots(fills, net)
+    for fill, qty in lots:
+        leg = legs.setdefault(fill["order_id"], {"action": fill["action"], "qty": 0, "notional": 0.0,
+                                                 "ms": fill["ms"], "order_id": fill["order_id"]})
+        leg["qty"] += qty
+        leg["notional"] += qty * fill["price"]
+        leg["ms"] = min(leg["ms"], fill["ms"])
+    for leg in legs.values():
+        leg["price"] = round(leg.pop("notional") / leg["qty"], 6)
+    if shortfall:
+        key = next((k for k in sorted(existing or {}) if k.startswith(SYNTHETIC_PREFIX)), None)
+        ms = now_ms or _now_ms()
+        legs[key or f"{SYNTHETIC_PREFIX}{ms}"] = {"action": "BUY" if net > 0 else "SELL", "qty": shortfall,
+                                                  "price": avg_cost, "ms": ms, "order_id": None}
+    return legs
+
+def _group(opens):
+    """Firebase live legs grouped by the broker order they came from (fill-stream siblings → parent)."""
+    groups = {}
+    for key, leg in opens.items():
+        groups.setdefault(str(leg.get("parent_order_id") or key), []).append(key)
+    return groups
+
+def diff_symbol(symbol, target, opens, now_ms):
+    """
+    Compare rebuilt `target` legs with Firebase `opens` ({oid: TradeLeg}, live only).
+    Returns {"add": {key: target}, "resize": {key: (old, new)}, "reprice": {key: (old, new)},
+             "remove": [key], "settling": [key]}.
+    """
+    out = {"add": {}, "resize": {}, "reprice": {}, "remove": [], "settling": []}
+    groups = _group(opens)
+    for key, want in target.items():
+        members = groups.pop(key, None)
+        if not members:
+            out["add"][key] = want
+            continue
+        members = sorted(members, key=lambda k: (k != key, k))   # the order-id key itself first
+        have = sum(strategy_core.leg_remaining(opens[k]) for k in members)
+        if have != want["qty"]:
+            # fold the order's siblings into its first record
+            out["resize"][members[0]] = (strategy_core.leg_remaining(opens[members[0]]), want["qty"])
+            out["remove"].extend(members[1:])
+        elif len(members) == 1 and not key.startswith(SYNTHETIC_PREFIX):   # avg cost drifts; keep it
+            px = opens[members[0]].filled_price
+            if px is None or abs(px - want["price"]) > PRICE_EPS:
+                out["reprice"][members[0]] = (px, want["price"])
+    for members in groups.values():
+        for key in members:
+            entry = opens[key].entry_utc
+            young = entry is not None and now_ms - entry.timestamp() * 1000 < SETTLE_S * 1000
+            (out["settling"] if young else out["remove"]).append(key)
+    return out
+
+# ====================================================
+# 🟩 Multi-path update
+# ====================================================
+def _trail_settings():
+    try:
+        cfg = db.reference("/trailing_tp_settings").get() or {}
+    except Exception as e:
+        print(f"[WARN] Failed to fetch trailing settings, using defaults: {e}")
+        cfg = {}
+    if cfg.get("enabled", False):
+        return float(cfg.get("trigger_points", 14.0)), float(cfg.get("offset_points", 5.0))
+    return 14.0, 5.0
+
+def _new_leg(symbol, key, want, trail):
+    trigger_points, offset_points = trail
+    leg = TradeLeg(
+        order_id=key,
+        symbol=symbol,
+        action=want["action"],
+        trade_type="LONG_ENTRY" if want["action"] == "BUY" else "SHORT_ENTRY",
+        status="FILLED",
+        filled_price=want["price"],
+        quantity=want["qty"],
+        contracts_remaining=want["qty"],
+        filled=True,
+        entry_timestamp=_iso(want["ms"]),
+        trail_mode="FALLBACK",
+        trail_trigger=trigger_points,
+        trail_offset=offset_points,
+        trail_hit=False,
+        trail_peak=want["price"],
+        trade_state="open",
+        is_open=True,
+        is_ghost=False,
+        source="rebuild",
+    ).to_firebase()
+    leg["rebuilt_utc"] = datetime.now(timezone.utc).isoformat()
+    return leg
+
+def symbol_updates(symbol, changes, opens, target, trail, now_ms):
+    """Multi-path entries (relative to root) applying one symbol's `changes`."""
+    updates = {}
+    base = f"open_active_trades/{symbol}"
+    stamp = datetime.now(timezone.utc).isoformat()
+
+    def reconciled(key, leg):
+        ledger.merge_updates(updates, ledger.event_updates(ledger.make_event(
+            "reconciled", symbol, key, leg=leg, ts_ms=now_ms, source="rebuild")))
+
+    for key, want in changes["add"].items():
+        leg = _new_leg(symbol, key, want, trail)
+        updates[f"{base}/{key}"] = leg
+        reconciled(key, leg)
+    for key in set(changes["resize"]) | set(changes["reprice"]):
+        leg = opens[key].copy()
+        if key in changes["resize"]:
+            qty = changes["resize"][key][1]
+            leg["contracts_remaining"] = qty
+            updates[f"{base}/{key}/contracts_remaining"] = qty
+            if (leg.quantity or 0) < qty:
+                leg["quantity"] = qty
+                updates[f"{base}/{key}/quantity"] = qty
+        if key in changes["reprice"]:
+            px = changes["reprice"][key][1]
+            leg["filled_price"] = px
+            updates[f"{base}/{key}/filled_price"] = px
+        updates[f"{base}/{key}/rebuilt_utc"] = stamp
+        reconciled(key, leg)
+    for key in changes["remove"]:
+        tr = {**opens[key], "trade_state": "closed", "is_open": False, "contracts_remaining": 0,
+              "exit_reason": "REBUILD", "exit_timestamp": _iso(now_ms)}
+        updates[f"zombie_trades_log/{symbol}/{key}"] = stamped(tr)
+        updates[f"{base}/{key}"] = None
+        reconciled(key, None)
+    if any(changes[k] for k in ("add", "resize", "reprice", "remove")):
+        legs = {k: {"action": w["action"], "qty": w["qty"]} for k, w in target.items()}
+        for field, value in ledger.position_from_legs(legs).items():
+            updates[f"{ledger.LEDGER_ROOT}/position/{symbol}/{field}"] = value
+    return updates
+
+# ====================================================
+# 🟩 Entry point
+# ====================================================
+def rebuild(symbols=None, lookback_hours=DEFAULT_LOOKBACK_HOURS, dry_run=False, client=None, account=None):
+    """Reconcile /open_active_trades with Tiger. Returns {symbol: report}; commits unless dry_run."""
+    from tiger_client import ACCOUNT, get_client, fut_segment
+
+    sw = metrics.Stopwatch("rebuild")
+    client = client or get_client()
+    account = account or ACCOUNT
+    sec_type = fut_segment()
+    now_ms = _now_ms()
+    since_ms = now_ms - int(lookback_hours * 3_600_000)
+
+    positions = broker_positions(client, account, sec_type)
+    book = db.reference("/open_active_trades").get() or {}
+    wanted = set(symbols or ())
+    names = sorted(set(positions) | {str(k) for k, v in book.items()
+                                     if isinstance(v, dict) and not str(k).startswith("_")})
+    if wanted:
+        names = [s for s in names if s in wanted] + sorted(wanted - set(names))
+    sw.lap("positions")
+
+    def fetch(sym):
+        net = positions.get(sym, (0, None))[0]
+        return sym, broker_fills(client, account, sec_type, sym, net, since_ms) if net else []
+
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        fills_by_symbol = dict(pool.map(fetch, names))
+    sw.lap("fills")
+
+    trail = _trail_settings()
+    report, updates = {}, {}
+    for sym in names:
+        net, avg_cost = positions.get(sym, (0, 0.0))
+        opens = {k: leg for k, leg in legs_from_node(book.get(sym)).items() if ledger.is_open_trade(leg)}
+        target = rebuilt_legs(sym, net, avg_cost, fills_by_symbol.get(sym, []), existing=opens, now_ms=now_ms)
+        changes = diff_symbol(sym, target, opens, now_ms)
+        report[sym] = {
+            "broker_net": net,
+            "firebase_net": ledger.net_from_legs({k: ledger.leg_from_trade(v) for k, v in opens.items()}),
+            "legs": {k: {"action": w["action"], "qty": w["qty"], "price": w["price"], "entry": _iso(w["ms"])}
+                     for k, w in target.items()},
+            "shortfall": sum(w["qty"] for k, w in target.items() if k.startswith(SYNTHETIC_PREFIX)),
+            "add": sorted(changes["add"]),
+            "resize": {k: list(v) for k, v in changes["resize"].items()},
+            "reprice": {k: list(v) for k, v in changes["reprice"].items()},
+            "remove": sorted(changes["remove"]),
+            "settling": sorted(changes["settling"]),
+        }
+        updates.update(symbol_updates(sym, changes, opens, target, trail, now_ms))
+    sw.lap("diff")
+
+    n_changes = sum(len(r[k]) for r in report.values() for k in ("add", "resize", "reprice", "remove"))
+    for kind in ("add", "resize", "reprice", "remove"):
+        metrics.inc("rebuild_changes", sum(len(r[kind]) for r in report.values()), kind=kind)
+    _print_report(report, dry_run)
+    if updates and not dry_run:
+        db.reference("/").update(updates)
+        print(f"✅ [REBUILD] committed {n_changes} change(s) across {len(report)} symbol(s) "
+              f"in one update ({len(updates)} paths)")
+    elif not n_changes:
+        print(f"✅ [REBUILD] /open_active_trades matches Tiger across {len(report)} symbol(s)")
+    sw.lap("commit")
+    sw.done(outcome="dry_run" if dry_run else ("applied" if n_changes else "clean"))
+    return report
+
+def _print_report(report, dry_run):
+    verb = "would" if dry_run else "will"
+    for sym, r in report.items():
+        changed = r["add"] or r["resize"] or r["reprice"] or r["remove"]
+        flag = "⚠️" if changed or r["broker_net"] != r["firebase_net"] else "✅"
+        print(f"{flag} [REBUILD] {sym}: Tiger net={r['broker_net']}  Firebase net={r['firebase_net']}  "
+              f"rebuilt legs={len(r['legs'])}")
+        for key in r["add"]:
+            leg = r["legs"][key]
+            print(f"    + {verb} add    {key}: {leg['action']} {leg['qty']} @ {leg['price']} ({leg['entry']})")
+        for key, (old, new) in r["resize"].items():
+            print(f"    ~ {verb} resize {key}: {old} → {new} contract(s)")
+        for key, (old, new) in r["reprice"].items():
+            print(f"    ~ {verb} reprice {key}: {old} → {new}")
+        for key in r["remove"]:
+            print(f"    - {verb} remove {key} (archived to /zombie_trades_log)")
+        for key in r["settling"]:
+            print(f"    · left alone {key}: younger than {SETTLE_S}s")
+        if r["shortfall"]:
+            print(f"    ! {r['shortfall']} contract(s) older than the fetched history → average-cost leg "
+                  f"(raise --hours to recover real entries)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild /open_active_trades from Tiger positions + executions")
+    parser.add_argument("--symbol", action="append", dest="symbols", metavar="SYM",
+                        help="limit to this symbol (repeatable); default: every symbol on either side")
+    parser.add_argument("--hours", type=float, default=DEFAULT_LOOKBACK_HOURS,
+                        help="execution history to fetch per symbol")
+    parser.add_argument("--dry-run", action="store_true", help="report the diff, write nothing")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON as well")
+    args = parser.parse_args(argv)
+
+    report = rebuild(symbols=args.symbols, lookback_hours=args.hours, dry_run=args.dry_run)
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    metrics.maybe_dump()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
+
+#=========================  REBUILD_OPEN_TRADES (END OF SCRIPT)  ================================
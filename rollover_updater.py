@@ -1,20 +1,7 @@
-import firebase_admin
-from firebase_admin import credentials, db
 from datetime import datetime, timedelta
 import pytz
 import calendar
-import firebase_admin
-import os
-
-# Load Firebase secret key
-firebase_key_path = "/etc/secrets/firebase_key.json" if os.path.exists("/etc/secrets/firebase_key.json") else "firebase_key.json"
-cred = credentials.Certificate(firebase_key_path)
-
-# Initialize Firebase
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred, {
-        'databaseURL': "https://tw2tt-firebase-default-rtdb.asia-southeast1.firebasedatabase.app"
-    })
+from firebase_client import firebase_db as db  # lazy: Admin SDK initializes on the first DB call
 
 # Helpers
 def get_active_contract_suffix():
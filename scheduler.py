@@ -0,0 +1,132 @@
+#=========================  SCHEDULER - FIXED-RATE DEADLINES WITH ADAPTIVE INTERVALS  ================================
+# Replaces `work(); time.sleep(N)` in the loop processes. Each task runs on a fixed-rate deadline
+# (deadline += interval, not "after the work, sleep N"), so the period no longer drifts by however
+# long Tiger/Firebase took.
+#
+# Interval per cycle (the task function returns True when there is something to watch):
+#   "active" — the task reported open legs / pending exit tickets   (tight: react fast)
+#   "idle"   — flat, market open                                    (relaxed)
+#   "closed" — CME Globex closed (daily break / weekend)            (very relaxed)
+#
+# Overrun (work took longer than the slot):
+#   policy="skip"     → drop the missed slots, next deadline stays on the original grid
+#   policy="catch_up" → run back-to-back for up to max_catch_up missed slots, then drop the rest
+# Both are deterministic (pure function of start deadline, interval and run durations) and
+# reported through metrics: task_runtime_seconds, task_overruns_total, task_skipped_slots_total.
+import heapq
+import time
+from datetime import datetime, timezone
+
+import metrics
+
+# ====================================================
+# 🟩 Market hours (CME Globex futures, America/New_York)
+# ====================================================
+GLOBEX_TZ = "America/New_York"
+GLOBEX_BREAK_START_H = 17   # daily maintenance break 17:00–18:00 ET
+GLOBEX_REOPEN_H = 18
+
+def market_open(now_utc=None) -> bool:
+    """Globex: Sun 18:00 ET → Fri 17:00 ET, with a daily 17:00–18:00 ET break (pytz handles DST)."""
+    import pytz
+
+    now_utc = now_utc or datetime.now(timezone.utc)
+    et = now_utc.astimezone(pytz.timezone(GLOBEX_TZ))
+    wd, h = et.weekday(), et.hour   # Mon=0 … Sun=6
+    if wd == 5:                                   # Saturday
+        return False
+    if wd == 6:                                   # Sunday: opens 18:00
+        return h >= GLOBEX_REOPEN_H
+    if wd == 4 and h >= GLOBEX_BREAK_START_H:     # Friday close
+        return False
+    return not (GLOBEX_BREAK_START_H <= h < GLOBEX_REOPEN_H)
+
+# ====================================================
+# 🟩 Task
+# ====================================================
+class Task:
+    """One periodic job. `fn()` returns truthy when the task is 'active' (tight interval)."""
+
+    def __init__(self, name, fn, active_s, idle_s, closed_s=None, policy="skip", max_catch_up=2):
+        if policy not in ("skip", "catch_up"):
+            raise ValueError(f"unknown overrun policy: {policy}")
+        self.name = name
+        self.fn = fn
+        self.intervals = {"active": float(active_s), "idle": float(idle_s),
+                          "closed": float(closed_s if closed_s is not None else idle_s)}
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.deadline = None      # monotonic time of the next run
+        self.active = True        # start tight until the first cycle says otherwise
+        self.backlog = 0          # catch_up: missed slots still owed
+        self.mode = "active"
+
+    def interval_for(self, is_open) -> float:
+        self.mode = "closed" if not is_open else ("active" if self.active else "idle")
+        return self.intervals[self.mode]
+
+    def run(self, now, is_open=True, clock=time.monotonic):
+        """Run once at `now` (its deadline) and schedule the next deadline. Returns the runtime (s)."""
+        if self.deadline is None:
+            self.deadline = now
+        t0 = clock()
+        try:
+            result = self.fn()
+            if result is not None:
+                self.active = bool(result)
+        except Exception as e:
+            # keep the previous activity state: an erroring cycle should not relax the interval
+            print(f"❌ [{self.name}] task error: {e}")
+        runtime = clock() - t0
+        metrics.observe("task_runtime_seconds", runtime, task=self.name)
+
+        interval = self.interval_for(is_open)
+        self.deadline = self._next_deadline(self.deadline, interval, t0 + runtime)
+        return runtime
+
+    def _next_deadline(self, deadline, interval, finished_at):
+        nxt = deadline + interval
+        if finished_at <= nxt:
+            if self.backlog and self.policy == "catch_up":
+                self.backlog -= 1
+                return finished_at          # owed slot: run immediately
+            return nxt
+
+        missed = int((finished_at - nxt) // interval) + 1
+        metrics.inc("task_overruns", task=self.name)
+        print(f"⏱️ [{self.name}] overran its {interval:.0f}s slot by {finished_at - nxt:.2f}s "
+              f"({missed} slot(s) missed, policy={self.policy})")
+
+        if self.policy == "catch_up":
+            owed = min(self.max_catch_up, self.backlog + missed)
+            dropped = self.backlog + missed - owed
+            self.backlog = max(0, owed - 1)
+            if dropped:
+                metrics.inc("task_skipped_slots", dropped, task=self.name)
+            return finished_at if owed else nxt + missed * interval
+
+        metrics.inc("task_skipped_slots", missed, task=self.name)
+        return nxt + missed * interval     # stay on the original grid
+
+# ====================================================
+# 🟩 Scheduler
+# ====================================================
+def run_forever(tasks, title="scheduler", clock=time.monotonic, sleep=time.sleep, market_clock=None):
+    """
+    Single-threaded: always run the task with the earliest deadline, sleep until then otherwise.
+    `market_clock()` → bool (defaults to market_open()) is evaluated once per task run.
+    """
+    market_clock = market_clock or market_open
+    now = clock()
+    heap = [(now, i, t) for i, t in enumerate(tasks)]
+    heapq.heapify(heap)
+    while True:
+        deadline, i, task = heapq.heappop(heap)
+        wait = deadline - clock()
+        if wait > 0:
+            sleep(wait)
+        task.run(deadline, is_open=market_clock(), clock=clock)
+        heapq.heappush(heap, (task.deadline, i, task))
+        metrics.maybe_dump(title)
+
+#=========================  SCHEDULER (END OF SCRIPT)  ================================
@@ -0,0 +1,140 @@
+#=========================  SESSION_CALENDAR - PRECOMPUTED SESSION-GUARD WINDOWS  ================================
+# /settings/session_guards (tokyo / new_york / london: start_local, duration_min, tz, enabled) is
+# turned into a sorted list of UTC [start, end] intervals covering yesterday … +HORIZON_DAYS, built
+# with per-day pytz localization (so DST shifts land on the right day). "Which guard is active at t"
+# is then a bisect over the interval starts — no timezone math on the hot path.
+#
+# The config is cached: re-read at most every CONFIG_TTL_S via an ETag check (get_if_changed), and
+# the calendar is rebuilt only when the config actually changed or the horizon runs out.
+# Shared by app.webhook (entry block) and monitor_trades (auto-flatten at window open).
+import bisect
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+SESSION_ORDER = ("tokyo", "new_york", "london")   # priority when windows overlap
+HORIZON_DAYS = 7
+CONFIG_TTL_S = 30.0
+CONFIG_PATH = "/settings/session_guards"
+
+def _local_start_utc(tz, day, start_hhmm):
+    """UTC instant of local `start_hhmm` on local date `day` (pytz picks the right offset for that date)."""
+    try:
+        hh, mm = map(int, (start_hhmm or "00:00").split(":"))
+    except Exception:
+        hh, mm = 0, 0
+    naive = datetime(day.year, day.month, day.day, hh, mm)
+    return tz.localize(naive).astimezone(timezone.utc)
+
+class SessionCalendar:
+    """Immutable set of guard windows for [from_utc - 1 day, from_utc + days]."""
+
+    def __init__(self, cfg, from_utc=None, days=HORIZON_DAYS):
+        import pytz
+
+        from_utc = from_utc or datetime.now(timezone.utc)
+        self.enabled = bool(cfg and cfg.get("enabled", False))
+        windows = []
+        if self.enabled:
+            for prio, name in enumerate(SESSION_ORDER):
+                s = cfg.get(name) or {}
+                if not s.get("enabled", False):
+                    continue
+                dur = int(s.get("duration_min", 0) or 0)
+                if dur <= 0:
+                    continue
+                tz = pytz.timezone(s.get("tz") or "UTC")
+                local_today = from_utc.astimezone(tz).date()
+                for offset in range(-1, days + 1):
+                    start = _local_start_utc(tz, local_today + timedelta(days=offset), s.get("start_local", "00:00"))
+                    windows.append((start.timestamp(), (start + timedelta(minutes=dur)).timestamp(), prio, name))
+        windows.sort()
+        self.windows = windows
+        self.starts = [w[0] for w in windows]
+        self.max_len = max((w[1] - w[0] for w in windows), default=0.0)
+        self.valid_from = (from_utc - timedelta(days=1)).timestamp()
+        self.valid_until = (from_utc + timedelta(days=days)).timestamp()
+
+    def active_at(self, now_utc):
+        """Guard active at `now_utc` (start <= t <= end, inclusive like before) or None."""
+        t = now_utc.timestamp()
+        i = bisect.bisect_right(self.starts, t)
+        best = None
+        # only windows starting within max_len before t can still be open
+        while i > 0 and self.windows[i - 1][0] >= t - self.max_len:
+            i -= 1
+            start, end, prio, name = self.windows[i]
+            if t <= end and (best is None or prio < best[2]):
+                best = self.windows[i]
+        if best is None:
+            return None
+        return {
+            "session": best[3],
+            "start_utc": datetime.fromtimestamp(best[0], timezone.utc).isoformat(),
+            "end_utc": datetime.fromtimestamp(best[1], timezone.utc).isoformat(),
+        }
+
+class SessionGuardService:
+    """Config cache + calendar for one Firebase handle. Thread-safe; one per process."""
+
+    def __init__(self, firebase_db, ttl_s=CONFIG_TTL_S):
+        self.firebase_db = firebase_db
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._cfg = None
+        self._etag = None
+        self._next_check = 0.0
+        self._calendar = None
+
+    def _refresh_config(self):
+        ref = self.firebase_db.reference(CONFIG_PATH)
+        if self._etag is None:
+            cfg, etag = ref.get(etag=True)
+            return True, cfg or {}, etag
+        changed, cfg, etag = ref.get_if_changed(self._etag)
+        return changed, (cfg or {}) if changed else self._cfg, etag
+
+    def calendar(self, now_utc):
+        with self._lock:
+            mono = time.monotonic()
+            changed = False
+            if mono >= self._next_check:
+                self._next_check = mono + self.ttl_s
+                try:
+                    changed, cfg, etag = self._refresh_config()
+                    if changed:
+                        self._cfg, self._etag = cfg, etag
+                except Exception as e:
+                    print(f"⚠️ [SESSION] config refresh failed softly: {e}")
+                    if self._cfg is None:
+                        self._cfg = {}
+            t = now_utc.timestamp()
+            if (changed or self._calendar is None
+                    or t < self._calendar.valid_from or t >= self._calendar.valid_until - 86400):
+                self._calendar = SessionCalendar(self._cfg or {}, from_utc=now_utc)
+            return self._calendar
+
+    def active(self, now_utc=None):
+        now_utc = now_utc or datetime.now(timezone.utc)
+        return self.calendar(now_utc).active_at(now_utc)
+
+    def invalidate(self):
+        with self._lock:
+            self._next_check = 0.0
+            self._etag = None
+
+_services = {}
+_services_lock = threading.Lock()
+
+def service_for(firebase_db):
+    with _services_lock:
+        svc = _services.get(id(firebase_db))
+        if svc is None:
+            svc = _services[id(firebase_db)] = SessionGuardService(firebase_db)
+        return svc
+
+def active_guard(firebase_db, now_utc=None):
+    """{'session','start_utc','end_utc'} if inside an enabled guard window, else None."""
+    return service_for(firebase_db).active(now_utc)
+
+#=========================  SESSION_CALENDAR (END OF SCRIPT)  ================================
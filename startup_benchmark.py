@@ -0,0 +1,94 @@
+#=========================  STARTUP_BENCHMARK - IMPORT-TIME BUDGETS PER ENTRY POINT  ================================
+# Cold-start guard for the Render workers: every entry module is imported in a fresh
+# interpreter under `python -X importtime`, and the cumulative import time is checked
+# against a budget. Nothing here touches Firebase or Tiger — entry modules must stay
+# import-clean (all clients are lazy: firebase_client / tiger_client).
+#
+#   python startup_benchmark.py              # table + exit 1 if any module is over budget
+#   python startup_benchmark.py --runs 5     # best-of-5 per module
+#   python startup_benchmark.py --top 10     # also list the 10 slowest imports per module
+import argparse
+import os
+import subprocess
+import sys
+
+# Budgets in milliseconds (cumulative, best-of-N, warm disk cache)
+IMPORT_BUDGETS_MS = {
+    "app":                             400,
+    "monitor_trades_loop":             100,
+    "push_orders_to_firebase":          80,
+    "push_live_positions_to_firebase":  80,
+    "execute_trade_live":               50,
+    "fifo_close":                       80,
+}
+
+def _parse_importtime(stderr: str):
+    """
+    Parse `-X importtime` lines: 'import time: self [us] | cumulative | imported package'.
+    Returns [(module_name, self_us, cumulative_us)] in report order.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            _, rest = line.split(":", 1)
+            self_us, cum_us, name = rest.split("|", 2)
+            rows.append((name.rstrip(), int(self_us), int(cum_us)))
+        except ValueError:
+            continue
+    return rows
+
+def measure(module: str):
+    """Import `module` once in a fresh interpreter. Returns (total_ms, rows) or raises on import failure."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="0")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+    )
+    if proc.returncode != 0:
+        tail = (proc.stderr.strip().splitlines() or ["?"])[-1]
+        raise RuntimeError(f"import {module} failed: {tail}")
+    rows = _parse_importtime(proc.stderr)
+    top = [r for r in rows if r[0].strip() == module]
+    total_us = top[-1][2] if top else sum(r[1] for r in rows)
+    return total_us / 1000.0, rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Import-time budget check for entry modules")
+    ap.add_argument("modules", nargs="*", help="subset of modules (default: all budgeted)")
+    ap.add_argument("--runs", type=int, default=3, help="best-of-N runs per module")
+    ap.add_argument("--top", type=int, default=0, help="list the N slowest imports (cumulative) per module")
+    args = ap.parse_args(argv)
+
+    modules = args.modules or list(IMPORT_BUDGETS_MS)
+    over = []
+    print(f"{'module':34} {'best ms':>9} {'budget':>8}  status")
+    for mod in modules:
+        budget = IMPORT_BUDGETS_MS.get(mod)
+        try:
+            results = [measure(mod) for _ in range(max(1, args.runs))]
+        except Exception as e:
+            print(f"{mod:34} {'-':>9} {budget or '-':>8}  ❌ {e}")
+            over.append(mod)
+            continue
+
+        best_ms, rows = min(results, key=lambda r: r[0])
+        ok = budget is None or best_ms <= budget
+        print(f"{mod:34} {best_ms:9.1f} {budget or '-':>8}  {'✅' if ok else '❌ over budget'}")
+        if not ok:
+            over.append(mod)
+        if args.top:
+            for name, _self, cum in sorted(rows, key=lambda r: -r[2])[:args.top]:
+                print(f"    {cum / 1000.0:8.1f} ms  {name.strip()}")
+
+    if over:
+        print(f"\n❌ Over budget / failed: {', '.join(over)}")
+        return 1
+    print("\n✅ All entry modules within import budget")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#=========================  STARTUP_BENCHMARK (END OF SCRIPT)  ================================
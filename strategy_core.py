@@ -0,0 +1,207 @@
+#=========================  STRATEGY_CORE - PURE TRADING RULES (NO I/O)  ================================
+# Single home for the rules shared by the live loops and the offline backtest:
+#   - ATR proxy + adaptive trail sizing   (monitor_trades_loop.process_trailing_tp_and_exits)
+#   - trailing TP arm / peak / exit        (monitor_trades_loop.process_trailing_tp_and_exits)
+#   - AnchorGate sticky unlock             (monitor_trades_loop.monitor_trades)
+#   - entry gate assignment                (app.webhook)
+#   - FIFO exit allocation                 (fifo_close.handle_exit_fill_from_tx, backtest)
+#   - FIFO legs from broker fills          (rebuild_open_trades)
+# Nothing in here touches Firebase, Tiger, Sheets or the clock.
+
+# ====================================================
+# 🟩 Default knobs (live values; backtests override per config)
+# ====================================================
+DEFAULT_TRAIL_PARAMS = {
+    "atr_alpha":         0.35,   # smoothing speed (higher = faster reaction)
+    "atr_trigger_mult":  0.60,   # trigger = 0.6 × ATR proxy
+    "atr_offset_mult":   0.20,   # offset = 0.2 × ATR proxy
+    "min_trigger_floor": 3.0,
+    "min_offset_floor":  1.0,
+    "max_trigger_cap":   10.0,
+    "max_offset_cap":    4.0,
+}
+
+# ====================================================
+# 🟩 ATR proxy + adaptive trail sizing
+# ====================================================
+def atr_proxy_update(prev, current_price, entry, ema50, alpha):
+    """
+    EMA of |price − ema50| (or |price − entry| when no ema50 is known).
+    prev=None seeds the EMA with the first raw range. Returns the new smoothed value.
+    """
+    raw_range = abs(current_price - ema50) if ema50 is not None else abs(current_price - entry)
+    if prev is None:
+        prev = raw_range
+    return (alpha * raw_range) + ((1.0 - alpha) * prev)
+
+def adaptive_trail(smoothed, params=None):
+    """Map the ATR proxy to (trigger_pts, offset_pts) with floors and caps applied."""
+    p = params or DEFAULT_TRAIL_PARAMS
+    trigger = max(p["min_trigger_floor"], min(p["max_trigger_cap"], p["atr_trigger_mult"] * smoothed))
+    offset  = max(p["min_offset_floor"],  min(p["max_offset_cap"],  p["atr_offset_mult"]  * smoothed))
+    return trigger, offset
+
+def trigger_price_for(entry, direction, trigger_pts):
+    return (entry + trigger_pts) if direction == 1 else (entry - trigger_pts)
+
+def stop_price_for(peak, direction, offset_pts):
+    return (peak - offset_pts) if direction == 1 else (peak + offset_pts)
+
+# ====================================================
+# 🟩 Trailing TP state machine (one leg, one price sample)
+# ====================================================
+def trail_step(trade, current_price, trigger_pts, offset_pts):
+    """
+    Advance a leg's trailing state by one price sample. Mutates only the in-memory
+    `trade` dict (trail_hit / trail_peak / trail_stop_price / trail_offset) and
+    returns what happened so the caller can mirror it to storage:
+      {"armed": bool, "peak_moved": bool, "exit": bool, "trigger_price": float}
+    """
+    entry = float(trade["filled_price"])
+    direction = 1 if (trade.get("action") or "").upper() == "BUY" else -1
+    events = {"armed": False, "peak_moved": False, "exit": False,
+              "trigger_price": trigger_price_for(entry, direction, trigger_pts)}
+
+    # ---- Trigger arming (first time only) ----
+    if not trade.get("trail_hit"):
+        trade["trail_peak"] = entry
+        tp = events["trigger_price"]
+        if (direction == 1 and current_price >= tp) or (direction == -1 and current_price <= tp):
+            trade["trail_hit"] = True
+            trade["trail_peak"] = current_price
+            trade["trail_stop_price"] = stop_price_for(current_price, direction, float(offset_pts))
+            events["armed"] = True
+
+    # ---- Trail peak update + exit check ----
+    if trade.get("trail_hit"):
+        prev_peak = trade.get("trail_peak", entry)
+        new_peak = max(prev_peak, current_price) if direction == 1 else min(prev_peak, current_price)
+        if new_peak != prev_peak:
+            trade["trail_peak"] = new_peak
+            trade["trail_stop_price"] = stop_price_for(new_peak, direction, float(offset_pts))
+            events["peak_moved"] = True
+        trade["trail_offset"] = float(offset_pts)
+        events["exit"] = (
+            (direction == 1 and current_price <= trade["trail_peak"] - float(offset_pts)) or
+            (direction == -1 and current_price >= trade["trail_peak"] + float(offset_pts))
+        )
+    return events
+
+# ====================================================
+# 🟩 Entry gate assignment (webhook)
+# ====================================================
+def entry_gate_state(action, filled_price, trigger_points, offset_points, anchor=None):
+    """
+    Decide whether a new leg is PARKED behind the current same-direction anchor.
+    Returns (gate_state, anchor_gate_price or None).
+    """
+    if not anchor:
+        return "UNLOCKED", None
+    anchor_entry = float(anchor.get("filled_price"))
+    anchor_peak  = float(anchor.get("trail_peak", anchor_entry))
+    fill = filled_price or 0.0
+    if (action or "").upper() == "BUY":
+        anchor_gate = max(anchor_entry + (trigger_points - offset_points), anchor_peak - offset_points)
+        if fill + trigger_points < anchor_gate:
+            return "PARKED", anchor_gate
+    else:
+        anchor_gate = min(anchor_entry - (trigger_points - offset_points), anchor_peak + offset_points)
+        if fill - trigger_points > anchor_gate:
+            return "PARKED", anchor_gate
+    return "UNLOCKED", None
+
+# ====================================================
+# 🟩 AnchorGate sticky unlock (monitor loop)
+# ====================================================
+def unrealized_points(side, entry, price):
+    return (float(price) - entry) if (side or "BUY").upper() == "BUY" else (entry - float(price))
+
+def apply_anchor_gate(active_trades, anchor, unreal_pts, unlock_pts, sticky, handoff_active):
+    """
+    Sticky unlock: once the anchor is up >= unlock_pts it stays unlocked until the next
+    anchor handoff. Mutates the in-memory trade dicts (gate_state / skip_tp_trailing /
+    anchor_order_id) and returns (sticky, gate_updates[(order_id, {"gate_state": ...})]).
+    """
+    if (unreal_pts >= unlock_pts) and not handoff_active:
+        sticky = True
+
+    anchor_id = anchor.get("order_id")
+    gate_updates = []
+    for t in active_trades:
+        if t is anchor:
+            if t.get("gate_state") != "UNLOCKED":
+                t["gate_state"] = "UNLOCKED"
+                gate_updates.append((t.get("order_id"), {"gate_state": "UNLOCKED"}))
+            t["anchor_order_id"] = anchor_id
+            continue
+
+        was = t.get("gate_state", "PARKED")
+        t["anchor_order_id"] = anchor_id
+        if sticky and not handoff_active:
+            # followers may arm TP/trailing
+            t["gate_state"] = "UNLOCKED"
+            t.pop("skip_tp_trailing", None)
+            if was != "UNLOCKED":
+                gate_updates.append((t.get("order_id"), {"gate_state": "UNLOCKED"}))
+        else:
+            # parked until sticky unlock
+            t["gate_state"] = "PARKED"
+            t["skip_tp_trailing"] = True
+            if was != "PARKED":
+                gate_updates.append((t.get("order_id"), {"gate_state": "PARKED"}))
+    return sticky, gate_updates
+
+def gated(active_trades):
+    """Trades allowed into trailing/TP processing (parked followers are skipped)."""
+    return [t for t in active_trades if not (t.get("gate_state") == "PARKED" and t.get("skip_tp_trailing"))]
+
+# ====================================================
+# 🟩 FIFO allocation
+# ====================================================
+def leg_remaining(leg):
+    """Contracts still open on a leg (contracts_remaining, else its quantity, else 1)."""
+    rem = leg.get("contracts_remaining")
+    return int(rem) if rem is not None else int(leg.get("quantity") or 1)
+
+def fifo_allocate(entries, opens, qty, first=None):
+    """
+    Match an exit of `qty` contracts against the FIFO book: entries sorted oldest first, opens {order_id: leg}.
+    `first` (a leg the exit is known to close, e.g. a broker exit child's parent) is consumed before the
+    head. Returns [(order_id, contracts_taken)]; a shortfall (book smaller than qty) is left unallocated.
+    """
+    order = [oid for oid, _dt in entries]
+    if first in opens:
+        order = [first] + [oid for oid in order if oid != first]
+    out, left = [], int(qty)
+    for oid in order:
+        if left <= 0:
+            break
+        tr = opens.get(oid, {})
+        if tr.get("exited"):
+            continue
+        take = min(left, leg_remaining(tr))
+        if take > 0:
+            out.append((oid, take))
+            left -= take
+    return out
+
+def fifo_open_lots(fills, net):
+    """
+    The lots a FIFO book still holds when the broker reports signed `net`: exits always consume the oldest
+    lots, so what survives is the newest fills on the side of `net` (the oldest of them possibly partly).
+    `fills` are {"action", "qty", "ms", ...}. Returns ([(fill, open_qty)] oldest first, shortfall) where
+    shortfall > 0 means the fills ran out before |net| was covered.
+    """
+    side = "BUY" if net > 0 else "SELL"
+    left, lots = abs(int(net)), []
+    for f in sorted(fills, key=lambda f: f["ms"], reverse=True):
+        if left <= 0:
+            break
+        if f["action"] != side:
+            continue
+        take = min(left, int(f["qty"]))
+        lots.append((f, take))
+        left -= take
+    return lots[::-1], left
+
+#=========================  STRATEGY_CORE (END OF SCRIPT)  ================================
@@ -0,0 +1,191 @@
+#=========================  TICK_BUFFER - PER-SYMBOL TICK RING + INCREMENTAL INDICATORS  ================================
+# Fed by every `price_update` webhook (app.perform_price_update). Per symbol:
+#   - fixed-size NumPy ring of (ts, price, volume) ticks   → window(seconds) for vectorized look-backs
+#   - O(1) incremental indicators, updated per tick:
+#       ema<N>  EMA of bar closes (BAR_SECONDS bars) + live value including the forming bar
+#       tr/atr  true range per closed bar, Wilder ATR(ATR_PERIOD); seeded from intrabar range until bars close
+#       vwap    session VWAP (volume-weighted; tick-weighted when alerts carry no volume),
+#               reset at the Globex session roll (VWAP_RESET_HOUR_UTC)
+# app.py publishes snapshot() into /live_prices/{symbol} with the price, so the monitor's
+# trailing engine reads tick-resolution ema50/atr instead of a 10-second single-sample proxy.
+#
+# State is per process: run the webhook with one worker (or sticky routing) so every tick lands here.
+import threading
+import time
+
+import numpy as np
+
+RING_CAPACITY = 4096
+BAR_SECONDS = 60
+EMA_PERIODS = (9, 20, 50)
+ATR_PERIOD = 14
+VWAP_RESET_HOUR_UTC = 22   # 17:00/18:00 ET Globex roll ≈ 22:00 UTC
+
+TICK_DTYPE = np.dtype([("ts", "f8"), ("price", "f8"), ("volume", "f8")])
+
+class TickRing:
+    """Fixed-capacity ring of ticks; push is O(1), reads return chronological copies."""
+    __slots__ = ("buf", "head", "count")
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self.buf = np.zeros(capacity, dtype=TICK_DTYPE)
+        self.head = 0      # next write slot
+        self.count = 0
+
+    def push(self, ts, price, volume=0.0):
+        self.buf[self.head] = (ts, price, volume)
+        self.head = (self.head + 1) % len(self.buf)
+        if self.count < len(self.buf):
+            self.count += 1
+
+    def ordered(self):
+        if self.count < len(self.buf):
+            return self.buf[:self.count].copy()
+        return np.concatenate((self.buf[self.head:], self.buf[:self.head]))
+
+    def window(self, seconds, now=None):
+        """Ticks from the last `seconds` (chronological structured array)."""
+        ticks = self.ordered()
+        if not len(ticks):
+            return ticks
+        cutoff = (now if now is not None else ticks["ts"][-1]) - seconds
+        return ticks[np.searchsorted(ticks["ts"], cutoff, side="left"):]
+
+class IndicatorState:
+    """Incremental bar/EMA/ATR/VWAP state for one symbol. Every update is O(1)."""
+
+    def __init__(self, ema_periods=EMA_PERIODS, atr_period=ATR_PERIOD, bar_seconds=BAR_SECONDS):
+        self.bar_seconds = bar_seconds
+        self.alphas = {n: 2.0 / (n + 1.0) for n in ema_periods}
+        self.atr_period = atr_period
+        self.ema = {n: None for n in ema_periods}      # over closed bars
+        self.atr = None
+        self.last_tr = None
+        self.prev_close = None                          # close of the last closed bar
+        self.bar_id = None
+        self.bar_open = self.bar_high = self.bar_low = self.bar_close = None
+        self.vwap_session = None
+        self.pv = 0.0
+        self.vol = 0.0
+        self.last_price = None
+        self.last_ts = None
+        self.ticks = 0
+
+    def seed(self, ema=None, atr=None):
+        """Warm start from previously published values (e.g. /live_prices after a restart)."""
+        for n, v in (ema or {}).items():
+            if n in self.ema and v is not None and self.ema[n] is None:
+                self.ema[n] = float(v)
+        if atr is not None and self.atr is None:
+            self.atr = float(atr)
+
+    def _close_bar(self):
+        close = self.bar_close
+        for n, a in self.alphas.items():
+            prev = self.ema[n]
+            self.ema[n] = close if prev is None else prev + a * (close - prev)
+        ref = self.prev_close if self.prev_close is not None else self.bar_open
+        tr = max(self.bar_high, ref) - min(self.bar_low, ref)
+        self.last_tr = tr
+        self.atr = tr if self.atr is None else self.atr + (tr - self.atr) / self.atr_period
+        self.prev_close = close
+
+    def update(self, ts, price, volume=0.0):
+        bar_id = int(ts // self.bar_seconds)
+        if self.bar_id is None or bar_id != self.bar_id:
+            if self.bar_id is not None:
+                self._close_bar()
+            self.bar_id = bar_id
+            self.bar_open = self.bar_high = self.bar_low = self.bar_close = price
+        else:
+            self.bar_high = max(self.bar_high, price)
+            self.bar_low = min(self.bar_low, price)
+            self.bar_close = price
+
+        session = int((ts - VWAP_RESET_HOUR_UTC * 3600) // 86400)
+        if session != self.vwap_session:
+            self.vwap_session, self.pv, self.vol = session, 0.0, 0.0
+        w = volume if volume and volume > 0 else 1.0
+        self.pv += price * w
+        self.vol += w
+
+        self.last_price, self.last_ts = price, ts
+        self.ticks += 1
+
+    def ema_live(self, n):
+        """EMA including the forming bar's current close (what a chart shows intrabar)."""
+        prev = self.ema.get(n)
+        if self.bar_close is None:
+            return prev
+        return self.bar_close if prev is None else prev + self.alphas[n] * (self.bar_close - prev)
+
+    def atr_live(self):
+        """Closed-bar ATR; before the first bar closes, the forming bar's range (never 0 after 2 ticks)."""
+        if self.atr is not None:
+            return self.atr
+        if self.bar_high is None:
+            return None
+        return self.bar_high - self.bar_low
+
+    def vwap(self):
+        return (self.pv / self.vol) if self.vol else None
+
+class TickBook:
+    """symbol → (TickRing, IndicatorState); thread-safe for the webhook's worker threads."""
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._rings = {}
+        self._state = {}
+
+    def has(self, symbol):
+        return symbol in self._state
+
+    def seed(self, symbol, ema=None, atr=None):
+        with self._lock:
+            self._ensure(symbol).seed(ema=ema, atr=atr)
+
+    def _ensure(self, symbol):
+        st = self._state.get(symbol)
+        if st is None:
+            st = self._state[symbol] = IndicatorState()
+            self._rings[symbol] = TickRing(self.capacity)
+        return st
+
+    def on_price(self, symbol, price, ts=None, volume=0.0):
+        ts = time.time() if ts is None else float(ts)
+        price = float(price)
+        with self._lock:
+            st = self._ensure(symbol)
+            self._rings[symbol].push(ts, price, volume or 0.0)
+            st.update(ts, price, volume or 0.0)
+            return self._snapshot(symbol, st)
+
+    def _snapshot(self, symbol, st):
+        snap = {f"ema{n}": _round(st.ema_live(n)) for n in st.ema}
+        snap.update({
+            "atr": _round(st.atr_live()),
+            "tr": _round(st.last_tr),
+            "vwap": _round(st.vwap()),
+            "ticks": st.ticks,
+            "bar_seconds": st.bar_seconds,
+        })
+        return snap
+
+    def snapshot(self, symbol):
+        with self._lock:
+            st = self._state.get(symbol)
+            return self._snapshot(symbol, st) if st else None
+
+    def window(self, symbol, seconds):
+        with self._lock:
+            ring = self._rings.get(symbol)
+            return ring.window(seconds) if ring else np.zeros(0, dtype=TICK_DTYPE)
+
+def _round(v, nd=4):
+    return None if v is None else round(float(v), nd)
+
+book = TickBook()
+
+#=========================  TICK_BUFFER (END OF SCRIPT)  ================================
@@ -0,0 +1,210 @@
+#=========================  TIGER_CLIENT - LAZY, SHARED TRADE CLIENT (RATE-LIMITED GATEWAY)  ================================
+# get_client() is the only way the bridge reaches Tiger. The client it returns is a gateway around TradeClient:
+#
+#   token bucket per endpoint   calls wait for a token instead of tripping Tiger's per-minute limits
+#                               (RATE_LIMITS {op: (calls per minute, burst)}; TIGER_RATE_LIMITS JSON overrides)
+#   single-flight (reads)       concurrent identical read calls share one request
+#   read cache (reads)          identical read calls within TIGER_READ_TTL_S reuse the response; any write
+#                               (place/cancel/modify) clears it so nothing stale follows our own orders
+#
+# Metrics: tiger_seconds{op}, tiger_throttled{op} + tiger_throttle_seconds{op}, tiger_coalesced{op},
+# tiger_cache_hits{op}. Limits are per process; app, monitor and push_orders each hold their own buckets.
+import json
+import os
+import threading
+import time
+
+import metrics
+
+# your Tiger Trade account number
+ACCOUNT = "21807597867063647"
+
+# "sim" swaps TradeClient for fake_tiger.SimBroker (local broker simulator, no network)
+TIGER_BACKEND = os.getenv("TIGER_BACKEND", "tiger").strip().lower()
+
+READ_OPS = frozenset({"get_orders", "get_order", "get_open_orders", "get_filled_orders", "get_cancelled_orders",
+                      "get_transactions", "get_positions", "get_assets", "get_prime_assets", "get_contract",
+                      "get_contracts"})
+WRITE_OPS = frozenset({"place_order", "cancel_order", "modify_order"})
+READ_TTL_S = float(os.getenv("TIGER_READ_TTL_S", "1.0"))
+MAX_CACHED = 256
+RATE_LIMITS = {                 # Tiger OpenAPI tiers: trading 120/min, order/position queries 60/min
+    "place_order": (120, 10), "cancel_order": (120, 10), "modify_order": (120, 10),
+    "get_orders": (60, 5), "get_order": (60, 5), "get_open_orders": (60, 5), "get_filled_orders": (60, 5),
+    "get_cancelled_orders": (60, 5), "get_transactions": (60, 5), "get_positions": (60, 5),
+    "get_assets": (60, 5), "get_prime_assets": (60, 5),
+}
+DEFAULT_RATE_LIMIT = (10, 2)    # anything else (contract lookups, account info)
+RATE_LIMITS.update({k: tuple(v) for k, v in json.loads(os.getenv("TIGER_RATE_LIMITS") or "{}").items()})
+
+_client = None
+
+# ===================================
+# 🟩 TIGER API CLIENT INIT (RUN ONCE, ON FIRST USE)
+# ===================================
+def get_client():
+    """
+    Build the TradeClient on first use and reuse it afterwards.
+    Raises on bad config instead of exiting, so importers never die at import time.
+    """
+    global _client
+    if _client is None and TIGER_BACKEND == "sim":
+        from fake_tiger import SimBroker
+        _client = _Gateway(SimBroker(account=ACCOUNT))
+        print("🧪 Tiger simulator client initialized (TIGER_BACKEND=sim)")
+    if _client is None:
+        from tigeropen.tiger_open_config import TigerOpenClientConfig
+        from tigeropen.trade.trade_client import TradeClient
+
+        config = TigerOpenClientConfig()  # Locked: do not modify config loading
+        config.env = 'PROD'
+        config.language = 'en_US'
+
+        if not config.account:
+            raise ValueError("Tiger config loaded but account is missing or blank.")
+
+        _client = _Gateway(TradeClient(config))
+        print("✅ Tiger API client initialized successfully")
+    return _client
+
+class _TimedClient:
+    """TradeClient wrapper: every API method call is timed into tiger_seconds{op}."""
+    __slots__ = ("_client",)
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def timed(*args, **kwargs):
+            with metrics.timer("tiger_seconds", op=name):
+                return attr(*args, **kwargs)
+        return timed
+
+class _Bucket:
+    """Token bucket: `per_minute` sustained, `burst` tokens banked."""
+    __slots__ = ("rate", "burst", "tokens", "stamp", "lock")
+
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60.0
+        self.burst = float(max(1, burst))
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """Reserve one token; returns the seconds the caller must wait before using it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= 1.0
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+def _freeze(value):
+    """Hashable request key for args/kwargs (enums, lists, dicts, plain values)."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+class _Gateway(_TimedClient):
+    """_TimedClient + per-endpoint token buckets, single-flight reads and a short-TTL read cache."""
+    __slots__ = ("_lock", "_buckets", "_inflight", "_cache")
+
+    def __init__(self, client):
+        super().__init__(client)
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._inflight = {}
+        self._cache = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def gated(*args, **kwargs):
+            return self._call(name, attr, args, kwargs)
+        return gated
+
+    def _throttle(self, name):
+        with self._lock:
+            bucket = self._buckets.get(name)
+            if bucket is None:
+                bucket = self._buckets[name] = _Bucket(*RATE_LIMITS.get(name, DEFAULT_RATE_LIMIT))
+        wait = bucket.take()
+        if wait > 0:
+            metrics.inc("tiger_throttled", op=name)
+            metrics.observe("tiger_throttle_seconds", wait, op=name)
+            time.sleep(wait)
+
+    def _invoke(self, name, attr, args, kwargs):
+        self._throttle(name)
+        with metrics.timer("tiger_seconds", op=name):
+            return attr(*args, **kwargs)
+
+    def _call(self, name, attr, args, kwargs):
+        if name not in READ_OPS:
+            try:
+                return self._invoke(name, attr, args, kwargs)
+            finally:
+                if name in WRITE_OPS:
+                    with self._lock:
+                        self._cache.clear()
+
+        key = (name, _freeze(args), _freeze(kwargs))
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None and hit[0] > time.monotonic():
+                metrics.inc("tiger_cache_hits", op=name)
+                return hit[1]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+        if not leader:
+            metrics.inc("tiger_coalesced", op=name)
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._invoke(name, attr, args, kwargs)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if flight.error is None and READ_TTL_S > 0:
+                    if len(self._cache) >= MAX_CACHED:
+                        now = time.monotonic()
+                        self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+                    self._cache[key] = (time.monotonic() + READ_TTL_S, flight.result)
+            flight.done.set()
+        return flight.result
+
+def fut_segment():
+    """SegmentType.FUT, imported lazily (tigeropen.common.consts is not free to import)."""
+    from tigeropen.common.consts import SegmentType
+    return SegmentType.FUT
+
+#=========================  TIGER_CLIENT (END OF SCRIPT)  ================================
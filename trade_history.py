@@ -0,0 +1,258 @@
+#=========================  TRADE_HISTORY - LOCAL COLUMNAR STORE  ================================
+import os
+import sys
+from datetime import datetime, timezone
+import numpy as np
+
+# ====================================================
+# 🟩 Storage layout
+# ====================================================
+# One append-only binary file per (symbol, UTC exit day):
+#     trade_history/MGC2510/2025-08-29.bin
+# Each file is a packed array of TRADE_DTYPE records, so a partition loads
+# with a single np.fromfile() and every field is a ready-made NumPy column.
+HISTORY_DIR = os.environ.get("TRADE_HISTORY_DIR", "trade_history")
+
+TRADE_DTYPE = np.dtype([
+    ("symbol",        "S12"),
+    ("entry_oid",     "S24"),
+    ("exit_oid",      "S24"),
+    ("entry_ts_ms",   "<i8"),   # epoch ms UTC
+    ("exit_ts_ms",    "<i8"),   # epoch ms UTC
+    ("side",          "i1"),    # +1 long / -1 short
+    ("qty",           "<i4"),
+    ("entry_px",      "<f8"),
+    ("exit_px",       "<f8"),
+    ("realized_pnl",  "<f8"),   # dollars
+    ("commission",    "<f8"),   # dollars
+    ("net_pnl",       "<f8"),   # dollars
+    ("trail_hit",     "?"),
+    ("trail_peak",    "<f8"),
+    ("trail_trigger", "<f8"),
+    ("trail_offset",  "<f8"),
+    ("entry_reason",  "S24"),
+    ("exit_reason",   "S24"),
+    ("session",       "S12"),
+    ("source",        "S24"),
+])
+
+# Session buckets by UTC hour of ENTRY: (start_hour, name) — last match wins
+SESSION_EDGES_UTC = ((0, "asia"), (7, "london"), (12, "new_york"), (21, "asia"))
+
+# {path: (mtime_ns, size, ndarray)} — a partition is only re-read when it changes
+_partition_cache = {}
+
+# ====================================================
+# 🟩 Helpers
+# ====================================================
+def _to_float(val, default=0.0):
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return default
+
+def _to_bytes(val, width):
+    return str(val or "").encode("utf-8")[:width]
+
+def _epoch_ms(d: datetime) -> int:
+    if d.tzinfo is None:
+        d = d.replace(tzinfo=timezone.utc)
+    return int(d.timestamp() * 1000)
+
+def session_for(entry_utc: datetime) -> str:
+    """Map an entry time to its trading session bucket (asia / london / new_york)."""
+    hour = entry_utc.astimezone(timezone.utc).hour
+    name = SESSION_EDGES_UTC[0][1]
+    for start, label in SESSION_EDGES_UTC:
+        if hour >= start:
+            name = label
+    return name
+
+def _partition_path(symbol: str, day: str) -> str:
+    return os.path.join(HISTORY_DIR, symbol, f"{day}.bin")
+
+# ====================================================
+# 🟩 Write path: append one closed leg (called from the FIFO close)
+# ====================================================
+def build_record(symbol, leg, entry_utc: datetime, exit_utc: datetime):
+    """
+    Build one TRADE_DTYPE record from a closed leg (anchor merged with its close update).
+    `leg` is the dict archived to /archived_trades_log/{symbol}/{oid}, plus
+    'exit_price', 'exit_qty' and 'source' as seen by the FIFO close.
+    """
+    rec = np.zeros(1, dtype=TRADE_DTYPE)
+    r = rec[0]
+    r["symbol"]        = _to_bytes(symbol, 12)
+    r["entry_oid"]     = _to_bytes(leg.get("order_id"), 24)
+    r["exit_oid"]      = _to_bytes(leg.get("exit_order_id"), 24)
+    r["entry_ts_ms"]   = _epoch_ms(entry_utc)
+    r["exit_ts_ms"]    = _epoch_ms(exit_utc)
+    r["side"]          = 1 if (leg.get("action") or "").upper() == "BUY" else -1
+    r["qty"]           = int(_to_float(leg.get("exit_qty"), 1.0) or 1)
+    r["entry_px"]      = _to_float(leg.get("filled_price"))
+    r["exit_px"]       = _to_float(leg.get("exit_price"))
+    r["realized_pnl"]  = _to_float(leg.get("realized_pnl"))
+    r["commission"]    = _to_float(leg.get("tiger_commissions"))
+    r["net_pnl"]       = _to_float(leg.get("net_pnl"))
+    r["trail_hit"]     = bool(leg.get("trail_hit"))
+    r["trail_peak"]    = _to_float(leg.get("trail_peak"), r["entry_px"])
+    r["trail_trigger"] = _to_float(leg.get("trail_trigger"))
+    r["trail_offset"]  = _to_float(leg.get("trail_offset"))
+    r["entry_reason"]  = _to_bytes(leg.get("entry_reason") or leg.get("entryType"), 24)
+    r["exit_reason"]   = _to_bytes(leg.get("exit_reason"), 24)
+    r["session"]       = _to_bytes(session_for(entry_utc), 12)
+    r["source"]        = _to_bytes(leg.get("source"), 24)
+    return rec
+
+def append_closed_trade(symbol, leg, entry_utc: datetime, exit_utc: datetime):
+    """Append one closed leg to its (symbol, exit-day) partition; fsync'd, never rewritten."""
+    rec = build_record(symbol, leg, entry_utc, exit_utc)
+    day = exit_utc.astimezone(timezone.utc).strftime("%Y-%m-%d")
+    path = _partition_path(symbol, day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "ab") as f:
+        # Drop a torn tail record (crash mid-append) first, or every later record lands misaligned
+        size = os.fstat(f.fileno()).st_size
+        if size % TRADE_DTYPE.itemsize:
+            os.ftruncate(f.fileno(), size - size % TRADE_DTYPE.itemsize)
+        f.write(rec.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    return path
+
+# ====================================================
+# 🟩 Read path: cached partition loads
+# ====================================================
+def _load_partition(path):
+    st = os.stat(path)
+    cached = _partition_cache.get(path)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    # Ignore a torn tail record (crash mid-append) instead of failing the whole partition
+    count = st.st_size // TRADE_DTYPE.itemsize
+    arr = np.fromfile(path, dtype=TRADE_DTYPE, count=count)
+    _partition_cache[path] = (st.st_mtime_ns, st.st_size, arr)
+    return arr
+
+def load_history(symbols=None, start_day=None, end_day=None):
+    """
+    Concatenate partitions into one structured array.
+    symbols: iterable of symbols (None = all); start_day/end_day: 'YYYY-MM-DD' inclusive.
+    """
+    if not os.path.isdir(HISTORY_DIR):
+        return np.zeros(0, dtype=TRADE_DTYPE)
+    wanted = set(symbols) if symbols else None
+    parts = []
+    for sym in sorted(os.listdir(HISTORY_DIR)):
+        if wanted is not None and sym not in wanted:
+            continue
+        sym_dir = os.path.join(HISTORY_DIR, sym)
+        if not os.path.isdir(sym_dir):
+            continue
+        for name in sorted(os.listdir(sym_dir)):
+            if not name.endswith(".bin"):
+                continue
+            day = name[:-4]
+            if (start_day and day < start_day) or (end_day and day > end_day):
+                continue
+            parts.append(_load_partition(os.path.join(sym_dir, name)))
+    if not parts:
+        return np.zeros(0, dtype=TRADE_DTYPE)
+    return np.concatenate(parts)
+
+# ====================================================
+# 🟩 Vectorized analytics
+# ====================================================
+def pnl_by(records, field):
+    """
+    Group net P&L by a text column ('exit_reason', 'entry_reason', 'session', 'source', 'symbol').
+    Returns {key: {"trades", "net_pnl", "avg_net_pnl", "win_rate", "commission"}}.
+    """
+    if len(records) == 0:
+        return {}
+    keys, inv = np.unique(records[field], return_inverse=True)
+    net = records["net_pnl"]
+    trades = np.bincount(inv, minlength=len(keys))
+    net_sum = np.bincount(inv, weights=net, minlength=len(keys))
+    wins = np.bincount(inv, weights=(net > 0).astype(np.float64), minlength=len(keys))
+    comm = np.bincount(inv, weights=records["commission"], minlength=len(keys))
+    out = {}
+    for i, key in enumerate(keys):
+        label = key.decode("utf-8") or "(none)"
+        out[label] = {
+            "trades": int(trades[i]),
+            "net_pnl": round(float(net_sum[i]), 2),
+            "avg_net_pnl": round(float(net_sum[i] / trades[i]), 2),
+            "win_rate": round(float(wins[i] / trades[i]), 4),
+            "commission": round(float(comm[i]), 2),
+        }
+    return out
+
+def hold_time_distribution(records, percentiles=(10, 25, 50, 75, 90, 99), bins=None):
+    """Hold time (seconds) percentiles plus a histogram; bins default to 1m/5m/15m/1h/4h/1d edges."""
+    if len(records) == 0:
+        return {"count": 0}
+    hold_s = (records["exit_ts_ms"] - records["entry_ts_ms"]) / 1000.0
+    hold_s = np.abs(hold_s)
+    if bins is None:
+        bins = [0, 60, 300, 900, 3600, 4 * 3600, 24 * 3600, np.inf]
+    counts, edges = np.histogram(hold_s, bins=bins)
+    pct = np.percentile(hold_s, percentiles)
+    return {
+        "count": int(len(hold_s)),
+        "mean_s": round(float(hold_s.mean()), 1),
+        "percentiles_s": {f"p{p}": round(float(v), 1) for p, v in zip(percentiles, pct)},
+        "histogram": [(float(edges[i]), float(edges[i + 1]), int(counts[i])) for i in range(len(counts))],
+    }
+
+def trailing_stop_efficacy(records):
+    """
+    Compare trail-hit exits with the rest, and for trail-hit legs measure how much of the
+    favourable excursion (peak − entry) was actually captured at the exit.
+    """
+    if len(records) == 0:
+        return {}
+    side = records["side"].astype(np.float64)
+    hit = records["trail_hit"]
+    captured_pts = (records["exit_px"] - records["entry_px"]) * side
+    excursion_pts = (records["trail_peak"] - records["entry_px"]) * side
+
+    def _summary(mask):
+        n = int(mask.sum())
+        if n == 0:
+            return {"trades": 0}
+        net = records["net_pnl"][mask]
+        return {
+            "trades": n,
+            "net_pnl": round(float(net.sum()), 2),
+            "avg_net_pnl": round(float(net.mean()), 2),
+            "win_rate": round(float((net > 0).mean()), 4),
+            "avg_captured_pts": round(float(captured_pts[mask].mean()), 4),
+        }
+
+    out = {"trail_hit": _summary(hit), "no_trail": _summary(~hit)}
+    valid = hit & (excursion_pts > 0)
+    if valid.any():
+        ratio = captured_pts[valid] / excursion_pts[valid]
+        out["trail_hit"]["capture_ratio_median"] = round(float(np.median(ratio)), 4)
+        out["trail_hit"]["giveback_pts_mean"] = round(float((excursion_pts[valid] - captured_pts[valid]).mean()), 4)
+    return out
+
+def summary(symbols=None, start_day=None, end_day=None):
+    records = load_history(symbols, start_day, end_day)
+    return {
+        "trades": int(len(records)),
+        "net_pnl": round(float(records["net_pnl"].sum()), 2) if len(records) else 0.0,
+        "by_exit_reason": pnl_by(records, "exit_reason"),
+        "by_entry_reason": pnl_by(records, "entry_reason"),
+        "by_session": pnl_by(records, "session"),
+        "hold_time": hold_time_distribution(records),
+        "trailing": trailing_stop_efficacy(records),
+    }
+
+if __name__ == "__main__":
+    # Usage: python trade_history.py [SYMBOL ...]
+    import json
+    print(json.dumps(summary(sys.argv[1:] or None), indent=2))
+
+#=========================  TRADE_HISTORY (END OF SCRIPT)  ================================
@@ -0,0 +1,299 @@
+#=========================  TRADE_JOURNAL - WRITE-AHEAD JOURNAL FOR IN-FLIGHT ORDERS  ================================
+# Every entry/exit walks:  intent → ordered (order_id) → filled (fill) → pending_commit (record) → committed
+# and each step is one fsync'd SQLite transaction (WAL, synchronous=FULL) made BEFORE the side effect
+# it guards. If the process dies anywhere in between, recover() at startup replays ONLY the records
+# that never reached a terminal state — O(in-flight), no rescans of Firebase or Tiger order history.
+#
+#   events   append-only audit log (one row per step)
+#   intents  one row per order with its current state (partial index on the non-terminal ones)
+#
+# The journal must never block trading: every call fails soft (prints, returns None).
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+JOURNAL_PATH = os.getenv("TRADE_JOURNAL_PATH", "trade_journal.sqlite3")
+JOURNAL_OWNER = os.getenv("TRADE_JOURNAL_OWNER") or os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+
+STAGES = ("intent", "ordered", "filled", "pending_commit", "committed", "aborted")
+TERMINAL = ("committed", "aborted")
+ORDERED_NO_FILL_GIVE_UP_S = 600      # an order with no fills this long after placement is abandoned
+RETAIN_TERMINAL_DAYS = 7
+
+_lock = threading.Lock()
+_conn = None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    journal_id TEXT NOT NULL,
+    stage      TEXT NOT NULL,
+    data       TEXT,
+    ts         REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS intents (
+    journal_id TEXT PRIMARY KEY,
+    kind       TEXT NOT NULL,
+    symbol     TEXT,
+    action     TEXT,
+    quantity   INTEGER,
+    owner      TEXT,
+    state      TEXT NOT NULL,
+    order_id   TEXT,
+    data       TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS intents_open ON intents(owner, state) WHERE state NOT IN ('committed', 'aborted');
+CREATE INDEX IF NOT EXISTS intents_order ON intents(order_id);
+"""
+
+def _connect():
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(JOURNAL_PATH, timeout=5.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")   # fsync the WAL on every commit
+        conn.executescript(_SCHEMA)
+        _conn = conn
+    return _conn
+
+def _write(journal_id, stage, fields, data):
+    """One durable transaction: append the event and fold it into the intent row."""
+    now = time.time()
+    blob = json.dumps(data, default=str) if data else None
+    with _lock:
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT INTO events(journal_id, stage, data, ts) VALUES (?, ?, ?, ?)",
+                         (journal_id, stage, blob, now))
+            if stage == "intent":
+                conn.execute(
+                    "INSERT INTO intents(journal_id, kind, symbol, action, quantity, owner, state, data, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 'intent', ?, ?, ?)",
+                    (journal_id, fields["kind"], fields["symbol"], fields["action"], fields["quantity"],
+                     JOURNAL_OWNER, blob, now, now))
+            else:
+                row = conn.execute("SELECT data FROM intents WHERE journal_id = ?", (journal_id,)).fetchone()
+                merged = json.loads(row[0]) if row and row[0] else {}
+                merged.update(data or {})
+                conn.execute(
+                    "UPDATE intents SET state = ?, order_id = COALESCE(?, order_id), data = ?, updated_at = ? "
+                    "WHERE journal_id = ?",
+                    (stage, fields.get("order_id"), json.dumps(merged, default=str), now, journal_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+# ====================================================
+# 🟩 Recording API (fail-soft)
+# ====================================================
+def begin(kind, symbol, action, quantity, **data):
+    """Journal the intent to place an order (kind 'entry' | 'exit'). Returns the journal_id or None."""
+    journal_id = uuid.uuid4().hex
+    try:
+        _write(journal_id, "intent",
+               {"kind": kind, "symbol": symbol, "action": action, "quantity": quantity}, data)
+        return journal_id
+    except Exception as e:
+        print(f"⚠️ [JOURNAL] begin failed softly ({kind} {symbol}): {e}")
+        return None
+
+def record(journal_id, stage, order_id=None, **data):
+    """Advance a journaled order to `stage` (see STAGES); `data` is merged into the record."""
+    if not journal_id:
+        return None
+    if stage not in STAGES or stage == "intent":
+        raise ValueError(f"invalid journal stage: {stage}")
+    try:
+        _write(journal_id, stage, {"order_id": str(order_id) if order_id else None}, data)
+        return journal_id
+    except Exception as e:
+        print(f"⚠️ [JOURNAL] {stage} failed softly for {journal_id}: {e}")
+        return None
+
+def _journal_id_for_order(order_id):
+    with _lock:
+        row = _connect().execute(
+            "SELECT journal_id FROM intents WHERE order_id = ? ORDER BY created_at DESC LIMIT 1",
+            (str(order_id),)).fetchone()
+    return row[0] if row else None
+
+def record_order(order_id, stage, **data):
+    """Same as record(), addressed by Tiger order_id (for callers that never saw the journal_id)."""
+    try:
+        journal_id = _journal_id_for_order(order_id)
+    except Exception as e:
+        print(f"⚠️ [JOURNAL] lookup failed softly for order {order_id}: {e}")
+        return None
+    return record(journal_id, stage, **data) if journal_id else None
+
+def incomplete(owner=None):
+    """Non-terminal records (oldest first) for `owner` (default: this process)."""
+    with _lock:
+        rows = _connect().execute(
+            "SELECT journal_id, kind, symbol, action, quantity, state, order_id, data, created_at "
+            "FROM intents WHERE owner = ? AND state NOT IN ('committed', 'aborted') ORDER BY created_at",
+            (owner or JOURNAL_OWNER,)).fetchall()
+    cols = ("journal_id", "kind", "symbol", "action", "quantity", "state", "order_id", "data", "created_at")
+    out = []
+    for r in rows:
+        rec = dict(zip(cols, r))
+        rec["data"] = json.loads(rec["data"]) if rec["data"] else {}
+        out.append(rec)
+    return out
+
+def compact(days=RETAIN_TERMINAL_DAYS):
+    """Drop terminal records (and their events) older than `days`."""
+    cutoff = time.time() - days * 86400
+    with _lock:
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM events WHERE journal_id IN (SELECT journal_id FROM intents "
+                         "WHERE state IN ('committed', 'aborted') AND updated_at < ?)", (cutoff,))
+            n = conn.execute("DELETE FROM intents WHERE state IN ('committed', 'aborted') AND updated_at < ?",
+                             (cutoff,)).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return n
+
+# ====================================================
+# 🟩 Startup recovery (replays only incomplete records)
+# ====================================================
+def _fill_from_tiger(order_id):
+    """Fetch the fill for `order_id` from Tiger, all executions folded into one (qty summed, VWAP price), or None."""
+    from tiger_client import get_client
+    from execute_trade_live import aggregate_fills   # lazy: execute_trade_live imports this module
+
+    txs = get_client().get_transactions(order_id=order_id) or []
+    if not txs:
+        return None
+    action, quantity, filled_price, transacted_at = aggregate_fills(txs)
+    return {"order_id": str(order_id), "action": action, "quantity": quantity,
+            "filled_price": filled_price, "transaction_time": transacted_at}
+
+def _recovered_entry(rec, fill):
+    """Minimal open leg when the crash happened before app.py built its record."""
+    action = (fill.get("action") or rec["action"] or "").upper()
+    price = fill.get("filled_price") or 0.0
+    return {
+        "order_id": rec["order_id"],
+        "symbol": rec["symbol"],
+        "filled_price": price,
+        "action": action,
+        "trade_type": "LONG_ENTRY" if action == "BUY" else "SHORT_ENTRY",
+        "status": "FILLED",
+        "contracts_remaining": fill.get("quantity") or rec["quantity"] or 1,
+        "trail_mode": "FALLBACK",
+        "trail_hit": False,
+        "trail_peak": price,
+        "filled": True,
+        "entry_timestamp": fill.get("transaction_time"),
+        "trade_state": "open",
+        "quantity": fill.get("quantity") or rec["quantity"] or 1,
+        "source": "journal-recovery",
+        "is_open": True,
+        "is_ghost": False,
+    }
+
+def _commit_entry(firebase_db, rec, fill):
+    sym, oid = rec["symbol"], rec["order_id"]
+    for path in (f"/open_active_trades/{sym}/{oid}", f"/archived_trades_log/{sym}/{oid}",
+                 f"/ghost_trades_log/{sym}/{oid}"):
+        if firebase_db.reference(path).get(shallow=True) is not None:
+            return "already_in_firebase"
+    import ledger
+
+    trade = rec["data"].get("trade") or _recovered_entry(rec, fill)
+    updates = {f"open_active_trades/{sym}/{oid}": trade}
+    updates.update(ledger.event_updates(ledger.make_event("entry_filled", sym, oid, leg=trade, source="journal-recovery")))
+    firebase_db.reference("/").update(updates)
+    return "replayed_entry"
+
+def _commit_exit(firebase_db, rec, fill):
+    from fifo_close import handle_exit_fill_from_tx  # idempotent via /exit_orders_log flags
+
+    tx = dict(rec["data"].get("tx") or {}, **{
+        "status": "SUCCESS", "order_id": rec["order_id"], "symbol": rec["symbol"],
+        "action": fill.get("action") or rec["action"], "quantity": fill.get("quantity") or rec["quantity"] or 1,
+        "filled_price": fill.get("filled_price"), "transaction_time": fill.get("transaction_time"),
+    })
+    tx.setdefault("trade_type", "EXIT")
+    tx.setdefault("source", "journal-recovery")
+    if handle_exit_fill_from_tx(firebase_db, tx) is None:
+        return None                                 # FIFO commit failed; stays incomplete for the next run
+    return "replayed_exit"
+
+def recover(firebase_db, owner=None, now=None):
+    """
+    Replay this process's incomplete journal records. Per state:
+      intent          → aborted (order id never came back; push_orders reconciles from Tiger)
+      ordered         → fetch fill from Tiger → commit; abandoned after ORDERED_NO_FILL_GIVE_UP_S
+      filled/pending  → commit to Firebase (entry: set open leg if absent; exit: FIFO close)
+    Returns {journal_id: outcome}.
+    """
+    now = now or time.time()
+    outcomes = {}
+    try:
+        records = incomplete(owner)
+    except Exception as e:
+        print(f"⚠️ [JOURNAL] recovery skipped: {e}")
+        return outcomes
+    if records:
+        print(f"[JOURNAL] Recovering {len(records)} in-flight record(s) from {JOURNAL_PATH}")
+
+    for rec in records:
+        jid, state = rec["journal_id"], rec["state"]
+        try:
+            if state == "intent" or not rec["order_id"]:
+                record(jid, "aborted", reason="crashed_before_order_id")
+                outcomes[jid] = "aborted"
+                continue
+
+            fill = rec["data"].get("fill")
+            if state == "ordered" or not fill:
+                fill = _fill_from_tiger(rec["order_id"])
+                if not fill:
+                    if now - rec["created_at"] > ORDERED_NO_FILL_GIVE_UP_S:
+                        record(jid, "aborted", reason="no_fill")
+                        outcomes[jid] = "aborted"
+                    else:
+                        outcomes[jid] = "waiting_for_fill"
+                    continue
+                record(jid, "filled", fill=fill)
+
+            commit = _commit_entry if rec["kind"] == "entry" else _commit_exit
+            outcome = commit(firebase_db, rec, fill)
+            if outcome is None:
+                outcomes[jid] = "commit_failed"
+                continue
+            record(jid, "committed", recovered=outcome,
+                   recovered_at=datetime.now(timezone.utc).isoformat())
+            outcomes[jid] = outcome
+        except Exception as e:
+            print(f"⚠️ [JOURNAL] recovery failed for {jid} ({rec['kind']} {rec['order_id']}): {e}")
+            outcomes[jid] = f"error: {e}"
+
+    if outcomes:
+        print(f"[JOURNAL] Recovery outcomes: {outcomes}")
+    try:
+        compact()
+    except Exception as e:
+        print(f"⚠️ [JOURNAL] compaction skipped: {e}")
+    return outcomes
+
+if __name__ == "__main__":
+    for r in incomplete(sys.argv[1] if len(sys.argv) > 1 else None):
+        print(json.dumps(r, default=str))
+
+#=========================  TRADE_JOURNAL (END OF SCRIPT)  ================================
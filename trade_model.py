@@ -0,0 +1,272 @@
+#=========================  TRADE_MODEL - TRADE LEG / EXIT TICKET RECORDS  ================================
+# One typed shape per Firebase record, with the canonical (de)serializer:
+#
+#   TradeLeg     /open_active_trades/{symbol}/{order_id}   (also archived/zombie copies)
+#   ExitTicket   /exit_orders_log/{symbol}/{order_id}
+#
+# from_firebase() coerces types once (float prices, int quantities, bool flags) and folds the legacy
+# time-field aliases into ONE canonical field:
+#   TradeLeg.entry_timestamp  ← entry_timestamp | transaction_time | fill_time
+#   ExitTicket.fill_time      ← fill_time | transaction_time
+#   ExitTicket.filled_qty     ← filled_qty | quantity
+# to_firebase() writes only the canonical names. Unknown keys survive a round trip in `extra`.
+#
+# Records are __slots__ objects with attribute access, but also speak the read/write mapping protocol
+# (get / [] / update / keys / `in` / **record), so dict-based code such as strategy_core keeps working.
+#
+# Log records (*_trades_log, exit_orders_log) also carry TS_FIELD: the write time in epoch ms, the one
+# field the retention job (clean_ghost_trades.py) orders by. ExitTicket.to_firebase() adds it; other
+# log writers wrap their payload in stamped().
+import time
+from datetime import datetime, timezone
+
+TS_FIELD = "_ts"
+
+def _float(v):
+    if v is None or v == "":
+        return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+def _int(v):
+    if v is None or v == "":
+        return None
+    try:
+        return int(float(v))
+    except (TypeError, ValueError):
+        return None
+
+def _bool(v):
+    if isinstance(v, str):
+        return v.strip().lower() in ("1", "true", "yes")
+    return bool(v)
+
+def _upper(v):
+    return str(v).upper() if v is not None else None
+
+def _str(v):
+    return str(v).strip() if v is not None else None
+
+def parse_utc(s):
+    """ISO ('Z', explicit offset or naive=UTC) or epoch ms → aware UTC datetime; None when unparsable."""
+    if s is None or s == "":
+        return None
+    if isinstance(s, (int, float)):
+        return datetime.fromtimestamp(s / 1000.0 if s > 1e11 else s, tz=timezone.utc)
+    try:
+        d = datetime.fromisoformat(str(s).strip().replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            d = datetime.fromisoformat(str(s).strip().replace("T", " ").split(".")[0])
+        except ValueError:
+            return None
+    return d.replace(tzinfo=timezone.utc) if d.tzinfo is None else d.astimezone(timezone.utc)
+
+def stamped(record, ts_ms=None):
+    """Copy of a log record carrying TS_FIELD (kept if already present, else now)."""
+    out = dict(record.items()) if hasattr(record, "items") else dict(record or {})
+    if out.get(TS_FIELD) is None:
+        out[TS_FIELD] = int(ts_ms if ts_ms is not None else time.time() * 1000)
+    return out
+
+class _Record:
+    """Slots + a dict-compatible face. Subclasses define FIELDS {name: coercer}, KEYS {firebase key: slot}."""
+    __slots__ = ("extra",)
+    FIELDS = {}
+    KEYS = {}
+    SLOT_KEYS = {}
+
+    def __init__(self, **kw):
+        self.extra = {}
+        for name in self.FIELDS:
+            object.__setattr__(self, name, None)
+        for key, value in kw.items():
+            self[key] = value
+
+    # ---------- mapping face ----------
+    def _slot(self, key):
+        slot = self.KEYS.get(key, key)
+        return slot if slot in self.FIELDS else None
+
+    def __setitem__(self, key, value):
+        slot = self._slot(key)
+        if slot is None:
+            self.extra[key] = value
+        else:
+            coerce = self.FIELDS[slot]
+            object.__setattr__(self, slot, coerce(value) if (coerce and value is not None) else value)
+
+    def __getitem__(self, key):
+        slot = self._slot(key)
+        value = getattr(self, slot) if slot else self.extra.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        slot = self._slot(key)
+        value = getattr(self, slot) if slot else self.extra.get(key)
+        return default if value is None else value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self):
+        out = [self.SLOT_KEYS.get(n, n) for n in self.FIELDS if getattr(self, n) is not None]
+        return out + [k for k, v in self.extra.items() if v is not None]
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def values(self):
+        return [self[k] for k in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def update(self, other=(), **kw):
+        for key, value in (other.items() if hasattr(other, "items") else other):
+            self[key] = value
+        for key, value in kw.items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self.get(key)
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            self[key] = None
+            if self._slot(key) is None:
+                self.extra.pop(key, None)
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def copy(self):
+        return type(self).from_firebase(self.get("order_id"), self.to_firebase())
+
+    def __eq__(self, other):
+        if hasattr(other, "keys"):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+    # ---------- (de)serialization ----------
+    def to_firebase(self):
+        """Canonical Firebase shape: canonical key names, no None values, unknown keys preserved."""
+        return dict(self.items())
+
+# ====================================================
+# 🟩 TradeLeg
+# ====================================================
+_LEG_FIELDS = {
+    "order_id": _str, "symbol": _str, "action": _upper, "trade_type": None, "status": None,
+    "filled_price": _float, "quantity": _int, "contracts_remaining": _int, "filled": _bool,
+    "entry_timestamp": None, "entry_reason": None, "source": None,
+    "trade_state": None, "is_open": _bool, "is_ghost": _bool, "just_executed": _bool, "liquidation": _bool,
+    "trail_mode": None, "trail_trigger": _float, "trail_offset": _float, "trail_hit": _bool,
+    "trail_peak": _float, "trail_stop_price": _float, "trail_trigger_price": _float,
+    "gate_state": None, "anchor_order_id": None, "anchor_gate_price": _float, "skip_tp_trailing": _bool,
+    "exit_pending": None, "broker_exit": None, "exited": _bool, "exit_timestamp": None, "exit_reason": None, "exit_order_id": None,
+    "realized_pnl": _float, "net_pnl": _float, "tiger_commissions": _float,
+}
+_LEG_TIME_ALIASES = ("transaction_time", "fill_time")
+
+class TradeLeg(_Record):
+    __slots__ = tuple(_LEG_FIELDS)
+    FIELDS = _LEG_FIELDS
+
+    @classmethod
+    def from_firebase(cls, order_id, data):
+        data = dict(data or {})
+        entry_ts = data.get("entry_timestamp")
+        for alias in _LEG_TIME_ALIASES:
+            v = data.pop(alias, None)
+            entry_ts = entry_ts or v
+        data["entry_timestamp"] = entry_ts
+        if order_id is not None:
+            data["order_id"] = order_id
+        return cls(**data)
+
+    @property
+    def side(self):
+        """+1 long, -1 short."""
+        return 1 if self.action == "BUY" else -1
+
+    @property
+    def entry_utc(self):
+        return parse_utc(self.entry_timestamp)
+
+    @property
+    def is_live(self):
+        """Open leg with contracts left (the rule every net-position / FIFO scan applies)."""
+        return (not self.exited
+                and (self.status or "").lower() not in ("closed", "failed")
+                and (self.contracts_remaining if self.contracts_remaining is not None else 1) > 0)
+
+def legs_from_node(node):
+    """/open_active_trades/{symbol} node → {order_id: TradeLeg} (heartbeat/marker keys skipped)."""
+    return {str(oid): TradeLeg.from_firebase(str(oid), tr)
+            for oid, tr in (node or {}).items()
+            if isinstance(tr, dict) and not str(oid).startswith("_")}
+
+# ====================================================
+# 🟩 ExitTicket
+# ====================================================
+_TICKET_FIELDS = {
+    "order_id": _str, "symbol": _str, "action": _upper, "filled_price": _float, "filled_qty": _int,
+    "fill_time": None, "status": None, "trade_type": None, "source": None, "exit_reason": None,
+    "anchor_id": None, "journal_id": None, "handled": _bool, "processed": _bool,
+}
+
+class ExitTicket(_Record):
+    __slots__ = tuple(_TICKET_FIELDS)
+    FIELDS = _TICKET_FIELDS
+    KEYS = {"_handled": "handled", "_processed": "processed", "transaction_time": "fill_time",
+            "quantity": "filled_qty"}
+    SLOT_KEYS = {"handled": "_handled", "processed": "_processed"}
+
+    @classmethod
+    def from_firebase(cls, order_id, data):
+        data = dict(data or {})
+        fill_time = data.pop("fill_time", None) or data.pop("transaction_time", None)
+        data.pop("transaction_time", None)
+        qty = data.pop("filled_qty", None) or data.pop("quantity", None)
+        data.pop("quantity", None)
+        ticket = cls(**data)
+        ticket.fill_time = fill_time
+        ticket.filled_qty = _int(qty)
+        if order_id is not None:
+            ticket.order_id = _str(order_id)
+        return ticket
+
+    @classmethod
+    def from_tx(cls, tx):
+        """A fill payload (Tiger result / monitor / push_orders shape) → ExitTicket."""
+        return cls.from_firebase(tx.get("order_id"), tx)
+
+    def to_firebase(self):
+        return stamped(self)
+
+    @property
+    def fill_utc(self):
+        return parse_utc(self.fill_time)
+
+    @property
+    def done(self):
+        return bool(self.handled or self.processed)
+
+#=========================  TRADE_MODEL (END OF SCRIPT)  ================================